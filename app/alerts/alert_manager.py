@@ -1,15 +1,40 @@
 from .email_alert import send_email_alert
 from .sms_alert import send_sms_alert
+from .matcher import BoundaryMatcher, KeywordMatcher, users_fingerprint
+from .coalescer import AlertHit
 from .zones import ZONES
+import logging
+
+logger = logging.getLogger("alerts.alert_manager")
 
 class AlertManager:
     """Handles keyword detection and alert triggering."""
-    def __init__(self):
-        pass
+    def __init__(self, notifier=None, alert_log=None, fuzzy=None, coalescer=None, vocabulary=None):
+        # When set, alerts are handed to the background Notifier instead of sent inline
+        self.notifier = notifier
+        # Optional TranscriptStore that keeps a record of sent alerts for the API (without a coalescer;
+        # a coalescer logs the alerts it sends itself)
+        self.alert_log = alert_log
+        # Compiled matcher over all users' keywords/zones, rebuilt when users change
+        self._matcher = None
+        self._matcher_key = None
+        # Approximate matching for mis-heard names (app/alerts/fuzzy.py), on unless FUZZY_MATCHING=0
+        if fuzzy is None:
+            import os
+            fuzzy = os.environ.get("FUZZY_MATCHING", "1").lower() not in ("0", "false", "no")
+        self.fuzzy = fuzzy
+        # Per-feed edges of recent segments, for keywords split across the 90-second cut
+        self.boundaries = BoundaryMatcher()
+        # Optional AlertCoalescer (app/alerts/coalescer.py): repeat hits become digests, sends are rate-limited
+        self.coalescer = coalescer
+        # Optional Vocabulary (app/audio/vocabulary.py) that corrects transcripts before they get here;
+        # keywords are corrected the same way so they still match
+        self.vocabulary = vocabulary
 
-    def send_email(self, to_email, subject, body):
-        import logging
-        logger = logging.getLogger("alerts.alert_manager")
+    def send_email(self, to_email, subject, body, feed=None, event_unixtime=None):
+        if self.notifier is not None:
+            logger.info(f"[AlertManager] Queueing email to {to_email} with subject '{subject}'.")
+            return self.notifier.send_email(to_email, subject, body, feed=feed, event_unixtime=event_unixtime)
         logger.info(f"[AlertManager] About to send email to {to_email} with subject '{subject}' and body: {body}")
         try:
             result = send_email_alert(to_email, subject, body)
@@ -22,33 +47,76 @@ class AlertManager:
             import traceback
             logger.error(traceback.format_exc())
 
-    def send_sms(self, to_number, body):
+    def send_sms(self, to_number, body, feed=None, event_unixtime=None):
+        if self.notifier is not None:
+            return self.notifier.send_sms(to_number, body, feed=feed, event_unixtime=event_unixtime)
         send_sms_alert(to_number, body)
 
+    def get_matcher(self, users, version=None):
+        """
+        Return a KeywordMatcher for `users`, rebuilding it only when the user set changed.
+        Pass the user registry's `version` to skip fingerprinting the list.
+        """
+        key = ("version", version) if version is not None else users_fingerprint(users)
+        normalize = None
+        if self.vocabulary is not None:
+            key = (key, self.vocabulary.version)
+            normalize = lambda keyword: self.vocabulary.correct(keyword)[0]
+        if self._matcher is None or key != self._matcher_key:
+            self._matcher = KeywordMatcher(users, fuzzy=self.fuzzy, normalize=normalize)
+            self._matcher_key = key
+            logger.info(f"[AlertManager] Built keyword matcher: {len(self._matcher)} patterns for {len(users)} users.")
+        return self._matcher
+
+    def check_transcript(self, transcript, users, alert_type="email", event_unixtime=None, users_version=None, feed=None,
+                         segments=None):
+        """
+        Scan the transcript once for every user's keywords/zones and alert each matched user.
+        With a feed and event time, keywords split across the cut from the neighbouring segments
+        are found as well (pass the Whisper `segments` to time those hits precisely).
+        """
+        matcher = self.get_matcher(users, version=users_version)
+        # user index -> (Match, event time, text shown in the alert)
+        first_hits = {idx: (match, event_unixtime, transcript)
+                      for idx, match in matcher.first_match_per_user(transcript).items()}
+        if feed is not None and event_unixtime is not None:
+            for idx, match, event_time, context in self.boundaries.check(matcher, feed, event_unixtime, transcript, segments):
+                if idx not in first_hits:
+                    logger.info(f"[Alert Debug] '{match.keyword}' spans a segment boundary on feed {feed} near {int(event_time)}.")
+                    first_hits[idx] = (match, event_time, f"...{context}...")
+        if not first_hits:
+            logger.info("[AlertManager] No alert triggered: no keywords/zones found in transcript.")
+            return []
+        for idx in sorted(first_hits):
+            match, event_time, text = first_hits[idx]
+            kind = "" if match.score >= 1.0 else f" (fuzzy, score {match.score:.2f})"
+            logger.info(f"[Alert Debug] MATCH FOUND: '{match.keyword}' at offset {match.offset}{kind} for user {match.user.get('email')}.")
+            self.trigger_alert(text, match.user, match.keyword, alert_type=alert_type, event_unixtime=event_time, feed=feed)
+        return [first_hits[idx][0] for idx in sorted(first_hits)]
+
     def check_and_trigger(self, transcript, user_prefs, alert_type="email", event_unixtime=None):
         # Treat zones as keywords if keywords is empty
         keywords = user_prefs.get("keywords", [])
         zones = user_prefs.get("zones", [])
         # Always use the union of keywords and zones for matching
         all_keywords = list(set(keywords + zones))
-        email = user_prefs.get("email")
-        phone = user_prefs.get("phone")
-        found = False
+        transcript_clean = transcript.lower()
         matched_keyword = None
         for kw in all_keywords:
             kw_clean = kw.strip().lower()
-            transcript_clean = transcript.lower()
-            import logging
-            logger = logging.getLogger("alerts.alert_manager")
             logger.debug(f"[Alert Debug] Checking keyword/zone: '{kw}' (clean: '{kw_clean}') in transcript: '{transcript[:80]}'")
-            if kw_clean in transcript_clean:
+            if kw_clean and kw_clean in transcript_clean:
                 logger.info(f"[Alert Debug] MATCH FOUND: '{kw_clean}' in transcript.")
-                found = True
                 matched_keyword = kw
                 break
-        if not found:
+        if matched_keyword is None:
             print("[AlertManager] No alert triggered: no keywords/zones found in transcript.")
             return
+        self.trigger_alert(transcript, user_prefs, matched_keyword, alert_type=alert_type, event_unixtime=event_unixtime)
+
+    def trigger_alert(self, transcript, user_prefs, matched_keyword, alert_type="email", event_unixtime=None, feed=None):
+        email = user_prefs.get("email")
+        phone = user_prefs.get("phone")
         import os
         from datetime import datetime, timezone
         alert_env = os.environ.get("ALERT_ENV", "DEV")
@@ -75,6 +143,8 @@ class AlertManager:
             except Exception as e:
                 local_time_str = None  # Fallback if error
         subject = f"Midpen Monitor Alert [{alert_env}]"
+        if feed is not None:
+            subject += f" Feed {feed}"
         # --- Render-style event time formatting ---
         # PDT: May 5 10:27:53 PM
         # UTC: May 6 05:27:53 AM
@@ -90,6 +160,8 @@ class AlertManager:
         utc_time_str = event_dt_utc.strftime("%b %e %I:%M:%S %p UTC")
         unix_ms = int(event_dt_utc.timestamp() * 1000)
         body = f"Environment: {alert_env}\n"
+        if feed is not None:
+            body += f"Feed: {feed}\n"
         if pdt_time_str:
             body += f"PDT: {pdt_time_str}\n"
         body += f"UTC: {utc_time_str}\n"
@@ -98,13 +170,32 @@ class AlertManager:
             body += f"Local Event Time: {local_time_str}\n"
         body += f"Keyword/Zone: '{matched_keyword}' detected in transcript:\n{transcript}"
 
+        if self.coalescer is not None and ((alert_type == "email" and email) or (alert_type == "sms" and phone)):
+            to = email if alert_type == "email" else phone
+            user_key = user_prefs.get("id") or email or phone
+            # Logged by the coalescer once the hit is actually sent (it may be held for a digest)
+            self.coalescer.submit(AlertHit(user_key, alert_type, to, matched_keyword, transcript, subject, body,
+                                           feed=feed, event_unixtime=event_dt_utc.timestamp()))
+            return
         if alert_type == "email" and email:
             import logging
             logger = logging.getLogger("alerts.alert_manager")
             logger.info(f"[AlertManager] Sending email alert to {email}...")
-            self.send_email(email, subject, body)
+            self.send_email(email, subject, body, feed=feed, event_unixtime=event_dt_utc.timestamp())
             logger.info(f"[AlertManager] Finished processing email alert to {email}.")
         elif alert_type == "sms" and phone:
             print(f"[AlertManager] Sending SMS alert to {phone}...")
-            self.send_sms(phone, body)
+            self.send_sms(phone, body, feed=feed, event_unixtime=event_dt_utc.timestamp())
             print(f"[AlertManager] SMS alert sent to {phone}.")
+        else:
+            return
+        self._log_alert(user_prefs, matched_keyword, alert_type, feed, event_unixtime)
+
+    def _log_alert(self, user_prefs, matched_keyword, alert_type, feed, event_unixtime):
+        if self.alert_log is None:
+            return
+        try:
+            self.alert_log.record_alert(feed, event_unixtime, user_prefs.get("id") or user_prefs.get("email"),
+                                        matched_keyword, alert_type)
+        except Exception as e:
+            logger.warning(f"[AlertManager] Failed to log alert: {e}")
@@ -0,0 +1,277 @@
+"""
+Alert coalescing between keyword matching and delivery.
+
+During an incident the same zone comes up on the radio in segment after
+segment, and without this layer every one of them is a full email or SMS to
+every subscriber. The coalescer keeps a little state per user and channel:
+
+- The first hit on a (user, zone) is an incident alert and goes out at once,
+  exactly as before.
+- Further hits on that zone while it is active (each within `window_seconds`
+  of the previous one) are held and merged into a single digest for the user,
+  sent once the digest is `window_seconds` old. A digest lists one line per
+  segment (time, feed, zone and a short snippet) instead of whole transcripts.
+- No user gets more than `max_per_hour` sends per channel in any hour. An
+  incident alert over the cap joins the pending digest, and a digest waits
+  until the cap allows it.
+
+Window 0 and cap 0 pass every alert straight through. Messages are handed to
+`sender`, which has the Notifier's send_email/send_sms interface. With an
+`alert_log` (the TranscriptStore), each hit is recorded when the message
+carrying it is handed over, so held hits are logged with their digest and
+never before.
+"""
+import os
+import threading
+import time
+import logging
+from collections import deque
+from datetime import datetime, timezone
+
+from app.metrics import monitor as metrics
+
+logger = logging.getLogger("alerts.coalescer")
+
+HOUR = 3600
+SNIPPET_CHARS = 160
+
+
+class AlertHit:
+    """One matched alert, fully rendered, on its way to a user."""
+    def __init__(self, user, channel, to, keyword, transcript, subject, body, feed=None, event_unixtime=None):
+        self.user = user  # stable user key (id, email or phone)
+        self.channel = channel  # "email" or "sms"
+        self.to = to
+        self.keyword = keyword
+        self.transcript = transcript
+        self.subject = subject
+        self.body = body
+        self.feed = feed
+        self.event_unixtime = event_unixtime
+
+
+def snippet(transcript, keyword, width=SNIPPET_CHARS):
+    """About `width` characters of the transcript around the first occurrence of keyword."""
+    text = " ".join((transcript or "").split())
+    if len(text) <= width:
+        return text
+    i = text.lower().find((keyword or "").lower())
+    start = 0 if i < 0 else max(0, min(i - width // 3, len(text) - width))
+    out = text[start:start + width].strip()
+    return ("..." if start else "") + out + ("..." if start + width < len(text) else "")
+
+
+def format_event_time(unixtime):
+    """Pacific time of an event for alert text."""
+    if unixtime is None:
+        return "--"
+    dt = datetime.fromtimestamp(unixtime, tz=timezone.utc)
+    try:
+        from zoneinfo import ZoneInfo
+        dt = dt.astimezone(ZoneInfo("America/Los_Angeles"))
+    except Exception:
+        pass
+    return dt.strftime("%b %e %I:%M:%S %p %Z")
+
+
+def format_digest(hits, channel):
+    """Subject and body of a digest for the held hits (oldest first)."""
+    zones = list(dict.fromkeys(h.keyword for h in hits))
+    noun = "mention" if len(hits) == 1 else "mentions"
+    subject = f"{hits[0].subject} - {len(hits)} more {noun}"
+    lines = [f"{len(hits)} more {noun} of {', '.join(zones)} since the last alert:"]
+    for h in sorted(hits, key=lambda h: h.event_unixtime or 0):
+        feed = f" feed {h.feed}" if h.feed is not None else ""
+        line = f"{format_event_time(h.event_unixtime)}{feed} '{h.keyword}'"
+        if channel == "email":
+            line += f": {snippet(h.transcript, h.keyword)}"
+        lines.append(line)
+    return subject, "\n".join(lines)
+
+
+class _Digest:
+    def __init__(self, opened):
+        self.opened = opened
+        self.hits = []
+
+
+class AlertCoalescer:
+    """Deduplicates alert hits per (user, zone) and rate-limits sends per (user, channel)."""
+
+    def __init__(self, sender, window_seconds=600, max_per_hour=10, flush_interval=5.0, clock=time.time,
+                 alert_log=None):
+        self.sender = sender
+        self.alert_log = alert_log
+        self.window = max(0.0, float(window_seconds))
+        self.max_per_hour = max(0, int(max_per_hour))
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._incidents = {}  # (user, channel, zone) -> time of the last hit
+        self._sends = {}  # (user, channel) -> deque of send times in the last hour
+        self._digests = {}  # (user, channel) -> _Digest
+        self._recipients = {}  # (user, channel) -> last known address
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sent = 0
+        self.coalesced = 0
+        self.digests = 0
+
+    @classmethod
+    def from_env(cls, sender, alert_log=None):
+        return cls(
+            sender,
+            window_seconds=float(os.environ.get("ALERT_COALESCE_WINDOW", 600)),
+            max_per_hour=int(os.environ.get("ALERT_MAX_PER_HOUR", 10)),
+            alert_log=alert_log,
+        )
+
+    @property
+    def enabled(self):
+        return self.window > 0 or self.max_per_hour > 0
+
+    @property
+    def pending(self):
+        with self._lock:
+            return sum(len(d.hits) for d in self._digests.values())
+
+    def is_active(self, user, channel, zone, now=None):
+        """True while (user, zone) is inside an incident window, i.e. a new hit would not be sent on its own."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            last = self._incidents.get((user, channel, zone.strip().lower()))
+        return last is not None and now - last < self.window
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="alert-coalescer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and send every held digest now."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logger.warning(f"[Coalescer] Digest flush failed: {e}")
+
+    def submit(self, hit):
+        """Send the hit now or hold it for a digest; returns True if it was sent now."""
+        if not self.enabled:
+            if self._deliver(hit.channel, hit.to, hit.subject, hit.body, hit.feed, hit.event_unixtime):
+                self._log_sent([hit])
+            self.sent += 1
+            return True
+        if self._thread is None:
+            self.start()
+        now = self.clock()
+        user_key = (hit.user, hit.channel)
+        with self._lock:
+            zone_key = (hit.user, hit.channel, hit.keyword.strip().lower())
+            last = self._incidents.get(zone_key)
+            self._incidents[zone_key] = now
+            self._recipients[user_key] = hit.to
+            immediate = (last is None or now - last >= self.window) and self._allow(user_key, now)
+            if immediate:
+                self._record_send(user_key, now)
+                self.sent += 1
+            else:
+                digest = self._digests.get(user_key)
+                if digest is None:
+                    digest = self._digests[user_key] = _Digest(now)
+                digest.hits.append(hit)
+                self.coalesced += 1
+        if immediate:
+            if self._deliver(hit.channel, hit.to, hit.subject, hit.body, hit.feed, hit.event_unixtime):
+                self._log_sent([hit])
+        else:
+            metrics.ALERTS_COALESCED.inc(hit.feed, hit.channel)
+            logger.info(f"[Coalescer] Holding '{hit.keyword}' for {hit.to} ({hit.channel}) for the next digest.")
+        return immediate
+
+    def tick(self, now=None):
+        """Send the digests that are due and allowed by the rate cap; returns how many were sent."""
+        now = self.clock() if now is None else now
+        due = []
+        with self._lock:
+            for user_key, digest in list(self._digests.items()):
+                if now - digest.opened >= self.window and self._allow(user_key, now):
+                    del self._digests[user_key]
+                    self._record_send(user_key, now)
+                    due.append((user_key, digest))
+            # Forget incidents that have gone quiet and send times older than an hour
+            for zone_key, last in list(self._incidents.items()):
+                if now - last >= max(self.window, HOUR):
+                    del self._incidents[zone_key]
+            for user_key, sends in list(self._sends.items()):
+                while sends and now - sends[0] >= HOUR:
+                    sends.popleft()
+                if not sends:
+                    del self._sends[user_key]
+        for user_key, digest in due:
+            self._send_digest(user_key, digest)
+        return len(due)
+
+    def flush(self):
+        """Send every held digest regardless of window and cap (at shutdown)."""
+        with self._lock:
+            due, self._digests = list(self._digests.items()), {}
+        for user_key, digest in due:
+            self._send_digest(user_key, digest)
+        return len(due)
+
+    def _allow(self, user_key, now):
+        if not self.max_per_hour:
+            return True
+        sends = self._sends.get(user_key)
+        if not sends:
+            return True
+        while sends and now - sends[0] >= HOUR:
+            sends.popleft()
+        return len(sends) < self.max_per_hour
+
+    def _record_send(self, user_key, now):
+        self._sends.setdefault(user_key, deque()).append(now)
+
+    def _send_digest(self, user_key, digest):
+        channel = user_key[1]
+        subject, body = format_digest(digest.hits, channel)
+        to = self._recipients.get(user_key, digest.hits[-1].to)
+        logger.info(f"[Coalescer] Sending {channel} digest of {len(digest.hits)} held alerts to {to}.")
+        metrics.ALERT_DIGESTS.inc(channel)
+        self.digests += 1
+        # No event time: the digest is late by design and would skew the alert lag histogram
+        if self._deliver(channel, to, subject, body, digest.hits[-1].feed, None):
+            self._log_sent(digest.hits)
+
+    def _deliver(self, channel, to, subject, body, feed, event_unixtime):
+        try:
+            if channel == "email":
+                self.sender.send_email(to, subject, body, feed=feed, event_unixtime=event_unixtime)
+            else:
+                self.sender.send_sms(to, body, feed=feed, event_unixtime=event_unixtime)
+        except Exception as e:
+            logger.error(f"[Coalescer] Failed to hand {channel} for {to} to the sender: {e}")
+            return False
+        return True
+
+    def _log_sent(self, hits):
+        if self.alert_log is None:
+            return
+        for hit in hits:
+            unixtime = None if hit.event_unixtime is None else int(hit.event_unixtime)
+            try:
+                self.alert_log.record_alert(hit.feed, unixtime, hit.user, hit.keyword, hit.channel)
+            except Exception as e:
+                logger.warning(f"[Coalescer] Failed to log alert: {e}")
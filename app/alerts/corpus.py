@@ -0,0 +1,45 @@
+"""
+Labeled corpus of mis-heard place names, for scoring keyword matching.
+
+`fuzzy_corpus.jsonl` (next to this file) holds one {"text", "expect"} object per
+line, `expect` listing the zones/keywords a correct matcher reports; negatives
+have an empty list. Used by the fuzzy matching tests and benchmarks/bench_fuzzy.py.
+"""
+import json
+import os
+
+from .matcher import KeywordMatcher
+from .zones import ZONES
+
+CORPUS = os.path.join(os.path.dirname(__file__), "fuzzy_corpus.jsonl")
+
+# Free-text keywords the corpus is labeled for, besides the zones
+KEYWORDS = [
+    "Welfare Check", "Mountain Lion", "Fire on the Mountain", "Vegetation Fire", "Smoke Report",
+    "Injured Hiker", "Mountain View", "Rescue", "Trail Closure", "Downed Tree", "Vehicle Fire",
+    "Medical Aid", "Lost Hiker", "Ranger", "Helicopter", "Power Lines", "Structure Fire",
+]
+
+
+def load_corpus(path=CORPUS):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(matcher, corpus):
+    """Return (true positives, false negatives, false positives) of keyword/zone hits over the corpus."""
+    tp = fn = fp = 0
+    for row in corpus:
+        found = {m.keyword for m in matcher.first_match_per_user(row["text"]).values()}
+        expected = set(row["expect"])
+        tp += len(found & expected)
+        fn += len(expected - found)
+        fp += len(found - expected)
+    return tp, fn, fp
+
+
+def corpus_matcher(fuzzy):
+    # One user per zone and per keyword, so every hit shows up separately
+    users = [{"id": z, "zones": [z], "keywords": []} for z in ZONES]
+    users += [{"id": k, "zones": [], "keywords": [k]} for k in KEYWORDS]
+    return KeywordMatcher(users, fuzzy=fuzzy)
@@ -6,37 +6,110 @@ import os
 import logging
 import traceback
 
-def send_email_alert(to_email: str, subject: str, body: str):
-    smtp_server = os.environ.get("ALERT_SMTP_SERVER")
-    smtp_port = int(os.environ.get("ALERT_SMTP_PORT", 587))
-    smtp_user = os.environ.get("ALERT_SMTP_USER")
-    smtp_password = os.environ.get("ALERT_SMTP_PASSWORD")
-    from_email = os.environ.get("ALERT_FROM_EMAIL", smtp_user)
+logger = logging.getLogger("alerts.email_alert")
 
-    logger = logging.getLogger("alerts.email_alert")
-    logger.info(f"Preparing to send email: to={to_email}, subject={subject}, smtp_server={smtp_server}, smtp_port={smtp_port}, smtp_user={smtp_user}, from_email={from_email}")
-    logger.debug(f"Email body: {body}")
 
-    if not all([smtp_server, smtp_user, smtp_password, to_email]):
-        logger.error("Missing SMTP configuration or recipient email.")
-        return False
+def smtp_config_from_env():
+    smtp_user = os.environ.get("ALERT_SMTP_USER")
+    return {
+        "server": os.environ.get("ALERT_SMTP_SERVER"),
+        "port": int(os.environ.get("ALERT_SMTP_PORT", 587)),
+        "user": smtp_user,
+        "password": os.environ.get("ALERT_SMTP_PASSWORD"),
+        "from_email": os.environ.get("ALERT_FROM_EMAIL", smtp_user),
+        "starttls": os.environ.get("ALERT_SMTP_STARTTLS", "1").lower() not in ("0", "false", "no"),
+        "timeout": float(os.environ.get("ALERT_SMTP_TIMEOUT", 30)),
+    }
 
+
+def build_message(from_email, to_email, subject, body):
     msg = MIMEMultipart()
     msg["From"] = from_email
     msg["To"] = to_email
     msg["Subject"] = subject
     msg.attach(MIMEText(body, "plain"))
+    return msg
+
+
+class SMTPSession:
+    """
+    One authenticated SMTP connection reused across messages.
+
+    Connects (STARTTLS + login) lazily on the first send and reconnects once if
+    the server has dropped the session in the meantime.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or smtp_config_from_env()
+        self.server = None
+        self.messages_sent = 0
+
+    def connect(self):
+        cfg = self.config
+        if not cfg["server"]:
+            raise ValueError("Missing SMTP configuration (ALERT_SMTP_SERVER).")
+        server = smtplib.SMTP(cfg["server"], cfg["port"], timeout=cfg["timeout"])
+        try:
+            if cfg["starttls"]:
+                server.starttls()
+            if cfg["user"] and cfg["password"]:
+                server.login(cfg["user"], cfg["password"])
+        except Exception:
+            server.close()
+            raise
+        logger.info(f"SMTP login successful ({cfg['server']}:{cfg['port']}).")
+        self.server = server
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except Exception:
+            self.server.close()
+        self.server = None
+
+    def send(self, to_email, subject, body):
+        cfg = self.config
+        msg = None
+        for attempt in (1, 2):
+            if self.server is None:
+                self.connect()
+            if msg is None:
+                msg = build_message(cfg["from_email"], to_email, subject, body).as_string()
+            try:
+                self.server.sendmail(cfg["from_email"], to_email, msg)
+                self.messages_sent += 1
+                logger.info(f"Email sent to {to_email}.")
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError) as e:
+                # Stale pooled connection: drop it and try once more on a fresh one
+                self.close()
+                if attempt == 2:
+                    raise
+                logger.warning(f"SMTP session lost while sending to {to_email} ({e}); reconnecting.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def send_email_alert(to_email: str, subject: str, body: str):
+    config = smtp_config_from_env()
+    logger.info(f"Preparing to send email: to={to_email}, subject={subject}, smtp_server={config['server']}, smtp_port={config['port']}, smtp_user={config['user']}, from_email={config['from_email']}")
+    logger.debug(f"Email body: {body}")
+
+    if not all([config["server"], config["user"], config["password"], to_email]):
+        logger.error("Missing SMTP configuration or recipient email.")
+        return False
 
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            logger.info(f"SMTP login successful. Sending email to {to_email}...")
-            server.sendmail(from_email, to_email, msg.as_string())
-            logger.info(f"Email sent to {to_email}.")
+        with SMTPSession(config) as session:
+            session.send(to_email, subject, body)
         return True
     except Exception as e:
         logger.error(f"Exception occurred while sending email to {to_email}: {e}")
         logger.error(traceback.format_exc())
         return False
-
@@ -0,0 +1,180 @@
+"""
+Approximate matching for place names and keywords that Whisper mis-hears.
+
+Every pattern (zone or keyword) is reduced to its letters ("teaguehill") and a
+coarse phonetic key ("tkl"), and indexed by letter trigrams and by phonetic
+key. A transcript is tokenized once; each run of one to a few words is looked
+up in those indexes, and only the few candidates that share enough trigrams,
+or sound the same, are scored with edit distance. So "Teeg Hill", "Pure Sima"
+or "Thorn Wood" are found in one pass without comparing every word against
+every zone.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from .zones import ZONES
+
+FuzzyHit = namedtuple("FuzzyHit", ["pattern", "start", "end", "score"])
+
+_WORD = re.compile(r"[A-Za-z0-9'’.]+")
+_NON_LETTERS = re.compile(r"[^a-z]")
+# Applied in order; voiced/unvoiced pairs are merged because that's what Whisper confuses most
+_PHONETIC_RULES = [
+    ("tch", "ch"), ("sch", "sk"), ("ph", "f"), ("gh", "g"), ("ck", "k"), ("qu", "k"), ("q", "k"),
+    ("x", "ks"), ("wh", "w"), ("th", "t"), ("dg", "j"),
+    ("b", "p"), ("d", "t"), ("g", "k"), ("v", "f"), ("z", "s"),
+]
+
+
+def letters(text):
+    return _NON_LETTERS.sub("", text.lower())
+
+
+_ZONE_LETTERS = {letters(z) for z in ZONES}
+
+
+@lru_cache(maxsize=65536)
+def phonetic_key(text):
+    """Consonant skeleton of `text`: first sound plus consonants, similar sounds merged, repeats collapsed."""
+    s = letters(text)
+    if not s:
+        return ""
+    s = re.sub(r"c(?=[eiy])", "s", s).replace("c", "k")
+    for a, b in _PHONETIC_RULES:
+        s = s.replace(a, b)
+    head = "a" if s[0] in "aeiouy" else s[0]
+    key = head + re.sub(r"[aeiouyhw]", "", s[1:])
+    return re.sub(r"(.)\1+", r"\1", key)
+
+
+def trigrams(s):
+    return {s[i:i + 3] for i in range(len(s) - 2)} if len(s) >= 3 else {s}
+
+
+def similarity(a, b):
+    """1 - normalized Levenshtein distance."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return 1.0 - prev[-1] / max(len(a), len(b))
+
+
+def default_threshold(pattern):
+    """
+    Short words only match exactly. Zone names (the local names Whisper mangles) tolerate the most
+    mishearing; ordinary English keywords are usually transcribed right, so they need a closer match.
+    """
+    n = len(letters(pattern))
+    if n < 6:
+        return None
+    if letters(pattern) not in _ZONE_LETTERS:
+        return 0.9
+    return 0.85 if n < 9 else 0.8
+
+
+@lru_cache(maxsize=4096)
+def _features(pattern):
+    """(letters, phonetic key, trigrams, word count) for a pattern; cached across matcher rebuilds."""
+    flat = letters(pattern)
+    return flat, phonetic_key(pattern), trigrams(flat), max(1, len(pattern.split()))
+
+
+class FuzzyIndex:
+    """Trigram + phonetic index over patterns with a score threshold each."""
+
+    def __init__(self, thresholds, min_dice=0.35, phonetic_min_length=3):
+        # pattern -> minimum score; patterns without a threshold (too short) aren't indexed
+        self.thresholds = {p: t for p, t in thresholds.items() if t is not None}
+        self.min_dice = min_dice
+        self.phonetic_min_length = phonetic_min_length
+        self._by_trigram = {}
+        self._by_phonetic = {}
+        self._features = {}
+        for pattern in self.thresholds:
+            flat, phon, grams, words = self._features[pattern] = _features(pattern)
+            for g in grams:
+                self._by_trigram.setdefault(g, []).append(pattern)
+            if len(phon) >= phonetic_min_length:
+                self._by_phonetic.setdefault(phon, []).append(pattern)
+        self.max_words = max((f[3] for f in self._features.values()), default=0) + 1
+        lengths = [len(f[0]) for f in self._features.values()] or [0]
+        self._min_len, self._max_len = min(lengths) * 0.65, max(lengths) * 1.5
+        # Radio traffic repeats the same words constantly, so candidate lookups are memoized
+        self._candidate_cache = {}
+
+    def __len__(self):
+        return len(self.thresholds)
+
+    def score(self, pattern, candidate):
+        """Similarity of `candidate` text to an indexed pattern (0-1)."""
+        flat = letters(candidate)
+        p_flat, p_phon, _, _ = self._features[pattern]
+        score = similarity(p_flat, flat)
+        if len(p_phon) >= self.phonetic_min_length and phonetic_key(flat) == p_phon:
+            # Sounds the same: meet the spelling halfway
+            score = (score + 1.0) / 2
+        return score
+
+    def find(self, text):
+        """Return the best non-overlapping FuzzyHit per pattern occurrence, ordered by position."""
+        if not self.thresholds:
+            return []
+        # (start, end without trailing punctuation, letters) per word
+        words = [(m.start(), m.start() + len(m.group().rstrip(".'’")), letters(m.group())) for m in _WORD.finditer(text)]
+        words = [w for w in words if w[2]]
+        best = {}  # (pattern, start) -> FuzzyHit
+        for i in range(len(words)):
+            flat = ""
+            for j in range(i, min(i + self.max_words, len(words))):
+                flat += words[j][2]
+                if len(flat) > self._max_len:
+                    break
+                if len(flat) < self._min_len:
+                    continue
+                for pattern in self._candidates(flat):
+                    p_flat, _, _, p_words = self._features[pattern]
+                    if abs(j - i + 1 - p_words) > 1 or not 0.65 <= len(flat) / len(p_flat) <= 1.5:
+                        continue
+                    score = self.score(pattern, flat)
+                    if score < self.thresholds[pattern]:
+                        continue
+                    key = (pattern, words[i][0])
+                    if key not in best or score > best[key].score:
+                        best[key] = FuzzyHit(pattern, words[i][0], words[j][1], round(score, 3))
+        return self._non_overlapping(best.values())
+
+    def _candidates(self, flat):
+        found = self._candidate_cache.get(flat)
+        if found is not None:
+            return found
+        counts = {}
+        grams = trigrams(flat)
+        for g in grams:
+            for pattern in self._by_trigram.get(g, ()):
+                counts[pattern] = counts.get(pattern, 0) + 1
+        found = {p for p, c in counts.items() if 2 * c / (len(grams) + len(self._features[p][2])) >= self.min_dice}
+        found.update(self._by_phonetic.get(phonetic_key(flat), ()))
+        if len(self._candidate_cache) >= 100000:
+            self._candidate_cache.clear()
+        self._candidate_cache[flat] = found
+        return found
+
+    @staticmethod
+    def _non_overlapping(hits):
+        kept = []
+        taken = {}  # pattern -> [(start, end)] already kept
+        for hit in sorted(hits, key=lambda h: (-h.score, h.start)):
+            spans = taken.setdefault(hit.pattern, [])
+            if any(hit.start < end and start < hit.end for start, end in spans):
+                continue
+            spans.append((hit.start, hit.end))
+            kept.append(hit)
+        return sorted(kept, key=lambda h: h.start)
@@ -0,0 +1,230 @@
+"""
+Multi-pattern keyword matcher for alert checking.
+
+All users' keywords and zones are compiled into one Aho-Corasick automaton, so
+each transcript is scanned once no matter how many subscribers or keywords
+there are. Matching is case-insensitive substring matching, the same rule the
+per-user check used. Transcripts reach the matcher after the vocabulary pass
+(app/audio/vocabulary.py), so keywords are put through the same `normalize`
+function: a user who wrote "cal fire" still matches a transcript corrected to
+"CalFire". With `fuzzy=True`, users without an exact hit are also
+checked against an approximate index (see app/alerts/fuzzy.py) for names
+Whisper mis-heard.
+
+`BoundaryMatcher` covers keywords cut in two by the 90-second segment split: it
+keeps the first and last few words of recent segments per feed and scans each
+join between neighbouring segments once, whichever of the two arrives last.
+"""
+import threading
+from collections import OrderedDict, deque, namedtuple
+
+from .fuzzy import FuzzyIndex, default_threshold
+
+# score is 1.0 for exact hits and the similarity (0-1) for fuzzy ones
+Match = namedtuple("Match", ["user", "keyword", "offset", "score"], defaults=(1.0,))
+
+
+def users_fingerprint(users):
+    """Cheap identity of the fields that affect matching, used to decide when to rebuild."""
+    return hash(tuple(
+        (u.get("id"), tuple(u.get("keywords") or ()), tuple(u.get("zones") or ()), repr(u.get("fuzzy")))
+        for u in users
+    ))
+
+
+def fuzzy_threshold(user, keyword):
+    """
+    Minimum fuzzy score for one user's keyword, or None for exact matching only.
+    Users can set `"fuzzy": false` or `"fuzzy": {"Teague Hill": 0.75, "Ranger": false}`.
+    """
+    prefs = user.get("fuzzy", True)
+    if prefs is False:
+        return None
+    if isinstance(prefs, dict) and keyword in prefs:
+        value = prefs[keyword]
+        return None if value is False or value is None else float(value)
+    return default_threshold(keyword)
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over every user's keywords and zones."""
+
+    def __init__(self, users, fuzzy=False, normalize=None):
+        self.users = list(users)
+        # pattern (lowercased) -> [(user index, keyword as the user wrote it)]
+        self.subscribers = {}
+        # (user index, pattern) -> fuzzy threshold, for the users/keywords that allow fuzzy matching
+        self.fuzzy_thresholds = {}
+        for idx, user in enumerate(self.users):
+            terms = (user.get("keywords") or []) + (user.get("zones") or [])
+            for kw in set(terms):
+                pattern = (normalize(kw) if normalize else kw).strip().lower()
+                if not pattern:
+                    continue
+                self.subscribers.setdefault(pattern, []).append((idx, kw))
+                threshold = fuzzy_threshold(user, kw) if fuzzy else None
+                if threshold is not None:
+                    self.fuzzy_thresholds[(idx, pattern)] = threshold
+        self._build(self.subscribers.keys())
+        index_thresholds = {}
+        for (_, pattern), threshold in self.fuzzy_thresholds.items():
+            index_thresholds[pattern] = min(threshold, index_thresholds.get(pattern, threshold))
+        self.fuzzy = FuzzyIndex(index_thresholds) if index_thresholds else None
+
+    def _build(self, patterns):
+        # Node 0 is the root; goto is a list of dicts char -> node
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for pattern in patterns:
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(pattern)
+        # Breadth-first pass to fill failure links and merge outputs
+        q = deque(self._goto[0].values())
+        while q:
+            node = q.popleft()
+            for ch, nxt in self._goto[node].items():
+                q.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    @property
+    def max_pattern_length(self):
+        return max((len(p) for p in self.subscribers), default=0)
+
+    def find_patterns(self, text):
+        """Yield (pattern, start offset) for every occurrence of every pattern in `text`."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text.lower()):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pattern in out[node]:
+                yield pattern, i - len(pattern) + 1
+
+    def scan(self, transcript):
+        """Return every (user, keyword, offset) hit in the transcript, ordered by where each hit ends."""
+        hits = []
+        for pattern, offset in self.find_patterns(transcript):
+            for idx, kw in self.subscribers[pattern]:
+                hits.append(Match(self.users[idx], kw, offset))
+        return hits
+
+    def first_match_per_user(self, transcript):
+        """Return {user index: Match} for the first hit of each matched user (exact hits win over fuzzy ones)."""
+        first = {}
+        for pattern, offset in self.find_patterns(transcript):
+            for idx, kw in self.subscribers[pattern]:
+                if idx not in first:
+                    first[idx] = Match(self.users[idx], kw, offset)
+        if self.fuzzy is not None and len(first) < len(self.users):
+            for hit in self.fuzzy.find(transcript):
+                for idx, kw in self.subscribers[hit.pattern]:
+                    threshold = self.fuzzy_thresholds.get((idx, hit.pattern))
+                    if idx not in first and threshold is not None and hit.score >= threshold:
+                        first[idx] = Match(self.users[idx], kw, hit.start, hit.score)
+        return first
+
+
+class _SegmentEdges:
+    """Head and tail text of one segment, with Whisper segment start times for the tail."""
+
+    def __init__(self, unixtime, text, segments, window):
+        self.unixtime = unixtime
+        spans = []  # (char offset, seconds into the segment) where each Whisper segment starts
+        if segments:
+            parts = []
+            pos = 0
+            for seg in segments:
+                seg_text = " ".join((seg.get("text") or "").split())
+                if not seg_text:
+                    continue
+                spans.append((pos, float(seg.get("start", 0.0))))
+                parts.append(seg_text)
+                pos += len(seg_text) + 1
+            text = " ".join(parts)
+        else:
+            text = " ".join((text or "").split())
+        self.head = text[:window]
+        self.tail = text[-window:] if window else ""
+        tail_base = len(text) - len(self.tail)
+        self._spans = [(p - tail_base, t) for p, t in spans]
+
+    def time_at(self, tail_offset):
+        """Event time of a character in the tail: the start of the Whisper segment containing it."""
+        seconds = 0.0
+        for offset, start in self._spans:
+            if offset > tail_offset:
+                break
+            seconds = start
+        return self.unixtime + seconds
+
+
+class BoundaryMatcher:
+    """
+    Finds keyword hits that straddle the cut between consecutive segments of a feed.
+
+    Only a bounded number of recent segments' edges is kept per feed. Segments may
+    arrive out of order; each join is scanned once, when its second segment shows up.
+    """
+
+    def __init__(self, segment_duration=90, window_chars=120, max_segments=8):
+        self.segment_duration = segment_duration
+        self.window_chars = window_chars
+        self.max_segments = max_segments
+        self._feeds = {}  # feed -> OrderedDict(unixtime -> _SegmentEdges), oldest first
+        self._lock = threading.Lock()
+
+    def check(self, matcher, feed, unixtime, text, segments=None):
+        """
+        Remember this segment's edges and return [(user index, Match, event_unixtime, context)]
+        for hits across its joins with already-seen neighbours. Match offsets are relative to
+        the later segment of the pair (negative: the hit starts in the earlier one).
+        """
+        window = max(self.window_chars, matcher.max_pattern_length)
+        edges = _SegmentEdges(unixtime, text, segments, window)
+        with self._lock:
+            feed_edges = self._feeds.setdefault(str(feed), OrderedDict())
+            before = feed_edges.get(unixtime - self.segment_duration)
+            after = feed_edges.get(unixtime + self.segment_duration)
+            feed_edges[unixtime] = edges
+            while len(feed_edges) > self.max_segments:
+                feed_edges.popitem(last=False)
+        hits = []
+        if before is not None:
+            hits += self._across(matcher, before, edges)
+        if after is not None:
+            hits += self._across(matcher, edges, after)
+        return hits
+
+    @staticmethod
+    def _across(matcher, left, right):
+        if not left.tail or not right.head:
+            return []
+        joined = f"{left.tail} {right.head}"
+        cut = len(left.tail)  # index of the joining space
+        hits = []
+        for pattern, start in matcher.find_patterns(joined):
+            if not start < cut < start + len(pattern):
+                continue  # entirely inside one segment: already handled by that segment's own scan
+            event_unixtime = left.time_at(start)
+            for idx, kw in matcher.subscribers[pattern]:
+                hits.append((idx, Match(matcher.users[idx], kw, start - cut - 1), event_unixtime, joined))
+        return hits
@@ -1,7 +1,23 @@
 import os
+import threading
 from typing import Optional
 from twilio.rest import Client
 
+# Twilio clients are reusable and thread-safe; build one per credential pair
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_twilio_client(account_sid: str, auth_token: str) -> Client:
+    key = (account_sid, auth_token)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = Client(account_sid, auth_token)
+            _clients[key] = client
+        return client
+
+
 def send_sms_alert(to_number: str, body: str, from_number: Optional[str] = None):
     account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
     auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
@@ -10,7 +26,7 @@ def send_sms_alert(to_number: str, body: str, from_number: Optional[str] = None)
     if not all([account_sid, auth_token, from_number, to_number]):
         raise ValueError("Missing Twilio configuration or phone number.")
 
-    client = Client(account_sid, auth_token)
+    client = get_twilio_client(account_sid, auth_token)
     message = client.messages.create(
         body=body,
         from_=from_number,
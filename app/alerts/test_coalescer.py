@@ -0,0 +1,112 @@
+from app.alerts.coalescer import AlertCoalescer, AlertHit, snippet
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingSender:
+    def __init__(self):
+        self.sent = []
+
+    def send_email(self, email, subject, message, feed=None, event_unixtime=None):
+        self.sent.append(("email", email, subject, message))
+
+    def send_sms(self, phone, message, feed=None, event_unixtime=None):
+        self.sent.append(("sms", phone, None, message))
+
+
+def hit(zone, t, user="u1", channel="email", text=None):
+    to = f"{user}@example.com" if channel == "email" else "+15555550100"
+    return AlertHit(user, channel, to, zone, text or f"units responding to {zone} trailhead", f"Alert {zone}",
+                    f"full body about {zone}", feed="30", event_unixtime=t)
+
+
+def make(window=600, cap=10):
+    clock, sender = FakeClock(), RecordingSender()
+    coalescer = AlertCoalescer(sender, window_seconds=window, max_per_hour=cap, clock=clock)
+    coalescer._thread = object()  # drive tick() by hand instead of the flush thread
+    return coalescer, sender, clock
+
+
+def test_first_hit_is_immediate_and_repeats_become_one_digest():
+    coalescer, sender, clock = make()
+    assert coalescer.submit(hit("Teague Hill", clock.now))
+    for _ in range(5):
+        clock.now += 90
+        assert not coalescer.submit(hit("Teague Hill", clock.now))
+    assert len(sender.sent) == 1 and sender.sent[0][3] == "full body about Teague Hill"
+    assert coalescer.tick() == 0  # the digest is younger than the window
+    clock.now += 600
+    assert coalescer.tick() == 1
+    channel, to, subject, body = sender.sent[1]
+    assert subject == "Alert Teague Hill - 5 more mentions"
+    assert body.count("'Teague Hill'") == 5 and "full body" not in body
+    # Another zone for the same user is a new incident
+    assert coalescer.submit(hit("Rancho San Antonio", clock.now))
+
+
+def test_quiet_zone_starts_a_new_incident():
+    coalescer, sender, clock = make(window=600)
+    coalescer.submit(hit("Teague Hill", clock.now))
+    clock.now += 601
+    assert coalescer.submit(hit("Teague Hill", clock.now))
+    assert coalescer.pending == 0 and len(sender.sent) == 2
+
+
+def test_rate_cap_holds_alerts_until_the_hour_frees_up():
+    coalescer, sender, clock = make(window=0, cap=2)
+    zones = ["Zone A", "Zone B", "Zone C", "Zone D"]
+    sent_now = [coalescer.submit(hit(z, clock.now)) for z in zones]
+    assert sent_now == [True, True, False, False]
+    assert coalescer.tick() == 0  # cap reached
+    clock.now += 3600
+    assert coalescer.tick() == 1
+    assert "Zone C, Zone D" in sender.sent[-1][3]
+    # Other users and channels have their own cap
+    assert coalescer.submit(hit("Zone A", clock.now, user="u2"))
+    assert coalescer.submit(hit("Zone A", clock.now, channel="sms"))
+
+
+def test_stop_flushes_held_digests_and_disabled_passes_through():
+    coalescer, sender, clock = make()
+    coalescer.submit(hit("Teague Hill", clock.now))
+    coalescer.submit(hit("Teague Hill", clock.now + 90))
+    coalescer._thread = None
+    coalescer.stop()
+    assert len(sender.sent) == 2 and coalescer.pending == 0
+
+    passthrough, sender, clock = make(window=0, cap=0)
+    assert all(passthrough.submit(hit("Teague Hill", clock.now)) for _ in range(3))
+    assert len(sender.sent) == 3
+
+
+def test_snippet_centres_on_the_keyword():
+    text = "static " * 60 + "engine 3 responding to Teague Hill gate " + "static " * 60
+    s = snippet(text, "teague hill", width=80)
+    assert "Teague Hill" in s and s.startswith("...") and s.endswith("...")
+
+
+class RecordingLog:
+    def __init__(self):
+        self.alerts = []
+
+    def record_alert(self, feed, unixtime, user, keyword, channel):
+        self.alerts.append((unixtime, keyword))
+
+
+def test_held_hits_are_logged_only_when_their_digest_is_sent():
+    coalescer, sender, clock = make()
+    coalescer.alert_log = log = RecordingLog()
+    first = clock.now
+    coalescer.submit(hit("Teague Hill", first))
+    clock.now += 90
+    coalescer.submit(hit("Teague Hill", clock.now))
+    assert log.alerts == [(int(first), "Teague Hill")]
+    clock.now += 600
+    assert coalescer.tick() == 1
+    assert log.alerts == [(int(first), "Teague Hill"), (int(first) + 90, "Teague Hill")]
@@ -0,0 +1,42 @@
+from app.alerts.fuzzy import FuzzyIndex, default_threshold, phonetic_key
+from app.alerts.matcher import KeywordMatcher
+from app.alerts.corpus import corpus_matcher, evaluate, load_corpus
+
+
+def test_phonetic_key_merges_common_mishearings():
+    assert phonetic_key("Teague Hill") == phonetic_key("Teeg Hill") == phonetic_key("Tig Hill")
+    assert phonetic_key("Purisima") == phonetic_key("Pure Sima")
+    assert phonetic_key("Thornewood") == phonetic_key("Thorn Wood")
+    assert phonetic_key("Sierra") != phonetic_key("Ranger")
+
+
+def test_labeled_corpus_recall_and_precision():
+    corpus = load_corpus()
+    tp, fn, fp = evaluate(corpus_matcher(fuzzy=True), corpus)
+    assert tp / (tp + fn) >= 0.95
+    assert fp == 0
+    exact_tp, _, _ = evaluate(corpus_matcher(fuzzy=False), corpus)
+    assert exact_tp < tp
+
+
+def test_fuzzy_hits_are_located_and_scored():
+    index = FuzzyIndex({"sierra azul": 0.8, "teague hill": 0.8})
+    text = "Engine 5 to Sierra Zul, then Teeg Hill."
+    hits = index.find(text)
+    assert [(h.pattern, text[h.start:h.end]) for h in hits] == [("sierra azul", "Sierra Zul"), ("teague hill", "Teeg Hill")]
+    assert all(0.8 <= h.score < 1.0 for h in hits)
+    assert index.find("unit sierra 12 responding") == []
+
+
+def test_per_keyword_thresholds_and_opt_out():
+    assert default_threshold("Ranger") == 0.9
+    assert default_threshold("Teague Hill") == 0.8
+    assert default_threshold("Fire") is None
+    users = [
+        {"id": "a", "zones": ["Teague Hill"], "keywords": []},
+        {"id": "b", "zones": ["Teague Hill"], "keywords": [], "fuzzy": False},
+        {"id": "c", "zones": ["Teague Hill"], "keywords": [], "fuzzy": {"Teague Hill": 0.95}},
+    ]
+    first = KeywordMatcher(users, fuzzy=True).first_match_per_user("staging at Teeg Hill")
+    assert set(first) == {0} and first[0].score < 1.0
+    assert KeywordMatcher(users, fuzzy=False).first_match_per_user("staging at Teeg Hill") == {}
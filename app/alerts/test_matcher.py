@@ -0,0 +1,91 @@
+from app.alerts.alert_manager import AlertManager
+from app.alerts.matcher import BoundaryMatcher, KeywordMatcher
+
+USERS = [
+    {"id": "a", "email": "a@example.com", "zones": ["Teague Hill", "Sierra Azul"], "keywords": ["Mountain View"]},
+    {"id": "b", "email": "b@example.com", "zones": ["Russian Ridge"], "keywords": ["Welfare Check", "hill"]},
+    {"id": "c", "email": "c@example.com", "zones": [], "keywords": []},
+]
+
+
+def test_scan_returns_every_user_keyword_offset():
+    matcher = KeywordMatcher(USERS)
+    text = "Units to TEAGUE HILL for a welfare check, then Russian Ridge."
+    hits = {(m.user["id"], m.keyword, m.offset) for m in matcher.scan(text)}
+    assert hits == {
+        ("a", "Teague Hill", 9),
+        ("b", "hill", 16),
+        ("b", "Welfare Check", 27),
+        ("b", "Russian Ridge", 47),
+    }
+
+
+def test_overlapping_patterns_and_no_match():
+    matcher = KeywordMatcher([{"id": "x", "keywords": ["he", "she", "his", "hers"], "zones": []}])
+    assert sorted((m.keyword, m.offset) for m in matcher.scan("ushers")) == [("he", 2), ("hers", 2), ("she", 1)]
+    assert matcher.scan("nothing relevant") == []
+
+
+def test_matches_original_per_user_rule():
+    text = "Engine 5 responding to Sierra Azul near Mountain View."
+    first = KeywordMatcher(USERS).first_match_per_user(text)
+    assert set(first) == {0}
+    for user in USERS:
+        kws = {k.strip().lower() for k in user["keywords"] + user["zones"]}
+        assert any(k in text.lower() for k in kws) == (USERS.index(user) in first)
+
+
+def test_matcher_rebuilt_only_when_users_change():
+    manager = AlertManager()
+    m1 = manager.get_matcher(USERS)
+    assert manager.get_matcher([dict(u) for u in USERS]) is m1
+    changed = USERS + [{"id": "d", "zones": ["Windy Hill"], "keywords": []}]
+    assert manager.get_matcher(changed) is not m1
+
+
+def test_boundary_match_fires_once_with_earlier_segment_time():
+    matcher = KeywordMatcher([{"id": "a", "zones": ["Saratoga Gap"], "keywords": []}])
+    boundaries = BoundaryMatcher(segment_duration=90, window_chars=20, max_segments=3)
+    first = [{"start": 10.0, "end": 80.0, "text": " Medic 3 en route to"}, {"start": 86.5, "end": 90.0, "text": " Saratoga"}]
+    assert boundaries.check(matcher, "30", 900, "", first) == []
+    hits = boundaries.check(matcher, "30", 990, " Gap, north side.", [{"start": 0.0, "end": 2.0, "text": " Gap, north side."}])
+    assert [(idx, m.keyword, t) for idx, m, t, _ in hits] == [(0, "Saratoga Gap", 986.5)]
+    # Neither the same join again nor other feeds report it
+    assert boundaries.check(matcher, "31", 990, "Gap", None) == []
+
+
+def test_boundary_match_out_of_order_and_bounded():
+    matcher = KeywordMatcher([{"id": "a", "zones": ["Saratoga Gap"], "keywords": []}])
+    boundaries = BoundaryMatcher(segment_duration=90, max_segments=2)
+    assert boundaries.check(matcher, "30", 990, "gap road", None) == []
+    hits = boundaries.check(matcher, "30", 900, "up to saratoga", None)
+    assert [(m.keyword, t) for _, m, t, _ in hits] == [("Saratoga Gap", 900)]
+    boundaries.check(matcher, "30", 2000, "x", None)
+    boundaries.check(matcher, "30", 3000, "x", None)
+    assert list(boundaries._feeds["30"]) == [2000, 3000]
+
+
+def test_check_transcript_alerts_across_boundary():
+    sent = []
+    manager = AlertManager()
+    manager.trigger_alert = lambda text, user, kw, alert_type, event_unixtime, feed: sent.append((kw, event_unixtime, feed))
+    users = [{"id": "a", "email": "a@example.com", "zones": ["Saratoga Gap"], "keywords": []}]
+    manager.check_transcript("heading to Saratoga", users, event_unixtime=900, feed="30")
+    manager.check_transcript("Gap now", users, event_unixtime=990, feed="30")
+    assert sent == [("Saratoga Gap", 900, "30")]
+
+
+def test_keywords_are_corrected_like_the_transcripts_they_match():
+    from app.audio.vocabulary import Vocabulary
+    vocabulary = Vocabulary(path=None)
+    vocabulary.load({"corrections": {"cal fire": "CalFire", "mid pen": "Midpen"}})
+    manager = AlertManager(fuzzy=False, vocabulary=vocabulary)
+    users = [{"id": "a", "zones": [], "keywords": ["cal fire"]}, {"id": "b", "zones": [], "keywords": ["Mid Pen ranger"]}]
+    transcript = vocabulary.correct("cal fire and a mid pen ranger are on scene")[0]
+    first = manager.get_matcher(users).first_match_per_user(transcript)
+    # The alert still names the keyword as the user wrote it
+    assert {idx: m.keyword for idx, m in first.items()} == {0: "cal fire", 1: "Mid Pen ranger"}
+    # A reloaded table rebuilds the matcher
+    matcher = manager.get_matcher(users)
+    vocabulary.load({"corrections": {}})
+    assert manager.get_matcher(users) is not matcher
@@ -0,0 +1,341 @@
+"""
+Read-only HTTP API over the transcript store, run alongside the monitor.
+
+Endpoints (all JSON unless noted):
+
+    GET /health
+    GET /transcripts?start=&end=&feed=&limit=&offset=   time-range listing, newest first
+    GET /transcripts/<feed>/<unixtime>                  one transcript with segments
+    GET /search?q=&start=&end=&feed=&limit=&offset=&phrase=1
+    GET /alerts?start=&end=&feed=&limit=&offset=        recent alerts (no recipient details)
+    GET /stream                                         Server-Sent Events, one `transcript` event per new transcript
+    GET /metrics                                        Prometheus text format (app/metrics/monitor.py)
+
+JSON responses carry an ETag and are cached in memory per URL until the store's
+data_version moves, so dashboards polling an unchanged window get a 304 (or a
+cached body) without touching the database.
+
+The server binds 127.0.0.1 unless API_HOST says otherwise, and refuses to bind
+anything but a loopback address without an API_TOKEN.
+"""
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_LIMIT = 500
+STREAM_BATCH = 100
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ResponseCache:
+    """Small LRU of rendered responses, valid for one store data_version."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # url -> (version, etag, body)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url, version):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(url)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, url, version, body):
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        with self._lock:
+            self._entries[url] = (version, etag, body)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag, body
+
+
+class TranscriptEvents:
+    """Wakes SSE clients when the store commits new transcripts."""
+
+    def __init__(self, store):
+        self._cond = threading.Condition()
+        self._seq = 0
+        store.listeners.append(self._notify)
+
+    def _notify(self, rows):
+        with self._cond:
+            self._seq += 1
+            self._cond.notify_all()
+
+    def wait(self, seq, timeout):
+        """Block until a commit newer than `seq` (or timeout); returns the latest sequence number."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != seq, timeout=timeout)
+            return self._seq
+
+
+def _int_param(params, name, default=None, minimum=None, maximum=None):
+    values = params.get(name)
+    if not values or values[0] == "":
+        return default
+    try:
+        value = int(float(values[0]))
+    except (ValueError, OverflowError):
+        raise ApiError(400, f"'{name}' must be a number")
+    if minimum is not None:
+        value = max(minimum, value)
+    if maximum is not None:
+        value = min(maximum, value)
+    return value
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _str_param(params, name, default=None):
+    values = params.get(name)
+    return values[0] if values and values[0] != "" else default
+
+
+class ApiServer:
+    """ThreadingHTTPServer exposing the transcript store."""
+
+    def __init__(self, store, host="127.0.0.1", port=8000, token=None, stream_poll_seconds=5.0, keepalive_seconds=15.0,
+                 metrics=None, archive=None):
+        self.store = store
+        # Daily transcript archives (app/transcripts/archive.py): segments past the store's retention are read from there
+        self.archive = archive
+        if metrics is None:
+            from app.metrics.registry import REGISTRY as metrics
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.token = token
+        self.stream_poll_seconds = stream_poll_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.cache = ResponseCache()
+        self.events = TranscriptEvents(store)
+        self.routes = {
+            "/health": self.health,
+            "/transcripts": self.list_transcripts,
+            "/search": self.search,
+            "/alerts": self.alerts,
+        }
+        self._httpd = None
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, store, archive=None):
+        return cls(
+            store,
+            archive=archive,
+            host=os.environ.get("API_HOST", "127.0.0.1"),
+            port=int(os.environ.get("API_PORT", 8000)),
+            token=os.environ.get("API_TOKEN") or None,
+        )
+
+    def start(self):
+        """Serve in a background thread; returns the bound port."""
+        if not self.token and not is_loopback(self.host):
+            raise ValueError(f"Refusing to serve on {self.host or 'all interfaces'} without API_TOKEN")
+        api = self
+
+        class Handler(ApiRequestHandler):
+            server_api = api
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="api-server", daemon=True)
+        self._thread.start()
+        logger.info(f"[API] Listening on http://{self.host}:{self.port}")
+        return self.port
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    # --- Endpoints: each returns a JSON-serializable object ---
+
+    def health(self, params):
+        return {"status": "ok", "transcripts": len(self.store), "last_id": self.store.last_id()}
+
+    def list_transcripts(self, params):
+        limit = _int_param(params, "limit", 50, 1, MAX_LIMIT)
+        offset = _int_param(params, "offset", 0, 0)
+        items = self.store.list(
+            start=_int_param(params, "start"), end=_int_param(params, "end"), feed=_str_param(params, "feed"),
+            limit=limit, offset=offset, include_skipped=_str_param(params, "skipped") == "1",
+        )
+        return {"items": items, "limit": limit, "offset": offset,
+                "next_offset": offset + limit if len(items) == limit else None}
+
+    def get_transcript(self, feed, unixtime):
+        item = self.store.get(feed, unixtime)
+        if item is None and self.archive is not None:
+            item = self.archive.get(feed, unixtime)
+        if item is None:
+            raise ApiError(404, f"No transcript for feed {feed} at {unixtime}")
+        return item
+
+    def search(self, params):
+        query = _str_param(params, "q")
+        if not query:
+            raise ApiError(400, "'q' is required")
+        limit = _int_param(params, "limit", 50, 1, MAX_LIMIT)
+        offset = _int_param(params, "offset", 0, 0)
+        try:
+            items = self.store.search(
+                query, start=_int_param(params, "start"), end=_int_param(params, "end"),
+                feed=_str_param(params, "feed"), limit=limit, offset=offset, phrase=_str_param(params, "phrase", "1") != "0",
+            )
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        return {"query": query, "items": items, "limit": limit, "offset": offset,
+                "next_offset": offset + limit if len(items) == limit else None}
+
+    def alerts(self, params):
+        limit = _int_param(params, "limit", 50, 1, MAX_LIMIT)
+        offset = _int_param(params, "offset", 0, 0)
+        items = self.store.alerts(start=_int_param(params, "start"), end=_int_param(params, "end"),
+                                  feed=_str_param(params, "feed"), limit=limit, offset=offset)
+        return {"items": items, "limit": limit, "offset": offset}
+
+    def resolve(self, path):
+        """Return the handler for a JSON path: fn(params)."""
+        if path in self.routes:
+            return self.routes[path]
+        parts = path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "transcripts" and parts[2].isdigit():
+            return lambda params: self.get_transcript(parts[1], int(parts[2]))
+        raise ApiError(404, f"Unknown path {path}")
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    server_api = None  # set on the per-server subclass
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        message = format % args
+        if self.server_api.token:
+            message = message.replace(self.server_api.token, "***")
+        logger.debug(f"[API] {self.address_string()} {message}")
+
+    def do_GET(self):
+        api = self.server_api
+        url = urlsplit(self.path)
+        try:
+            if api.token and not self._authorized(url):
+                raise ApiError(401, "Missing or invalid token")
+            if url.path == "/stream":
+                return self._stream(parse_qs(url.query))
+            if url.path == "/metrics":
+                return self._send(200, api.metrics.render().encode(), content_type="text/plain; version=0.0.4")
+            self._json(api, url)
+        except ApiError as e:
+            self._send(e.status, json.dumps({"error": str(e)}).encode())
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            logger.error(f"[API] {url.path} failed: {e}")
+            self._send(500, json.dumps({"error": "internal error"}).encode())
+
+    def _authorized(self, url):
+        token = self.server_api.token.encode()
+        header = self.headers.get("Authorization", "")
+        if hmac.compare_digest(header.encode(), b"Bearer " + token):
+            return True
+        # Only for /stream: browser EventSource clients can't set headers. Anywhere else the token would end
+        # up in access and proxy logs for no reason.
+        if url.path == "/stream":
+            param = parse_qs(url.query).get("token", [""])[0]
+            return hmac.compare_digest(param.encode(), token)
+        return False
+
+    @staticmethod
+    def _cache_key(url):
+        """Path and query without any token, so no secret is kept in the response cache."""
+        params = [(k, v) for k, v in parse_qsl(url.query, keep_blank_values=True) if k != "token"]
+        return url.path + ("?" + urlencode(params) if params else "")
+
+    def _json(self, api, url):
+        handler = api.resolve(url.path)
+        version = api.store.data_version()
+        key = self._cache_key(url)
+        cached = api.cache.get(key, version)
+        if cached is None:
+            body = json.dumps(handler(parse_qs(url.query))).encode()
+            cached = api.cache.put(key, version, body)
+        etag, body = cached
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self._send(304, b"", etag=etag)
+        else:
+            self._send(200, body, etag=etag)
+
+    def _send(self, status, body, etag=None, content_type="application/json"):
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _stream(self, params):
+        """Server-Sent Events: replay from Last-Event-ID (or `since`), then push new transcripts as they commit."""
+        api = self.server_api
+        last_id = self.headers.get("Last-Event-ID") or _str_param(params, "since")
+        last_id = int(last_id) if last_id and last_id.isdigit() else api.store.last_id()
+        feed = _str_param(params, "feed")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        seq = None
+        last_write = time.monotonic()
+        while True:
+            items = api.store.since(last_id, limit=STREAM_BATCH)
+            for item in items:
+                last_id = item["id"]
+                if feed is not None and item["feed"] != feed:
+                    continue
+                self.wfile.write(f"id: {item['id']}\nevent: transcript\ndata: {json.dumps(item)}\n\n".encode())
+                last_write = time.monotonic()
+            if not items and time.monotonic() - last_write >= api.keepalive_seconds:
+                self.wfile.write(b": keepalive\n\n")
+                last_write = time.monotonic()
+            self.wfile.flush()
+            if len(items) < STREAM_BATCH:
+                # Also polls, so transcripts written by another process (e.g. a backfill) are picked up too
+                seq = api.events.wait(seq, timeout=api.stream_poll_seconds)
@@ -0,0 +1,122 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from app.api.server import ApiServer
+from app.transcripts.store import TranscriptStore
+
+
+def result(text):
+    return {"text": text, "language": "en", "segments": [{"start": 1.0, "end": 3.0, "text": text}]}
+
+
+@pytest.fixture
+def api(tmp_path):
+    store = TranscriptStore(str(tmp_path / "t.db"), flush_interval=0.05)
+    store.add_many([("30", 900, result("Engine 5 responding to Sierra Azul")), ("31", 990, result("All units clear"))])
+    store.record_alert("30", 900, "a@example.com", "Sierra Azul", "email")
+    store.record_alert("30", 900, "b@example.com", "Sierra Azul", "email")
+    server = ApiServer(store, host="127.0.0.1", port=0, stream_poll_seconds=0.2)
+    server.start()
+    yield server
+    server.stop()
+    store.close()
+
+
+def get(api, path, headers=None):
+    req = urllib.request.Request(f"http://127.0.0.1:{api.port}{path}", headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return resp.status, resp.headers, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_listing_search_and_alerts(api):
+    status, _, body = get(api, "/transcripts?limit=1")
+    page = json.loads(body)
+    assert status == 200 and [t["unixtime"] for t in page["items"]] == [990] and page["next_offset"] == 1
+    assert json.loads(get(api, "/transcripts?feed=30&start=0&end=1000")[2])["items"][0]["unixtime"] == 900
+    assert json.loads(get(api, "/transcripts/30/900")[2])["segments"][0]["start"] == 1.0
+    assert get(api, "/transcripts/30/1")[0] == 404
+
+    hits = json.loads(get(api, "/search?q=sierra+azul")[2])["items"]
+    assert [(h["feed"], h["unixtime"]) for h in hits] == [("30", 900)]
+    assert get(api, "/search")[0] == 400
+
+    alerts = json.loads(get(api, "/alerts")[2])["items"]
+    assert alerts == [{"id": 2, "feed": "30", "unixtime": 900, "keyword": "Sierra Azul", "recipients": 2,
+                       "channels": ["email"], "sent_at": alerts[0]["sent_at"]}]
+
+
+def test_etag_revalidation_and_cache_invalidation(api):
+    status, headers, _ = get(api, "/transcripts")
+    etag = headers["ETag"]
+    assert get(api, "/transcripts", {"If-None-Match": etag})[0] == 304
+    assert api.cache.hits == 1
+    api.store.add_many([("30", 1080, result("new traffic"))])
+    status, headers, body = get(api, "/transcripts", {"If-None-Match": etag})
+    assert status == 200 and headers["ETag"] != etag and json.loads(body)["items"][0]["unixtime"] == 1080
+
+
+def test_stream_pushes_new_transcripts(api):
+    events = []
+
+    def read():
+        with urllib.request.urlopen(f"http://127.0.0.1:{api.port}/stream?since=0&feed=30", timeout=5) as resp:
+            for line in resp:
+                if line.startswith(b"data: "):
+                    events.append(json.loads(line[6:]))
+                    if len(events) == 2:
+                        return
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    api.store.add("30", 1170, result("late traffic"))
+    reader.join(5)
+    assert [e["unixtime"] for e in events] == [900, 1170]
+
+
+def test_token_required_when_configured(api):
+    api.token = "secret"
+    assert get(api, "/health")[0] == 401
+    assert get(api, "/health", {"Authorization": "Bearer secret"})[0] == 200
+    assert get(api, "/health", {"Authorization": "Bearer secreT"})[0] == 401
+    # The query parameter is only for EventSource clients on /stream
+    assert get(api, "/transcripts?token=secret")[0] == 401
+    assert get(api, "/stream?token=wrong")[0] == 401
+    with urllib.request.urlopen(f"http://127.0.0.1:{api.port}/stream?since=0&token=secret", timeout=5) as resp:
+        assert resp.status == 200 and resp.headers["Content-Type"] == "text/event-stream"
+    get(api, "/transcripts?limit=1&token=secret", {"Authorization": "Bearer secret"})
+    assert all("secret" not in key for key in api.cache._entries)
+
+
+def test_metrics_endpoint(api):
+    from app.metrics import monitor as metrics
+    metrics.DOWNLOAD_SECONDS.observe(0.3, "30")
+    status, headers, body = get(api, "/metrics")
+    assert status == 200
+    assert headers["Content-Type"].startswith("text/plain")
+    text = body.decode()
+    assert "# TYPE midpen_download_seconds histogram" in text
+    assert 'midpen_download_seconds_bucket{feed="30",le="+Inf"}' in text
+
+
+def test_bad_numbers_are_rejected(api):
+    assert get(api, "/transcripts?limit=1e999")[0] == 400
+    assert get(api, "/transcripts?limit=ten")[0] == 400
+
+
+def test_public_bind_requires_a_token(tmp_path):
+    store = TranscriptStore(str(tmp_path / "t.db"))
+    try:
+        with pytest.raises(ValueError):
+            ApiServer(store, host="0.0.0.0", port=0).start()
+        server = ApiServer(store, host="0.0.0.0", port=0, token="secret")
+        server.start()
+        server.stop()
+    finally:
+        store.close()
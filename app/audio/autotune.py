@@ -0,0 +1,394 @@
+"""
+Throughput autotuner for the Whisper engine.
+
+At startup (AUTOTUNE=1) it measures the real-time factor of candidate
+settings on this machine:
+- How to split the cores between model workers and threads per worker.
+  This is measured on the configured model, and the winning split is used
+  for every profile.
+- Each model in AUTOTUNE_MODELS, with each compute type in
+  AUTOTUNE_COMPUTE_TYPES and each beam size in AUTOTUNE_BEAMS.
+
+The results become a ladder of profiles, ordered from most accurate to
+cheapest. A profile stays on the ladder only if it is faster than every more
+accurate one. The top rung is the most accurate profile whose measured RTF
+fits the budget: enough throughput for every feed in real time, with
+AUTOTUNE_HEADROOM to spare. Results are cached in AUTOTUNE_CACHE for the same
+machine and candidate set, so restarts don't re-benchmark.
+
+While running, the tuner watches the backlog and the RTF of the segments
+actually transcribed. It steps one rung down when the backlog reaches
+AUTOTUNE_BACKLOG_HIGH segments per feed, or when the observed RTF is over
+budget. It steps back up once the backlog has drained to
+AUTOTUNE_BACKLOG_LOW and the profile above is expected to fit the budget
+(its measured RTF scaled by how the live audio compares with the
+calibration clip). At least AUTOTUNE_MIN_DWELL seconds pass between
+switches. Every switch is logged, exported as a gauge, and recorded as
+`profile` on each transcript, so it can be lined up against alert quality.
+
+Without AUTOTUNE_SAMPLE (a representative recording) the calibration clip is
+synthetic tone bursts. That gives the relative cost of the settings well,
+but the absolute RTF less so; the live RTF corrects for the difference.
+"""
+import json
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from app.metrics import monitor as metrics
+from app.storage.lifecycle import data_path
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# Rough accuracy order of the Whisper model sizes (higher is better)
+MODEL_RANK = {"tiny": 0, "base": 1, "small": 2, "distil-medium": 2.5, "medium": 3, "distil-large-v3": 3.5,
+              "large-v1": 4, "large-v2": 4, "large-v3": 4, "large": 4}
+
+
+def model_rank(model_size):
+    return MODEL_RANK.get(model_size.split("/")[-1].replace(".en", ""), 2)
+
+
+class Profile:
+    """One set of model and decode settings, with its measured real-time factor."""
+    def __init__(self, model_size, compute_type, beam_size, cpu_threads=0, num_workers=1, rtf=None):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.beam_size = beam_size
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.rtf = rtf  # wall seconds per audio second per worker; lower is faster
+
+    @property
+    def name(self):
+        return f"{self.model_size}-{self.compute_type}-b{self.beam_size}"
+
+    @property
+    def accuracy(self):
+        # Model size dominates, then beam search, then float over int8 weights
+        return (model_rank(self.model_size), self.beam_size, self.compute_type != "int8")
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in ("model_size", "compute_type", "beam_size", "cpu_threads",
+                                              "num_workers", "rtf")}
+
+    def __repr__(self):
+        rtf = f" RTF {self.rtf:.2f}" if self.rtf is not None else ""
+        return f"<Profile {self.name} {self.num_workers}x{self.cpu_threads or 'auto'} threads{rtf}>"
+
+
+def worker_splits(cores):
+    """(num_workers, cpu_threads per worker) ways to use `cores`."""
+    splits = [(1, cores)]
+    for workers in (2, 4):
+        if cores >= 2 * workers:
+            splits.append((workers, cores // workers))
+    return splits
+
+
+def build_ladder(profiles, budget):
+    """
+    Profiles to switch between, most accurate first. Only profiles faster than every more accurate
+    one are kept, and the top is the most accurate one within `budget` (or the fastest if none is).
+    """
+    measured = sorted((p for p in profiles if p.rtf is not None), key=lambda p: p.accuracy, reverse=True)
+    frontier = []
+    for p in measured:
+        if not frontier or p.rtf < frontier[-1].rtf:
+            frontier.append(p)
+    for i, p in enumerate(frontier):
+        if p.rtf <= budget:
+            return frontier[i:]
+    return frontier[-1:]
+
+
+def synthetic_clip(seconds=30, seed=0):
+    """Tone bursts separated by quiet gaps, for calibrating without a recording."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE)
+    pcm = rng.normal(0, 0.0005, n).astype(np.float32)
+    t = np.arange(n) / SAMPLE_RATE
+    pos = 0.0
+    while pos < seconds:
+        length = rng.uniform(1.0, 3.0)
+        start, end = int(pos * SAMPLE_RATE), int(min(pos + length, seconds) * SAMPLE_RATE)
+        f0 = rng.uniform(120, 220)
+        pcm[start:end] += (0.2 * sum(np.sin(2 * np.pi * f0 * k * t[start:end]) / k for k in (1, 2, 3))).astype(np.float32)
+        pos += length + rng.uniform(0.5, 4.0)
+    return pcm
+
+
+def calibration_clip(path=None, seconds=30):
+    if path:
+        from app.audio.vad import decode_audio
+        return decode_audio(path)[:int(seconds * SAMPLE_RATE)]
+    return synthetic_clip(seconds)
+
+
+class Autotuner:
+    """Calibrates a profile ladder at startup and moves the engine along it as load changes."""
+
+    def __init__(self, engine, backlog_fn=lambda: 0, feeds=1, models=("medium", "small", "base"),
+                 compute_types=("int8", "float32"), beams=(5, 1), headroom=0.8, backlog_high=6, backlog_low=1,
+                 min_dwell=300, interval=30, sample_path=None, sample_seconds=30, cache_path=None,
+                 max_calibration_seconds=900, clock=time.monotonic):
+        self.engine = engine
+        self.backlog_fn = backlog_fn  # () -> segments waiting or in flight
+        self.feeds = max(1, feeds)
+        self.models = list(models)
+        self.compute_types = list(compute_types)
+        self.beams = sorted(set(beams), reverse=True)
+        self.headroom = headroom
+        self.backlog_high = backlog_high
+        self.backlog_low = backlog_low
+        self.min_dwell = min_dwell
+        self.interval = interval
+        self.sample_path = sample_path
+        self.sample_seconds = sample_seconds
+        self.cache_path = cache_path
+        self.max_calibration_seconds = max_calibration_seconds
+        self.clock = clock
+        self.ladder = []
+        self.level = 0
+        self.switched_at = None
+        self.observed_rtf = None  # EWMA of the live per-segment RTF at the current level
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, engine, backlog_fn=lambda: 0, feeds=1):
+        """An Autotuner if AUTOTUNE is set, else None."""
+        if os.environ.get("AUTOTUNE", "0").lower() not in ("1", "true", "yes"):
+            return None
+
+        def csv(name, default):
+            return [v.strip() for v in os.environ.get(name, default).split(",") if v.strip()]
+
+        models = csv("AUTOTUNE_MODELS", "")
+        if not models:
+            models = list(dict.fromkeys([engine.model_size, "small", "base"]))
+        return cls(
+            engine, backlog_fn, feeds=feeds, models=models,
+            compute_types=csv("AUTOTUNE_COMPUTE_TYPES", "int8,float32"),
+            beams=[int(b) for b in csv("AUTOTUNE_BEAMS", "5,1")],
+            headroom=float(os.environ.get("AUTOTUNE_HEADROOM", 0.8)),
+            backlog_high=int(os.environ.get("AUTOTUNE_BACKLOG_HIGH", 6)),
+            backlog_low=int(os.environ.get("AUTOTUNE_BACKLOG_LOW", 1)),
+            min_dwell=float(os.environ.get("AUTOTUNE_MIN_DWELL", 300)),
+            interval=float(os.environ.get("AUTOTUNE_INTERVAL", 30)),
+            sample_path=os.environ.get("AUTOTUNE_SAMPLE") or None,
+            sample_seconds=float(os.environ.get("AUTOTUNE_SAMPLE_SECONDS", 30)),
+            cache_path=os.environ.get("AUTOTUNE_CACHE", data_path("autotune.json")) or None,
+            max_calibration_seconds=float(os.environ.get("AUTOTUNE_MAX_SECONDS", 900)),
+        )
+
+    @property
+    def budget(self):
+        """Highest per-worker RTF that still keeps up with every feed in real time, with headroom."""
+        return self.engine.num_workers / self.feeds * self.headroom
+
+    @property
+    def profile(self):
+        return self.ladder[self.level] if self.ladder else None
+
+    # --- Calibration ---
+
+    def _cache_key(self):
+        return {"cores": os.cpu_count(), "models": self.models, "compute_types": self.compute_types,
+                "beams": self.beams, "sample": self.sample_path, "sample_seconds": self.sample_seconds}
+
+    def _load_cache(self):
+        if not self.cache_path or os.environ.get("AUTOTUNE_RECALIBRATE", "0").lower() in ("1", "true", "yes"):
+            return None
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("key") != self._cache_key():
+            return None
+        return [Profile(**p) for p in data.get("profiles", [])]
+
+    def _save_cache(self, profiles):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(self.cache_path, "w") as f:
+                json.dump({"key": self._cache_key(), "measured_at": int(time.time()),
+                           "profiles": [p.to_dict() for p in profiles]}, f, indent=2)
+        except OSError as e:
+            logger.warning(f"[Autotune] Could not write {self.cache_path}: {e}")
+
+    def measure(self, profile, clip, model=None):
+        """RTF of `profile` on `clip`: wall time over audio time, with every worker transcribing at once."""
+        model = model or self.engine.build_model(profile.model_size, profile.compute_type, profile.cpu_threads,
+                                                 num_workers=profile.num_workers)
+
+        def run(_):
+            segments, _info = model.transcribe(clip, language=self.engine.language, beam_size=profile.beam_size)
+            for _seg in segments:  # decoding is lazy
+                pass
+
+        run(None)  # warm-up
+        t0 = time.monotonic()
+        with ThreadPoolExecutor(profile.num_workers) as pool:
+            list(pool.map(run, range(profile.num_workers)))
+        audio_seconds = len(clip) / SAMPLE_RATE
+        # Per-worker RTF: the engine runs num_workers segments side by side
+        profile.rtf = (time.monotonic() - t0) / audio_seconds
+        logger.info(f"[Autotune] {profile!r}")
+        return profile.rtf
+
+    def calibrate(self):
+        """Measure the candidates (or reuse the cached results), build the ladder and apply its top profile."""
+        profiles = self._load_cache()
+        if profiles:
+            logger.info(f"[Autotune] Using {len(profiles)} cached measurements from {self.cache_path}")
+        else:
+            profiles = self._benchmark()
+            self._save_cache(profiles)
+        if not profiles:
+            logger.warning("[Autotune] No profile could be measured; keeping the configured settings.")
+            return None
+        # Everything was measured with the winning split, so it applies to every profile
+        self.engine.num_workers = profiles[0].num_workers
+        self.ladder = build_ladder(profiles, self.budget)
+        logger.info(f"[Autotune] Budget RTF {self.budget:.2f} ({self.engine.num_workers} workers, {self.feeds} feeds). "
+                    f"Ladder: {' > '.join(f'{p.name} ({p.rtf:.2f})' for p in self.ladder)}")
+        self._apply(0, "calibration")
+        return self.profile
+
+    def _benchmark(self):
+        clip = calibration_clip(self.sample_path, self.sample_seconds)
+        deadline = time.monotonic() + self.max_calibration_seconds
+        cores = os.cpu_count() or 1
+        first_model, first_compute = self.models[0], self.compute_types[0]
+        # Threads vs workers, measured once on the configured model
+        best = None
+        for workers, threads in worker_splits(cores):
+            p = Profile(first_model, first_compute, self.beams[0], threads, workers)
+            try:
+                self.measure(p, clip)
+            except Exception as e:
+                logger.warning(f"[Autotune] {p.name} with {workers} workers failed: {e}")
+                continue
+            # Throughput per wall second is workers / RTF
+            if best is None or p.rtf / p.num_workers < best.rtf / best.num_workers:
+                best = p
+        if best is None:
+            return []
+        workers, threads = best.num_workers, best.cpu_threads
+        logger.info(f"[Autotune] Using {workers} worker(s) x {threads} threads")
+        profiles = []
+        for model_size in self.models:
+            for compute_type in self.compute_types:
+                if time.monotonic() > deadline:
+                    logger.warning("[Autotune] Calibration time limit reached; skipping the remaining models.")
+                    return profiles
+                try:
+                    model = self.engine.build_model(model_size, compute_type, threads, num_workers=workers)
+                except Exception as e:
+                    logger.warning(f"[Autotune] Could not load {model_size} ({compute_type}): {e}")
+                    continue
+                for beam in self.beams:
+                    p = Profile(model_size, compute_type, beam, threads, workers)
+                    if (model_size, compute_type, beam) == (best.model_size, best.compute_type, best.beam_size):
+                        p.rtf = best.rtf
+                    else:
+                        try:
+                            self.measure(p, clip, model=model)
+                        except Exception as e:
+                            logger.warning(f"[Autotune] {p.name} failed: {e}")
+                            continue
+                    profiles.append(p)
+                del model
+        return profiles
+
+    # --- Runtime control ---
+
+    def observe(self, result):
+        """Feed a transcription result's RTF into the live estimate for the current profile."""
+        rtf = result.get("rtf")
+        if rtf is None or (self.profile and result.get("profile") != self.profile.name):
+            return
+        with self._lock:
+            self.observed_rtf = rtf if self.observed_rtf is None else 0.8 * self.observed_rtf + 0.2 * rtf
+
+    def _scale(self):
+        """How much slower live segments run than the calibration clip at the current level."""
+        current = self.profile
+        if self.observed_rtf is None or not current or not current.rtf:
+            return 1.0
+        return self.observed_rtf / current.rtf
+
+    def tick(self, now=None):
+        """One control step; returns the new level if the profile changed, else None."""
+        if len(self.ladder) < 2:
+            return None
+        now = self.clock() if now is None else now
+        if self.switched_at is not None and now - self.switched_at < self.min_dwell:
+            return None
+        backlog = self.backlog_fn()
+        observed = self.observed_rtf
+        per_feed = backlog / self.feeds
+        if self.level + 1 < len(self.ladder) and (
+                per_feed >= self.backlog_high or (observed is not None and observed > self.budget and per_feed > self.backlog_low)):
+            reason = f"backlog {backlog} segments, RTF {observed if observed is not None else float('nan'):.2f} (budget {self.budget:.2f})"
+            return self._apply(self.level + 1, reason, now)
+        if self.level > 0 and per_feed <= self.backlog_low:
+            expected = self.ladder[self.level - 1].rtf * self._scale()
+            if expected <= self.budget:
+                reason = f"backlog {backlog} segments, expected RTF {expected:.2f} (budget {self.budget:.2f})"
+                return self._apply(self.level - 1, reason, now)
+        return None
+
+    def _apply(self, level, reason, now=None):
+        old = self.profile if self.switched_at is not None else None
+        new = self.ladder[level]
+        scale = self._scale()
+        try:
+            self.engine.reconfigure(new.model_size, new.compute_type, new.beam_size, new.cpu_threads, profile=new.name)
+        except Exception as e:
+            logger.error(f"[Autotune] Could not switch to {new.name}: {e}")
+            return None
+        with self._lock:
+            self.level = level
+            self.switched_at = self.clock() if now is None else now
+            # Carry the live/calibration ratio over so the next decision isn't made blind
+            self.observed_rtf = new.rtf * scale if old is not None and new.rtf else None
+        for i, p in enumerate(self.ladder):
+            metrics.TRANSCRIPTION_PROFILE.set(1 if i == level else 0, p.name)
+        if old is None:
+            logger.info(f"[Autotune] Starting on profile {new.name} ({reason})")
+        else:
+            logger.info(f"[Autotune] Profile {old.name} -> {new.name} ({reason})")
+        return level
+
+    def start(self, backlog_fn=None):
+        """Start the control loop; `backlog_fn()` returns the segments waiting or in flight."""
+        if backlog_fn is not None:
+            self.backlog_fn = backlog_fn
+        if self._thread is not None or len(self.ladder) < 2:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="autotune", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logger.warning(f"[Autotune] Control step failed: {e}")
@@ -0,0 +1,290 @@
+"""
+Historical backfill: re-transcribe a date range of one or more feeds.
+
+The segment grid for the range is split into small shards that are handed to a
+process pool. Each worker process loads its own warm Whisper model (with a
+configurable CPU thread count) and runs the usual download -> prefilter ->
+transcribe stages on its shard through a SegmentProcessor, which has no
+notifier or alerting machinery at all. Finished segments are
+checkpointed in a segment journal of their own, so an interrupted backfill
+picks up where it stopped when run again with the same arguments. With a
+batch size above one, a worker runs that many segments of its shard at once
+so their transcriptions share batched model calls.
+
+Workers drop to SCHED_IDLE (or a high nice value where that isn't available)
+so a backfill only ever uses CPU the live monitor isn't using.
+
+With LEASES set, every segment is claimed under a lease named after the
+checkpoint before it is run, so the same backfill started on several nodes
+splits the range between them instead of repeating it. Segments leased by
+another node are counted as "leased" and left for a later run.
+
+    python -m app.audio.backfill --start 2026-10-01 --end 2026-10-07 --feeds 30,31
+"""
+import argparse
+import os
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+from app.audio import journal
+from app.audio.journal import SegmentJournal
+from app.audio.pipeline import SegmentJob
+from app.storage.lifecycle import data_path
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_DURATION = 90
+RESULT_STATUS = {"valid": journal.DONE, "invalid": journal.INVALID, "skipped": journal.SKIPPED, "failed": journal.FAILED}
+
+# Per-process state of a pool worker, set up once by _init_worker
+_processor = None
+_leases = None
+_lease_stage = None
+
+
+def grid_slots(start, end, segment_duration=SEGMENT_DURATION, grid_offset=0):
+    """Segment start times in [start, end) on the grid anchored at grid_offset."""
+    first = (int(start) - grid_offset) // segment_duration * segment_duration + grid_offset
+    if first < start:
+        first += segment_duration
+    return list(range(first, int(end), segment_duration))
+
+
+def plan_shards(feeds, start, end, is_done, shard_size=8, segment_duration=SEGMENT_DURATION, grid_offsets=None):
+    """
+    Split the grid of every feed into shards of up to `shard_size` (feed, unixtime) pairs,
+    leaving out segments for which `is_done(feed, unixtime)` is true. Feeds are interleaved
+    so each gets a fair share of the pool.
+    """
+    per_feed = []
+    for feed in feeds:
+        offset = (grid_offsets or {}).get(feed, 0)
+        todo = [(feed, u) for u in grid_slots(start, end, segment_duration, offset) if not is_done(feed, u)]
+        per_feed.append([todo[i:i + shard_size] for i in range(0, len(todo), shard_size)])
+    shards = []
+    for i in range(max((len(s) for s in per_feed), default=0)):
+        shards.extend(s[i] for s in per_feed if i < len(s))
+    return shards
+
+
+def _lower_priority(idle, niceness):
+    if idle and hasattr(os, "sched_setscheduler") and hasattr(os, "SCHED_IDLE"):
+        try:
+            os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+            return "SCHED_IDLE"
+        except OSError as e:
+            logger.warning(f"[Backfill] Could not switch to SCHED_IDLE ({e}); using nice {niceness}.")
+    if niceness and hasattr(os, "nice"):
+        os.nice(niceness)
+        return f"nice {niceness}"
+    return "normal"
+
+
+def _init_worker(feeds, threads, idle, niceness, audio_dir, transcript_dir, batch_size=1, lease_stage=None):
+    """Pool initializer: lower priority, then load one warm model for this process."""
+    global _processor, _leases, _lease_stage
+    from app.audio.leases import LeaseStore
+    from app.audio.processor import SegmentProcessor
+    from app.audio.transcriber import TranscriptionEngine
+    logging.basicConfig(level=logging.INFO)
+    priority = _lower_priority(idle, niceness)
+    engine = TranscriptionEngine.from_env(cpu_threads=threads, num_workers=1, batch_size=batch_size)
+    engine.start()
+    _processor = SegmentProcessor(audio_dir=audio_dir, transcript_dir=transcript_dir, engine=engine, feeds=feeds)
+    _leases = LeaseStore.from_env(os.path.join(_processor.data_dir, "leases.db"))
+    _lease_stage = lease_stage
+    logger.info(f"[Backfill] Worker {os.getpid()} ready ({threads or 'auto'} threads, batch size {batch_size}, "
+                f"{priority} priority)")
+
+
+def _run_shard(shard):
+    """Download, prefilter and transcribe each segment of a shard; returns [(feed, unixtime, result, reason)]."""
+    p, leases = _processor, _leases
+    stages = [p.download_stage]
+    if p.vad_enabled:
+        stages.append(p.prefilter_stage)
+    stages.append(p.transcribe_stage)
+
+    def run(slot):
+        feed, unixtime = slot
+        if leases is not None and not leases.claim(feed, unixtime, _lease_stage):
+            return feed, unixtime, "leased", None
+        job = SegmentJob(unixtime, source="sweep", feed=feed)
+        try:
+            for stage in stages:
+                if not stage(job):
+                    break
+        except Exception as e:
+            logger.error(f"[Backfill] Feed {feed} segment {unixtime} failed: {e}")
+            job.result, job.reason = "failed", str(e)
+        if job.result == "valid":
+            # No alert stage in a backfill, so the audio is removed here
+            p.release_audio(job)
+        if leases is not None:
+            if job.result in RESULT_STATUS and job.result != "failed":
+                leases.complete(feed, unixtime, _lease_stage)
+            else:
+                leases.release(feed, unixtime, _lease_stage)
+        return feed, unixtime, job.result or "failed", job.reason
+
+    if p.engine.batch_size > 1:
+        # Concurrent segments are what lets the engine fill a batch
+        with ThreadPoolExecutor(max_workers=p.engine.batch_size) as threads:
+            results = list(threads.map(run, shard))
+    else:
+        results = [run(slot) for slot in shard]
+    # Commit the shard's transcripts before the parent checkpoints it
+    p.store.flush()
+    return results
+
+
+class Backfill:
+    """Plans a backfill over a date range and runs it on a process pool with checkpoints."""
+
+    def __init__(self, feeds, start, end, workers=2, threads=0, shard_size=8, checkpoint_path=None, redo=False,
+                 idle=True, niceness=10, audio_dir=None, transcript_dir=None, http_client=None, batch_size=1):
+        self.feeds = [str(f) for f in feeds]
+        self.start = int(start)
+        self.end = int(end)
+        self.workers = max(1, workers)
+        self.threads = threads
+        self.batch_size = max(1, batch_size)
+        self.shard_size = max(1, shard_size)
+        self.redo = redo
+        self.idle = idle
+        self.niceness = niceness
+        self.audio_dir = audio_dir or data_path("audio")
+        self.transcript_dir = transcript_dir or data_path("transcripts")
+        self.http = http_client
+        data_dir = os.path.dirname(os.path.abspath(self.transcript_dir))
+        if checkpoint_path is None:
+            # One checkpoint per model, so a model upgrade starts a fresh backfill
+            model = os.environ.get("WHISPER_MODEL", "medium").replace(os.sep, "_")
+            checkpoint_path = os.path.join(data_dir, "backfill", f"{model}.db")
+        self.checkpoint = SegmentJournal(checkpoint_path)
+        # Nodes running the same backfill share leases under the checkpoint's name
+        self.lease_stage = "backfill:" + os.path.splitext(os.path.basename(checkpoint_path))[0]
+        # The live monitor's journal: skip what it already transcribed (unless redoing) and tell it what we did
+        self.journal = SegmentJournal.from_env(os.path.join(data_dir, "segments.db"))
+        self.checkpoint.load_recent()
+        self.journal.load_recent()
+        self.counts = {"valid": 0, "invalid": 0, "skipped": 0, "failed": 0, "leased": 0}
+
+    def is_done(self, feed, unixtime):
+        if self.checkpoint.is_settled(unixtime, feed):
+            return True
+        return not self.redo and self.journal.is_settled(unixtime, feed)
+
+    def _grid_offsets(self):
+        offsets = {}
+        if self.http is None:
+            return offsets
+        for feed in self.feeds:
+            try:
+                latest = self.http.latest(feed)
+            except Exception as e:
+                logger.warning(f"[Backfill] Could not fetch latest segment for feed {feed}: {e}")
+                continue
+            if latest:
+                offsets[feed] = latest % SEGMENT_DURATION
+        return offsets
+
+    def plan(self):
+        return plan_shards(self.feeds, self.start, self.end, self.is_done, self.shard_size,
+                           grid_offsets=self._grid_offsets())
+
+    def _record(self, results):
+        for feed, unixtime, result, reason in results:
+            if result == "leased":
+                # Another node has it; not settled here, so a later run looks again
+                self.counts["leased"] += 1
+                continue
+            status = RESULT_STATUS.get(result, journal.FAILED)
+            self.checkpoint.record(unixtime, status, reason=reason, feed=feed)
+            self.journal.record(unixtime, status, reason=reason, feed=feed)
+            self.counts[result if result in self.counts else "failed"] += 1
+
+    def run(self):
+        shards = self.plan()
+        total = sum(len(s) for s in shards)
+        logger.info(f"[Backfill] {total} segments in {len(shards)} shards for feeds {', '.join(self.feeds)} "
+                    f"({self.workers} workers, checkpoint {self.checkpoint.path})")
+        if not shards:
+            return self.counts
+        t0 = time.monotonic()
+        done = 0
+        pending = set()
+        remaining = iter(shards)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.feeds, self.threads, self.idle, self.niceness, self.audio_dir,
+                                           self.transcript_dir, self.batch_size, self.lease_stage)) as pool:
+            # Keep only a couple of shards per worker queued so an interrupt loses little
+            for shard in remaining:
+                pending.add(pool.submit(_run_shard, shard))
+                if len(pending) >= 2 * self.workers:
+                    break
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        logger.error(f"[Backfill] Shard failed: {e}")
+                        continue
+                    self._record(results)
+                    done += len(results)
+                    shard = next(remaining, None)
+                    if shard is not None:
+                        pending.add(pool.submit(_run_shard, shard))
+                elapsed = time.monotonic() - t0
+                rate = done / elapsed * 60 if elapsed > 0 else 0.0
+                logger.info(f"[Backfill] {done}/{total} segments ({rate:.1f}/min) {self.counts}")
+        return self.counts
+
+
+def _parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+def main(argv=None):
+    from app.audio.http_client import ScanradClient
+    from app.audio.processor import DEFAULT_FEED, parse_feeds
+    parser = argparse.ArgumentParser(description="Re-transcribe a range of days for one or more feeds.")
+    parser.add_argument("--start", required=True, help="first day (UTC), YYYY-MM-DD")
+    parser.add_argument("--end", help="last day (UTC, inclusive), YYYY-MM-DD; defaults to --start")
+    parser.add_argument("--feeds", default=os.environ.get("FEEDS", DEFAULT_FEED), help="comma-separated feed ids")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("BACKFILL_WORKERS", 2)),
+                        help="worker processes, each with its own model")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("BACKFILL_THREADS", 0)),
+                        help="CPU threads per worker model (0 = CTranslate2 default)")
+    parser.add_argument("--shard-size", type=int, default=int(os.environ.get("BACKFILL_SHARD_SIZE", 8)))
+    parser.add_argument("--batch-size", type=int, default=int(os.environ.get("BACKFILL_BATCH_SIZE", 4)),
+                        help="segments per batched model call in each worker (1 = no batching)")
+    parser.add_argument("--checkpoint", default=os.environ.get("BACKFILL_CHECKPOINT_PATH"),
+                        help="checkpoint journal (default data/backfill/<WHISPER_MODEL>.db)")
+    parser.add_argument("--redo", action="store_true", help="re-transcribe segments the live monitor already did")
+    parser.add_argument("--nice", type=int, default=int(os.environ.get("BACKFILL_NICE", 10)))
+    parser.add_argument("--no-idle", dest="idle", action="store_false", help="don't use SCHED_IDLE, only nice")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    start = _parse_day(args.start)
+    end = _parse_day(args.end or args.start) + timedelta(days=1)
+    backfill = Backfill(parse_feeds(args.feeds), start.timestamp(), min(end.timestamp(), time.time()),
+                        workers=args.workers, threads=args.threads, shard_size=args.shard_size,
+                        checkpoint_path=args.checkpoint, redo=args.redo, idle=args.idle, niceness=args.nice,
+                        batch_size=args.batch_size,
+                        http_client=ScanradClient.from_env())
+    try:
+        counts = backfill.run()
+    except KeyboardInterrupt:
+        logger.info("[Backfill] Interrupted; run the same command again to resume.")
+        return 1
+    logger.info(f"[Backfill] Finished: {counts}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,320 @@
+"""
+Early-alert mode: provisional alerts from short chunks of the live segment.
+
+A normal alert waits for the whole 90-second segment, the adaptive backoff
+and a full Whisper run, which puts it minutes after the radio call. With
+EARLY_ALERTS=1 a single extra worker also fetches the live segment in
+EARLY_CHUNK_SECONDS pieces (scanrad's download URL takes `?t=<duration>`)
+as soon as each piece is EARLY_LAG_SECONDS old. Each piece goes through the
+speech pre-filter and a small, fast Whisper model (EARLY_WHISPER_MODEL). Its
+text is then checked with the same keyword matcher as the real alerts.
+
+- A user gets at most one early alert per segment, and none for a zone
+  already alerted within EARLY_DEDUPE_SECONDS (or an incident the alert
+  coalescer already has open).
+- When the segment's full transcript has been checked, every early alert for
+  it is settled. If the same user matched again, the regular alert is the
+  confirmation. Otherwise a short retraction is sent. Early alerts still
+  unsettled after EARLY_CONFIRM_TIMEOUT are retracted as unconfirmed.
+- The duplicate work is bounded. There is one worker, one small model, at
+  most 90 / chunk seconds fetches per segment and feed, and EARLY_MAX_ATTEMPTS
+  tries per chunk. Chunks that are more than EARLY_MAX_DELAY late are dropped
+  rather than queued up, because an early alert that late is no longer early.
+
+With leases (several nodes, see app/audio/leases.py) only the node holding
+the "early" leader lease runs early alerts. The full transcript may then be
+written by another node, so early alerts are also settled against
+transcripts found in the shared store.
+"""
+import heapq
+import io
+import os
+import threading
+import time
+import logging
+
+from app.alerts.coalescer import format_event_time, snippet
+from app.audio.http_client import InvalidAudioError
+from app.metrics import monitor as metrics
+
+logger = logging.getLogger(__name__)
+
+# The lease whose holder runs early alerts for the cluster
+LEADER_FEED, LEADER_STAGE = "*", "early-leader"
+
+
+class Provisional:
+    """An early alert waiting for the full transcript."""
+    def __init__(self, user, to, keyword, event_unixtime, sent_at):
+        self.user = user
+        self.to = to
+        self.keyword = keyword
+        self.event_unixtime = event_unixtime
+        self.sent_at = sent_at
+
+
+def user_key(user):
+    return user.get("id") or user.get("email") or user.get("phone")
+
+
+class EarlyAlerter:
+    """Fetches, transcribes and matches sub-segment chunks of live slots for provisional alerts."""
+
+    def __init__(self, http, engine, alert_manager, sender, load_users, speech_detector=None, vocabulary=None,
+                 chunk_seconds=30, lag_seconds=20, max_delay=60, max_attempts=3, retry_seconds=10,
+                 dedupe_seconds=600, confirm_timeout=1800, segment_duration=90, leases=None, transcript_lookup=None,
+                 clock=time.time):
+        self.http = http
+        self.engine = engine  # a small, separate TranscriptionEngine
+        self.alert_manager = alert_manager  # for its keyword matcher and coalescer
+        self.sender = sender  # Notifier-like: send_email(to, subject, body, feed=, event_unixtime=)
+        self.load_users = load_users  # () -> (users, version)
+        self.speech_detector = speech_detector
+        self.vocabulary = vocabulary
+        self.chunk_seconds = max(5, min(int(chunk_seconds), segment_duration))
+        self.lag_seconds = lag_seconds
+        self.max_delay = max_delay
+        self.max_attempts = max(1, max_attempts)
+        self.retry_seconds = retry_seconds
+        self.dedupe_seconds = dedupe_seconds
+        self.confirm_timeout = confirm_timeout
+        self.segment_duration = segment_duration
+        self.leases = leases
+        self.transcript_lookup = transcript_lookup  # (feed, unixtime) -> stored transcript text or None
+        self.clock = clock
+        self._heap = []  # (ready_at, feed, chunk start, attempt)
+        self._slot_floor = {}  # feed -> slot_floor(t) of its scheduler
+        self._provisional = {}  # (feed, slot) -> {user key: Provisional}
+        self._recent = {}  # (user key, zone) -> time of the last early alert
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"chunks": 0, "dropped": 0, "alerts": 0, "confirmed": 0, "retracted": 0}
+
+    @classmethod
+    def from_env(cls, http, alert_manager, sender, load_users, speech_detector=None, vocabulary=None, leases=None,
+                 transcript_lookup=None):
+        """An EarlyAlerter if EARLY_ALERTS is set, else None."""
+        if os.environ.get("EARLY_ALERTS", "0").lower() not in ("1", "true", "yes"):
+            return None
+        from app.audio.transcriber import TranscriptionEngine
+        engine = TranscriptionEngine.from_env(
+            model_size=os.environ.get("EARLY_WHISPER_MODEL", "tiny.en"),
+            num_workers=1, beam_size=1, batch_size=1,
+            cpu_threads=int(os.environ.get("EARLY_WHISPER_CPU_THREADS", 2)),
+        )
+        return cls(
+            http, engine, alert_manager, sender, load_users, speech_detector=speech_detector, vocabulary=vocabulary,
+            chunk_seconds=int(os.environ.get("EARLY_CHUNK_SECONDS", 30)),
+            lag_seconds=float(os.environ.get("EARLY_LAG_SECONDS", 20)),
+            max_delay=float(os.environ.get("EARLY_MAX_DELAY", 60)),
+            max_attempts=int(os.environ.get("EARLY_MAX_ATTEMPTS", 3)),
+            retry_seconds=float(os.environ.get("EARLY_RETRY_SECONDS", 10)),
+            dedupe_seconds=float(os.environ.get("EARLY_DEDUPE_SECONDS", 600)),
+            confirm_timeout=float(os.environ.get("EARLY_CONFIRM_TIMEOUT", 1800)),
+            leases=leases, transcript_lookup=transcript_lookup,
+        )
+
+    # --- Chunk schedule ---
+
+    def chunk_after(self, feed, start):
+        """(start, duration) of the chunk following the one starting at `start`."""
+        slot = self._slot_floor[feed](start)
+        end = start + self._duration(slot, start)
+        return end, self._duration(self._slot_floor[feed](end), end)
+
+    def current_chunk(self, feed, now):
+        """(start, duration) of the newest chunk that is at least lag_seconds old at `now`."""
+        t = now - self.lag_seconds
+        slot = self._slot_floor[feed](t)
+        start = slot + (int(t - slot) // self.chunk_seconds - 1) * self.chunk_seconds
+        if start < slot:
+            # Last chunk of the previous slot, which may be shorter
+            prev = self._slot_floor[feed](slot - 1)
+            start = prev + (self.segment_duration - 1) // self.chunk_seconds * self.chunk_seconds
+        return start, self._duration(self._slot_floor[feed](start), start)
+
+    def _duration(self, slot, start):
+        return min(self.chunk_seconds, slot + self.segment_duration - start)
+
+    def start(self, slot_floors):
+        """Start the worker for {feed: slot_floor function} (the feeds' SegmentScheduler.slot_floor)."""
+        if self._thread is not None:
+            return
+        self.engine.start()
+        now = self.clock()
+        with self._lock:
+            for feed, slot_floor in slot_floors.items():
+                self._slot_floor[str(feed)] = slot_floor
+                start, duration = self.current_chunk(str(feed), now)
+                start, duration = self.chunk_after(str(feed), start)
+                heapq.heappush(self._heap, (start + duration + self.lag_seconds, str(feed), start, 1))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="early-alerts", daemon=True)
+        self._thread.start()
+        logger.info(f"[Early] Early alerts on for feeds {', '.join(self._slot_floor)}: {self.chunk_seconds}s chunks, "
+                    f"{self.lag_seconds}s after they end, model '{self.engine.model_size}'.")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.engine.stop()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                if not self._heap:
+                    break
+                ready_at, feed, start, attempt = self._heap[0]
+            now = self.clock()
+            if ready_at > now:
+                self._stop.wait(min(ready_at - now, 5.0))
+                self.expire()
+                continue
+            with self._lock:
+                heapq.heappop(self._heap)
+                if attempt == 1:
+                    next_start, next_duration = self.chunk_after(feed, start)
+                    heapq.heappush(self._heap, (next_start + next_duration + self.lag_seconds, feed, next_start, 1))
+            if self.leases is not None and not self.leases.claim(LEADER_FEED, 0, LEADER_STAGE):
+                continue  # another node runs the early alerts; its chunks are not ours to fetch
+            if now - ready_at > self.max_delay:
+                self.stats["dropped"] += 1
+                logger.info(f"[Early] Feed {feed} chunk {start} is {now - ready_at:.0f}s late; dropping it.")
+                continue
+            try:
+                available = self.process_chunk(feed, start)
+            except Exception as e:
+                logger.warning(f"[Early] Feed {feed} chunk {start} failed: {e}")
+                available = True
+            if not available and attempt < self.max_attempts:
+                with self._lock:
+                    heapq.heappush(self._heap, (self.clock() + self.retry_seconds, feed, start, attempt + 1))
+
+    # --- Chunk processing ---
+
+    def process_chunk(self, feed, start):
+        """Fetch, transcribe and match one chunk; returns False if scanrad doesn't have it yet."""
+        slot = self._slot_floor[feed](start)
+        duration = self._duration(slot, start)
+        try:
+            status, data = self.http.fetch_audio(self.http.download_url(feed, start, duration))
+        except InvalidAudioError:
+            return False  # scanrad's "no video" page: not available yet
+        if status != 200 or not data:
+            return False
+        self.stats["chunks"] += 1
+        from app.audio.vad import decode_audio
+        audio = decode_audio(io.BytesIO(data))
+        offset = 0.0
+        if self.speech_detector is not None:
+            speech = self.speech_detector.trim(audio)
+            if not speech.has_speech:
+                return True
+            offset = speech.to_original(0.0)
+            audio = speech.audio
+        result = self.engine.transcribe(audio, name=f"early_{feed}_{start}", urgent=True)
+        text = result.get("text", "")
+        if self.vocabulary is not None:
+            text = self.vocabulary.correct(text)[0]
+        self.handle_text(feed, slot, start + offset, text)
+        return True
+
+    def handle_text(self, feed, slot, event_unixtime, text):
+        """Match a chunk's text and send each newly matched user one early alert; returns the users alerted."""
+        if not text.strip():
+            return []
+        users, version = self.load_users()
+        matcher = self.alert_manager.get_matcher(users, version=version)
+        coalescer = self.alert_manager.coalescer
+        now = self.clock()
+        alerted = []
+        for idx, match in sorted(matcher.first_match_per_user(text).items()):
+            user = match.user
+            key, to = user_key(user), user.get("email")
+            if not to:
+                continue
+            zone = match.keyword.strip().lower()
+            with self._lock:
+                pending = self._provisional.setdefault((feed, slot), {})
+                last = self._recent.get((key, zone))
+                if key in pending or (last is not None and now - last < self.dedupe_seconds):
+                    continue
+                if coalescer is not None and coalescer.is_active(key, "email", match.keyword, now):
+                    continue
+                pending[key] = Provisional(user, to, match.keyword, event_unixtime, now)
+                self._recent[(key, zone)] = now
+                self.stats["alerts"] += 1
+            subject, body = self.format_alert(feed, match.keyword, event_unixtime, text)
+            logger.info(f"[Early] Provisional '{match.keyword}' alert to {to} (feed {feed}, segment {slot}).")
+            metrics.EARLY_ALERTS.inc(feed, "sent")
+            self.sender.send_email(to, subject, body, feed=feed, event_unixtime=event_unixtime)
+            alerted.append(key)
+        return alerted
+
+    def reconcile(self, feed, slot, matches):
+        """Settle the segment's early alerts against the full transcript's `matches` (Match list)."""
+        with self._lock:
+            pending = self._provisional.pop((str(feed), slot), None)
+        if not pending:
+            return
+        confirmed = {user_key(m.user) for m in matches or ()}
+        for key, prov in pending.items():
+            if key in confirmed:
+                self.stats["confirmed"] += 1
+                metrics.EARLY_ALERTS.inc(feed, "confirmed")
+                logger.info(f"[Early] '{prov.keyword}' early alert to {prov.to} confirmed by the full transcript.")
+            else:
+                self._retract(feed, prov, "the full transcript of the segment does not mention it")
+
+    def expire(self, now=None):
+        """
+        Settle early alerts whose transcript was stored without passing through reconcile() here
+        (another node transcribed it), and retract those with no transcript after confirm_timeout.
+        """
+        now = self.clock() if now is None else now
+        if self.transcript_lookup is not None:
+            with self._lock:
+                waiting = [k for k, pending in self._provisional.items() if pending and now - k[1] > self.segment_duration]
+            for feed, slot in waiting:
+                text = self.transcript_lookup(feed, slot)
+                if text is not None:
+                    users, version = self.load_users()
+                    matcher = self.alert_manager.get_matcher(users, version=version)
+                    self.reconcile(feed, slot, list(matcher.first_match_per_user(text).values()))
+        stale = []
+        with self._lock:
+            for slot_key, pending in list(self._provisional.items()):
+                if pending and now - min(p.sent_at for p in pending.values()) < self.confirm_timeout:
+                    continue
+                del self._provisional[slot_key]
+                stale += [(slot_key[0], p) for p in pending.values()]
+            for recent_key, sent_at in list(self._recent.items()):
+                if now - sent_at >= self.dedupe_seconds:
+                    del self._recent[recent_key]
+        for feed, prov in stale:
+            self._retract(feed, prov, "the full transcript of the segment could not be checked")
+
+    def _retract(self, feed, prov, reason):
+        self.stats["retracted"] += 1
+        metrics.EARLY_ALERTS.inc(feed, "retracted")
+        logger.info(f"[Early] Retracting '{prov.keyword}' early alert to {prov.to}: {reason}.")
+        alert_env = os.environ.get("ALERT_ENV", "DEV")
+        subject = f"Midpen Monitor Alert [{alert_env}] Feed {feed} - RETRACTED"
+        body = (f"The early alert for '{prov.keyword}' at {format_event_time(prov.event_unixtime)} was not confirmed: "
+                f"{reason}. Please disregard it.")
+        self.sender.send_email(prov.to, subject, body, feed=feed)
+
+    @staticmethod
+    def format_alert(feed, keyword, event_unixtime, text):
+        alert_env = os.environ.get("ALERT_ENV", "DEV")
+        subject = f"Midpen Monitor EARLY Alert [{alert_env}] Feed {feed}"
+        body = (f"Environment: {alert_env}\n"
+                f"Feed: {feed}\n"
+                f"PDT: {format_event_time(event_unixtime)}\n"
+                f"Provisional: '{keyword}' heard in a quick transcript of the last few seconds of radio. "
+                f"The full transcript follows in a few minutes and will confirm or retract this alert.\n"
+                f"Heard: {snippet(text, keyword)}")
+        return subject, body
@@ -0,0 +1,158 @@
+"""
+Shared HTTP client for scanrad.io.
+
+One keep-alive `requests.Session` with a sized connection pool is shared by the
+download workers and the `/latest` poller, every request has connect/read
+timeouts, and audio is streamed to a temp file (or kept in memory). The HTML / magic-byte checks
+run on the first chunk so bad responses are dropped without reading the body.
+"""
+import os
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+HTML_SIGNATURES = [b'<html', b'<!doctype', b'<head', b'<body', b'no video with supported format']
+MIN_AUDIO_BYTES = 2048
+HEAD_BYTES = 512
+CHUNK_SIZE = 64 * 1024
+
+
+class InvalidAudioError(Exception):
+    """
+    Raised when scanrad returns something that is not a usable MP3.
+
+    `transient` is set when the response wasn't audio at all (scanrad's HTML
+    page for a segment that isn't available yet): worth retrying later, unlike
+    audio that arrived but failed validation.
+    """
+    def __init__(self, message, transient=False):
+        super().__init__(message)
+        self.transient = transient
+
+
+def validate_audio_head(content_type, head):
+    """Check Content-Type, HTML error pages and MP3 magic bytes on the first bytes of a response."""
+    if not content_type.startswith("audio/"):
+        raise InvalidAudioError(f"Download did not return audio! Content-Type: {content_type}. First 200 bytes: {head[:200]!r}",
+                                transient=True)
+    # Check for HTML error page masquerading as audio
+    if any(sig in head[:HEAD_BYTES].lower() for sig in HTML_SIGNATURES):
+        raise InvalidAudioError(f"Downloaded file appears to be HTML, not audio. First 200 bytes: {head[:200]!r}",
+                                transient=True)
+    # Check MP3 magic bytes (should start with 'ID3' or 0xFF 0xFB)
+    if not (head[:3] == b'ID3' or (len(head) > 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0)):
+        raise InvalidAudioError(f"Downloaded file does not appear to be a valid MP3 (bad magic bytes). First 200 bytes: {head[:200]!r}")
+
+
+class ScanradClient:
+    """Pooled, timeout-bounded client for the scanrad download and latest endpoints."""
+
+    def __init__(self, base_url="https://scanrad.io", pool_size=8, connect_timeout=5.0, read_timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            base_url=os.environ.get("SCANRAD_BASE_URL", "https://scanrad.io"),
+            pool_size=int(os.environ.get("HTTP_POOL_SIZE", 8)),
+            connect_timeout=float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5)),
+            read_timeout=float(os.environ.get("HTTP_READ_TIMEOUT", 30)),
+        )
+
+    def download_url(self, feed, unixtime, duration=90):
+        return f"{self.base_url}/download/{feed}/{unixtime}?t={duration}"
+
+    def latest_url(self, feed):
+        return f"{self.base_url}/latest/{feed}"
+
+    def _validated_chunks(self, response):
+        """Chunks of a 200 response body, raising InvalidAudioError before the first one if it isn't audio."""
+        content_type = response.headers.get("Content-Type", "")
+        content_length = response.headers.get("Content-Length")
+        # Only for audio: scanrad's short "not available yet" page is text/html and must stay transient
+        if content_type.startswith("audio/") and content_length and content_length.isdigit() \
+                and int(content_length) < MIN_AUDIO_BYTES:
+            raise InvalidAudioError(f"Downloaded audio file is too small ({content_length} bytes).")
+        chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= HEAD_BYTES:
+                break
+        validate_audio_head(content_type, head)
+        yield head
+        yield from chunks
+
+    @staticmethod
+    def _check_size(size, head):
+        if size < MIN_AUDIO_BYTES:
+            raise InvalidAudioError(f"Downloaded audio file is too small ({size} bytes). First 200 bytes: {head[:200]!r}")
+
+    def stream_audio(self, url, dest_path):
+        """
+        Stream an MP3 from `url` into `dest_path`.
+
+        Returns (status_code, bytes_written); bytes_written is 0 for non-200
+        responses. Raises InvalidAudioError if the response is not valid audio
+        and requests.RequestException on network errors. The file only appears
+        at `dest_path` once the whole body has been received and validated.
+        """
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            logger.info(f"Download response headers: {response.headers}")
+            if response.status_code != 200:
+                return response.status_code, 0
+            chunks = self._validated_chunks(response)
+            head = next(chunks)
+            part_path = dest_path + ".part"
+            size = len(head)
+            try:
+                with open(part_path, "wb") as f:
+                    f.write(head)
+                    for chunk in chunks:
+                        f.write(chunk)
+                        size += len(chunk)
+                self._check_size(size, head)
+                os.replace(part_path, dest_path)
+            finally:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+            return response.status_code, size
+
+    def fetch_audio(self, url):
+        """
+        Like stream_audio, but keep the MP3 in memory: returns (status_code, bytes),
+        with None instead of bytes for non-200 responses.
+        """
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            logger.info(f"Download response headers: {response.headers}")
+            if response.status_code != 200:
+                return response.status_code, None
+            chunks = self._validated_chunks(response)
+            head = next(chunks)
+            data = bytearray(head)
+            for chunk in chunks:
+                data += chunk
+            self._check_size(len(data), head)
+            return response.status_code, bytes(data)
+
+    def latest(self, feed):
+        """Return the unixtime of the newest segment for `feed`, or 0 if unknown."""
+        response = self.session.get(self.latest_url(feed), timeout=self.timeout)
+        if response.status_code != 200:
+            logger.warning(f"[Polling] Failed to get latest segment info: {response.status_code} {response.reason}")
+            return 0
+        latest_info = response.json()
+        if isinstance(latest_info, dict):
+            return int(latest_info.get("unixtime") or latest_info.get("timestamp") or 0)
+        if isinstance(latest_info, int):
+            return latest_info
+        logger.warning(f"[Polling] Unexpected response type: {type(latest_info)} - {latest_info}")
+        return 0
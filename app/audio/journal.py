@@ -0,0 +1,144 @@
+"""
+Durable journal of processed segments.
+
+Every segment's outcome (done, invalid, failed with an attempt count, or
+skipped as silent) is written to a small SQLite table, so a restart resumes
+from the journal with one indexed query instead of stat()-ing a transcript
+file per 90-second slot. Only a bounded window of recent segments is kept in
+memory; older lookups go to the database.
+"""
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DONE = "done"
+INVALID = "invalid"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class SegmentJournal:
+    """SQLite-backed segment status log with an in-memory window of recent slots."""
+
+    def __init__(self, path, window_seconds=2 * 86400, max_attempts=3):
+        self.path = path
+        self.window_seconds = window_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " feed TEXT NOT NULL,"
+            " unixtime INTEGER NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " reason TEXT,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (feed, unixtime)"
+            ") WITHOUT ROWID"
+        )
+        # (feed, unixtime) -> (status, attempts) for recent segments only
+        self._recent = {}
+        self._oldest_kept = 0
+
+    @classmethod
+    def from_env(cls, default_path):
+        return cls(
+            os.environ.get("SEGMENT_JOURNAL_PATH", default_path),
+            window_seconds=int(os.environ.get("JOURNAL_WINDOW_SECONDS", 2 * 86400)),
+            max_attempts=int(os.environ.get("MAX_SEGMENT_ATTEMPTS", 3)),
+        )
+
+    def is_empty(self):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM segments LIMIT 1").fetchone() is None
+
+    def load_recent(self, now=None):
+        """Load the in-memory window from disk (one indexed range query)."""
+        now = now or time.time()
+        t0 = time.monotonic()
+        with self._lock:
+            self._oldest_kept = int(now - self.window_seconds)
+            rows = self._db.execute(
+                "SELECT feed, unixtime, status, attempts FROM segments WHERE unixtime >= ?",
+                (self._oldest_kept,),
+            ).fetchall()
+            self._recent = {(feed, unixtime): (status, attempts) for feed, unixtime, status, attempts in rows}
+        logger.info(f"[Journal] Loaded {len(rows)} recent segments from {self.path} in {(time.monotonic() - t0) * 1000:.1f}ms")
+        return len(rows)
+
+    def get(self, unixtime, feed="30"):
+        """Return (status, attempts) for a segment, or (None, 0) if never seen."""
+        key = (str(feed), int(unixtime))
+        with self._lock:
+            if unixtime >= self._oldest_kept:
+                return self._recent.get(key, (None, 0))
+            row = self._db.execute(
+                "SELECT status, attempts FROM segments WHERE feed = ? AND unixtime = ?", key
+            ).fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def is_settled(self, unixtime, feed="30"):
+        """True if the segment needs no more work: done, invalid, skipped, or out of retries."""
+        status, attempts = self.get(unixtime, feed)
+        if status in (DONE, INVALID, SKIPPED):
+            return True
+        return status == FAILED and attempts >= self.max_attempts
+
+    def record(self, unixtime, status, reason=None, feed="30"):
+        key = (str(feed), int(unixtime))
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO segments (feed, unixtime, status, attempts, reason, updated_at) VALUES (?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (feed, unixtime) DO UPDATE SET status = excluded.status, "
+                "attempts = segments.attempts + 1, reason = excluded.reason, updated_at = excluded.updated_at",
+                key + (status, reason, now),
+            )
+            attempts = self._db.execute(
+                "SELECT attempts FROM segments WHERE feed = ? AND unixtime = ?", key
+            ).fetchone()[0]
+            if unixtime >= self._oldest_kept:
+                self._recent[key] = (status, attempts)
+        return attempts
+
+    def mark_done_bulk(self, unixtimes, feed="30", reason=None):
+        """Record many already-finished segments in one transaction (used for migration)."""
+        now = time.time()
+        rows = [(str(feed), int(u), DONE, 1, reason, now) for u in unixtimes]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO segments (feed, unixtime, status, attempts, reason, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.execute("COMMIT")
+            for _, u, status, attempts, _, _ in rows:
+                if u >= self._oldest_kept:
+                    self._recent.setdefault((str(feed), u), (status, attempts))
+        return len(rows)
+
+    def prune_memory(self, now=None):
+        """Drop segments that fell out of the window from memory (they stay on disk)."""
+        now = now or time.time()
+        with self._lock:
+            self._oldest_kept = int(now - self.window_seconds)
+            stale = [k for k in self._recent if k[1] < self._oldest_kept]
+            for k in stale:
+                del self._recent[k]
+        return len(stale)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._recent)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
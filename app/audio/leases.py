@@ -0,0 +1,221 @@
+"""
+Expiring leases on segment slots, so several monitor nodes can share one data volume.
+
+Before a node downloads a slot, sends its alerts or runs a backfill or
+early-alert chunk, it claims a lease on (feed, unixtime, stage) in a shared
+store. The claim succeeds only if nobody holds the lease, the lease has
+expired, or the lease is already ours. A background heartbeat renews every
+lease the node holds every `ttl / 3` seconds. A node that crashes stops
+renewing, so its leases expire after `ttl` seconds and another node reclaims
+them. When the work is finished the lease is completed, and nobody can claim
+it again. If the work should be retried later (scanrad didn't have the
+segment yet, say), the lease is released instead.
+
+Alerts take a lease of their own (stage "alert"), completed once they are
+handed to the notifier. A segment that gets transcribed twice (a node stalled
+past its lease, for example) still alerts only once across the cluster.
+
+The default backend is an SQLite table in WAL mode on the shared volume
+(LEASE_DB, default data/leases.db). WAL needs every node to be on the same
+host; for a network filesystem set LEASE_JOURNAL_MODE=DELETE. Another backend
+can be plugged in with LEASE_BACKEND=package.module:Class. The class needs
+this interface (claim, complete, release, is_taken, close) and a
+`from_env(node_id)` classmethod.
+"""
+import importlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SEGMENT = "segment"
+ALERT = "alert"
+
+
+def default_node_id():
+    return os.environ.get("NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseStore:
+    """SQLite-backed leases shared by every node that opens the same file."""
+
+    def __init__(self, path, node_id=None, ttl=120.0, retention_seconds=2 * 86400, journal_mode="WAL",
+                 clock=time.time):
+        self.path = path
+        self.node_id = node_id or default_node_id()
+        self.ttl = ttl
+        self.retention_seconds = retention_seconds
+        self.clock = clock
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " feed TEXT NOT NULL,"
+            " unixtime INTEGER NOT NULL,"
+            " stage TEXT NOT NULL,"
+            " owner TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " claims INTEGER NOT NULL DEFAULT 1,"
+            " done_at REAL,"
+            " PRIMARY KEY (feed, unixtime, stage)"
+            ") WITHOUT ROWID"
+        )
+        self._held = set()  # (feed, unixtime, stage) claimed by this node and not finished
+        self._stop = threading.Event()
+        self._thread = None
+        self.reclaimed = 0
+
+    @classmethod
+    def from_env(cls, default_path, node_id=None):
+        """A lease store if LEASES is set, else None (single-node mode)."""
+        if os.environ.get("LEASES", "0").lower() not in ("1", "true", "yes"):
+            return None
+        node_id = node_id or default_node_id()
+        backend = os.environ.get("LEASE_BACKEND", "sqlite")
+        if backend != "sqlite":
+            module, _, name = backend.partition(":")
+            return getattr(importlib.import_module(module), name).from_env(node_id)
+        store = cls(
+            os.environ.get("LEASE_DB", default_path),
+            node_id=node_id,
+            ttl=float(os.environ.get("LEASE_TTL", 120)),
+            retention_seconds=float(os.environ.get("LEASE_RETENTION_SECONDS", 2 * 86400)),
+            journal_mode=os.environ.get("LEASE_JOURNAL_MODE", "WAL"),
+        )
+        store.start()
+        logger.info(f"[Leases] Node {store.node_id} sharing work through {store.path} (TTL {store.ttl:.0f}s)")
+        return store
+
+    def claim(self, feed, unixtime, stage=SEGMENT):
+        """Take (or renew) the lease; False if another node holds it or the work is already done."""
+        key = (str(feed), int(unixtime), stage)
+        now = self.clock()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT owner, expires_at, done_at FROM leases WHERE feed = ? AND unixtime = ? AND stage = ?", key
+                ).fetchone()
+                if row is None:
+                    self._db.execute(
+                        "INSERT INTO leases (feed, unixtime, stage, owner, expires_at) VALUES (?, ?, ?, ?, ?)",
+                        key + (self.node_id, now + self.ttl))
+                elif row[2] is not None or (row[0] != self.node_id and row[1] > now):
+                    self._db.execute("COMMIT")
+                    return False
+                else:
+                    self._db.execute(
+                        "UPDATE leases SET owner = ?, expires_at = ?, claims = claims + 1 "
+                        "WHERE feed = ? AND unixtime = ? AND stage = ?", (self.node_id, now + self.ttl) + key)
+                    if row[0] != self.node_id:
+                        self.reclaimed += 1
+                        logger.warning(f"[Leases] Reclaimed expired {stage} lease on feed {feed} {unixtime} "
+                                       f"from {row[0]}")
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._held.add(key)
+        return True
+
+    def complete(self, feed, unixtime, stage=SEGMENT):
+        """Mark our lease's work finished so no node claims it again; False if the lease was lost meanwhile."""
+        key = (str(feed), int(unixtime), stage)
+        with self._lock:
+            self._held.discard(key)
+            cur = self._db.execute(
+                "UPDATE leases SET done_at = ? WHERE feed = ? AND unixtime = ? AND stage = ? AND owner = ?",
+                (self.clock(),) + key + (self.node_id,))
+        if not cur.rowcount:
+            logger.warning(f"[Leases] {stage} lease on feed {feed} {unixtime} was taken over before it completed.")
+        return cur.rowcount > 0
+
+    def release(self, feed, unixtime, stage=SEGMENT):
+        """Give an unfinished lease back so the slot can be claimed again right away."""
+        key = (str(feed), int(unixtime), stage)
+        with self._lock:
+            self._held.discard(key)
+            self._db.execute(
+                "DELETE FROM leases WHERE feed = ? AND unixtime = ? AND stage = ? AND owner = ? AND done_at IS NULL",
+                key + (self.node_id,))
+
+    def is_taken(self, feed, unixtime, stage=SEGMENT):
+        """True if the work is done or another node holds a live lease on it."""
+        key = (str(feed), int(unixtime), stage)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT owner, expires_at, done_at FROM leases WHERE feed = ? AND unixtime = ? AND stage = ?", key
+            ).fetchone()
+        if row is None:
+            return False
+        return row[2] is not None or (row[0] != self.node_id and row[1] > self.clock())
+
+    @property
+    def held(self):
+        with self._lock:
+            return len(self._held)
+
+    def renew(self):
+        """Extend every lease this node holds; returns how many were lost to another node."""
+        now = self.clock()
+        with self._lock:
+            keys = list(self._held)
+            if not keys:
+                return 0
+            self._db.execute("BEGIN IMMEDIATE")
+            lost = []
+            for key in keys:
+                cur = self._db.execute(
+                    "UPDATE leases SET expires_at = ? WHERE feed = ? AND unixtime = ? AND stage = ? AND owner = ? "
+                    "AND done_at IS NULL", (now + self.ttl,) + key + (self.node_id,))
+                if not cur.rowcount:
+                    lost.append(key)
+            self._db.execute("COMMIT")
+            self._held.difference_update(lost)
+        for feed, unixtime, stage in lost:
+            logger.warning(f"[Leases] Lost the {stage} lease on feed {feed} {unixtime} (expired and reclaimed).")
+        return len(lost)
+
+    def prune(self):
+        """Forget finished leases past the retention window."""
+        with self._lock:
+            cur = self._db.execute("DELETE FROM leases WHERE done_at IS NOT NULL AND done_at < ?",
+                                   (self.clock() - self.retention_seconds,))
+        return cur.rowcount
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._heartbeat, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self):
+        last_prune = 0.0
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                self.renew()
+                if time.monotonic() - last_prune > 3600:
+                    self.prune()
+                    last_prune = time.monotonic()
+            except Exception as e:
+                logger.warning(f"[Leases] Heartbeat failed: {e}")
+
+    def close(self):
+        """Stop renewing and hand back every unfinished lease (a clean shutdown shouldn't make others wait)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            keys = list(self._held)
+        for key in keys:
+            self.release(*key)
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,214 @@
+"""
+Staged segment pipeline: download -> [prefilter] -> transcribe -> alert.
+
+Each stage runs its own pool of worker threads and the stages are joined by
+bounded queues, so downloads overlap with transcription and a slow stage pushes
+back on the one before it instead of piling up audio on disk. The queues hand
+jobs out round-robin by feed, so one feed's backlog can't monopolize the shared
+transcription engine.
+"""
+import threading
+import time
+import logging
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentJob:
+    """One 90-second segment of one feed moving through the pipeline."""
+    def __init__(self, unixtime, source="sweep", feed="30"):
+        self.unixtime = unixtime
+        self.feed = str(feed)
+        self.source = source  # "sweep" (catch-up) or "live"
+        self.submitted_at = time.time()
+        self.audio_path = None
+        self.audio = None  # MP3 bytes when audio is kept in memory (AUDIO_IN_MEMORY=1)
+        self.transcript = None  # transcription result dict, once transcribed
+        self.speech = None  # SpeechTrim from the prefilter stage, if enabled
+        self.result = None  # "valid", "invalid", "failed" or "skipped"
+        self.reason = None
+
+    @property
+    def key(self):
+        return (self.feed, self.unixtime)
+
+    @property
+    def age(self):
+        return time.time() - self.unixtime
+
+
+class FairQueue:
+    """
+    Bounded queue that serves its keys (feeds) round-robin.
+
+    `maxsize` bounds the total across all keys, so backpressure works exactly as
+    with queue.Queue; only the order in which jobs come out is fair.
+    """
+    def __init__(self, maxsize=0, key=lambda job: job.feed):
+        self.maxsize = maxsize
+        self._key = key
+        self._queues = OrderedDict()  # key -> deque, rotated as keys are served
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            self._cond.wait_for(lambda: not self.maxsize or self._size < self.maxsize)
+            self._queues.setdefault(self._key(item), deque()).append(item)
+            self._size += 1
+            self._cond.notify_all()
+
+    def get(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._size > 0)
+            key, items = next(iter(self._queues.items()))
+            item = items.popleft()
+            # Move this key to the back so the next get serves another feed
+            del self._queues[key]
+            if items:
+                self._queues[key] = items
+            self._size -= 1
+            self._cond.notify_all()
+            return item
+
+    def qsize(self):
+        with self._cond:
+            return self._size
+
+    def depth_by_key(self):
+        with self._cond:
+            return {k: len(v) for k, v in self._queues.items()}
+
+
+class Stage:
+    """A pool of workers applying `func` to jobs from `in_queue`.
+
+    `func(job)` returns True to pass the job on to the next stage, False to
+    finish it here.
+    """
+    def __init__(self, name, func, workers, in_queue):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.in_queue = in_queue
+        self.next_stage = None
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def stats(self, elapsed):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.in_queue.qsize(),
+                "queue_by_feed": self.in_queue.depth_by_key(),
+                "queue_size": self.in_queue.maxsize,
+                "processed": self.processed,
+                "errors": self.errors,
+                "busy_seconds": round(self.busy_seconds, 1),
+                "per_minute": round(self.processed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+                "utilization": round(self.busy_seconds / (elapsed * self.workers), 2) if elapsed > 0 else 0.0,
+            }
+
+
+class SegmentPipeline:
+    """Bounded-queue pipeline of download, optional speech prefilter, transcription and alert stages."""
+
+    def __init__(self, download_fn, transcribe_fn, alert_fn, download_workers=4, transcribe_workers=1,
+                 alert_workers=1, queue_size=8, on_done=None, prefilter_fn=None, prefilter_workers=1):
+        self.on_done = on_done
+        self.stages = [Stage("download", download_fn, download_workers, FairQueue(maxsize=queue_size))]
+        if prefilter_fn is not None:
+            self.stages.append(Stage("prefilter", prefilter_fn, prefilter_workers, FairQueue(maxsize=queue_size)))
+        self.stages += [
+            Stage("transcribe", transcribe_fn, transcribe_workers, FairQueue(maxsize=queue_size)),
+            Stage("alert", alert_fn, alert_workers, FairQueue(maxsize=queue_size)),
+        ]
+        for stage, nxt in zip(self.stages, self.stages[1:]):
+            stage.next_stage = nxt
+        self._in_flight = set()
+        self._in_flight_lock = threading.Condition()
+        self._threads = []
+        self._started_at = None
+
+    def start(self):
+        if self._started_at is not None:
+            return
+        self._started_at = time.time()
+        for stage in self.stages:
+            for i in range(stage.workers):
+                t = threading.Thread(target=self._run_stage, args=(stage,), name=f"{stage.name}-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        logger.info("[Pipeline] Started: " + ", ".join(f"{s.name}={s.workers}" for s in self.stages))
+
+    def submit(self, job):
+        """Queue a job; blocks while the download queue is full. Returns False if already in flight."""
+        with self._in_flight_lock:
+            if job.key in self._in_flight:
+                return False
+            self._in_flight.add(job.key)
+        self.stages[0].in_queue.put(job)
+        return True
+
+    def is_in_flight(self, feed, unixtime):
+        with self._in_flight_lock:
+            return (str(feed), unixtime) in self._in_flight
+
+    def join(self, timeout=None):
+        """Wait until every submitted job has finished."""
+        with self._in_flight_lock:
+            return self._in_flight_lock.wait_for(lambda: not self._in_flight, timeout=timeout)
+
+    def stats(self):
+        elapsed = time.time() - self._started_at if self._started_at else 0.0
+        with self._in_flight_lock:
+            in_flight = len(self._in_flight)
+        return {
+            "in_flight": in_flight,
+            "stages": {s.name: s.stats(elapsed) for s in self.stages},
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        parts = [
+            f"{name}: q={s['queue_depth']}/{s['queue_size']} done={s['processed']} "
+            f"{s['per_minute']}/min util={s['utilization']}"
+            for name, s in stats["stages"].items()
+        ]
+        logger.info(f"[Pipeline] in_flight={stats['in_flight']} | " + " | ".join(parts))
+
+    def _run_stage(self, stage):
+        while True:
+            job = stage.in_queue.get()
+            t0 = time.monotonic()
+            try:
+                passed = stage.func(job)
+            except Exception as e:
+                logger.error(f"[Pipeline] {stage.name} stage failed for feed {job.feed} segment {job.unixtime}: {e}")
+                job.result = job.result or "failed"
+                job.reason = job.reason or f"{stage.name} error: {e}"
+                passed = False
+                with stage._lock:
+                    stage.errors += 1
+            with stage._lock:
+                stage.processed += 1
+                stage.busy_seconds += time.monotonic() - t0
+            if passed and stage.next_stage is not None:
+                # Blocks while the next stage is saturated (backpressure)
+                stage.next_stage.in_queue.put(job)
+            else:
+                self._finish(job)
+
+    def _finish(self, job):
+        try:
+            if self.on_done:
+                self.on_done(job)
+        except Exception as e:
+            logger.warning(f"[Pipeline] on_done callback failed for feed {job.feed} segment {job.unixtime}: {e}")
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.discard(job.key)
+                self._in_flight_lock.notify_all()
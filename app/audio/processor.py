@@ -1,33 +1,123 @@
+import io
 import os
 import time
 import logging
+import signal
+import threading
 import requests
-import subprocess
-from datetime import datetime, timedelta
+import json
+from datetime import datetime
+
+from app.alerts.alert_manager import AlertManager
+from app.alerts.coalescer import AlertCoalescer
+from app.audio import journal
+from app.audio.autotune import Autotuner
+from app.audio.early import EarlyAlerter
+from app.audio.journal import SegmentJournal
+from app.audio.leases import ALERT, LeaseStore
+from app.audio.http_client import InvalidAudioError, ScanradClient
+from app.audio.pipeline import SegmentJob, SegmentPipeline
+from app.audio.scheduler import AdaptiveBackoff, SegmentScheduler
+from app.audio.transcriber import TranscriptionEngine
+from app.audio.vad import SpeechDetector, decode_audio
+from app.audio.vocabulary import Vocabulary
+from app.metrics import monitor as metrics
+from app.notifications.notifier import Notifier
+from app.storage.lifecycle import AudioTracker, StorageLifecycle, data_path
+from app.transcripts.store import TranscriptStore
 
 logger = logging.getLogger(__name__)
 
-class AudioProcessor:
-    """Handles downloading and transcribing audio segments."""
-    def __init__(self, audio_dir='data/audio', transcript_dir='data/transcripts'):
-        self.audio_dir = audio_dir
-        self.transcript_dir = transcript_dir
-        os.makedirs(self.audio_dir, exist_ok=True)
-        os.makedirs(self.transcript_dir, exist_ok=True)
+DEFAULT_FEED = "30"
+# Reason of a download that failed for now (network, HTTP error, segment not available yet) rather than for good
+DOWNLOAD_FAILED = "download failed"
 
-    def download_audio(self, unixtime, duration=90):
-        import random
-        url = f"https://scanrad.io/download/30/{unixtime}?t={duration}"
+
+def parse_feeds(value):
+    """Parse a comma-separated FEEDS value into a de-duplicated list of feed ids."""
+    feeds = [f.strip() for f in (value or "").split(",") if f.strip()]
+    return list(dict.fromkeys(feeds)) or [DEFAULT_FEED]
+
+
+class SegmentProcessor:
+    """Downloads, transcribes and stores audio segments; no journal, leases or alerts (see AudioProcessor)."""
+    segment_duration = 90  # seconds (1.5 minutes)
+    autotuner = None
+
+    def __init__(self, audio_dir=None, transcript_dir=None, engine=None, http_client=None, feeds=None):
+        # Under DATA_DIR (the /app/data persistent disk in production) unless given explicitly
+        self.audio_dir = audio_dir or data_path('audio')
+        self.transcript_dir = transcript_dir or data_path('transcripts')
+        # scanrad feeds monitored by this process; each gets its own scheduler and backoff
+        self.feeds = [str(f) for f in feeds] if feeds else parse_feeds(os.environ.get('FEEDS', DEFAULT_FEED))
+        # Whisper model is loaded once and shared by every segment (see app/audio/transcriber.py)
+        self.engine = engine or TranscriptionEngine.from_env()
+        # Keep-alive session shared by the download workers and the /latest poller
+        self.http = http_client or ScanradClient.from_env()
+        self.data_dir = os.path.dirname(os.path.abspath(self.transcript_dir))
+        # Transcripts go to an indexed SQLite store (see app/transcripts/store.py); JSON files are optional
+        self.store = TranscriptStore.from_env(os.path.join(self.data_dir, 'transcripts.db'))
+        self.write_json = os.environ.get('TRANSCRIPT_JSON_FILES', '0').lower() in ('1', 'true', 'yes')
+        # Audio files are tracked as they are written so a crash never leaves them behind (see app/storage/lifecycle.py)
+        self.audio_files = AudioTracker.from_env(os.path.join(self.data_dir, 'audio_files.db'))
+        # Keep downloads in memory and decode them there instead of going through data/audio; failed segments
+        # are only written out when KEEP_FAILED_AUDIO is set
+        self.in_memory = os.environ.get('AUDIO_IN_MEMORY', '0').lower() in ('1', 'true', 'yes')
+        self.keep_failed_audio = os.environ.get('KEEP_FAILED_AUDIO', '0').lower() in ('1', 'true', 'yes')
+        # Speech pre-filter ahead of Whisper (see app/audio/vad.py)
+        self.vad_enabled = os.environ.get('VAD_ENABLED', '1').lower() not in ('0', 'false', 'no')
+        self.speech_detector = SpeechDetector.from_env()
+        self.min_audio_seconds = float(os.environ.get('MIN_AUDIO_SECONDS', 3.0))
+        self.vad_totals = {"segments": 0, "skipped": 0, "audio_seconds": 0.0, "speech_seconds": 0.0}
+        self._vad_lock = threading.Lock()
+        # Place-name corrections applied to every transcript, and fed to Whisper as hotwords (see app/audio/vocabulary.py)
+        self.vocabulary = Vocabulary.from_env()
+        self.vocabulary_hints = os.environ.get('VOCABULARY_HINTS', '1').lower() not in ('0', 'false', 'no')
+        self.refresh_vocabulary()
+        for feed in self.feeds:
+            os.makedirs(os.path.join(self.audio_dir, feed), exist_ok=True)
+            os.makedirs(os.path.join(self.transcript_dir, feed), exist_ok=True)
+
+    def audio_path(self, feed, unixtime):
+        return os.path.join(self.audio_dir, str(feed), f"audio_{unixtime}.mp3")
+
+    def transcript_path(self, feed, unixtime):
+        return os.path.join(self.transcript_dir, str(feed), f"audio_{unixtime}.json")
+
+    def download_audio(self, unixtime, duration=90, feed=DEFAULT_FEED, in_memory=False):
+        """
+        Download a segment with retries; returns its path (or its bytes if in_memory), None if it couldn't be
+        fetched right now. Raises InvalidAudioError if scanrad returned audio that isn't usable.
+        """
+        url = self.http.download_url(feed, unixtime, duration)
         logger.info(f"API URL used for download: {url}")
-        audio_path = os.path.join(self.audio_dir, f"audio_{unixtime}.mp3")
+        audio_path = self.audio_path(feed, unixtime)
+        if in_memory:
+            return self._download_with_retries(url, audio_path, feed, unixtime, in_memory=True)
+        # Tracked before the first byte lands, so even a partial file is cleaned up
+        self.audio_files.track(audio_path)
+        downloaded = None
+        try:
+            downloaded = self._download_with_retries(url, audio_path, feed, unixtime)
+        finally:
+            if downloaded is None:
+                # stream_audio only creates the file once the whole body is in, so there is nothing to clean up
+                self.audio_files.untrack(audio_path)
+        return downloaded
+
+    def _download_with_retries(self, url, audio_path, feed, unixtime, in_memory=False):
+        import random
         max_retries = 5
         base_delay = 2  # seconds
         attempt = 0
         while attempt < max_retries:
             try:
-                response = requests.get(url)
-                logger.info(f"Download response headers: {response.headers}")
-                if response.status_code == 500:
+                if in_memory:
+                    status_code, data = self.http.fetch_audio(url)
+                    size = len(data) if data else 0
+                else:
+                    status_code, size = self.http.stream_audio(url, audio_path)
+                if status_code == 500:
                     attempt += 1
                     if attempt == max_retries:
                         logger.error(f"Failed to download audio after {max_retries} attempts (500 errors) for url: {url}")
@@ -36,36 +126,20 @@ class AudioProcessor:
                     logger.warning(f"HTTP 500 error on attempt {attempt}/{max_retries}. Retrying in {delay:.1f} seconds...")
                     time.sleep(delay)
                     continue
-                elif response.status_code != 200:
-                    logger.error(f"Failed to download audio: {response.status_code} {response.reason} for url: {url}")
-                    return None
-                content_type = response.headers.get("Content-Type", "")
-                content = response.content
-                # Check content type
-                if not content_type.startswith("audio/"):
-                    logger.error(f"Download did not return audio! Content-Type: {content_type}.")
-                    logger.error(f"First 200 bytes: {content[:200]!r}")
-                    return None
-                # Check for HTML error page masquerading as audio
-                html_signatures = [b'<html', b'<!doctype', b'<head', b'<body', b'no video with supported format']
-                first_512 = content[:512].lower()
-                if any(sig in first_512 for sig in html_signatures):
-                    logger.error(f"Downloaded file appears to be HTML, not audio. Skipping segment. First 200 bytes: {content[:200]!r}")
-                    return None
-                # Check file size
-                if len(content) < 2048:
-                    logger.error(f"Downloaded audio file is too small ({len(content)} bytes).")
-                    logger.error(f"First 200 bytes: {content[:200]!r}")
+                elif status_code != 200:
+                    logger.error(f"Failed to download audio: HTTP {status_code} for url: {url}")
                     return None
-                # Check MP3 magic bytes (should start with 'ID3' or 0xFF 0xFB)
-                if not (content[:3] == b'ID3' or (len(content) > 2 and content[0] == 0xFF and (content[1] & 0xE0) == 0xE0)):
-                    logger.error(f"Downloaded file does not appear to be a valid MP3 (bad magic bytes).")
-                    logger.error(f"First 200 bytes: {content[:200]!r}")
-                    return None
-                with open(audio_path, "wb") as f:
-                    f.write(content)
-                logger.info(f"Downloaded audio to {audio_path} ({len(content)} bytes)")
+                metrics.DOWNLOAD_BYTES.observe(size, feed)
+                if in_memory:
+                    logger.info(f"Downloaded feed {feed} segment {unixtime} into memory ({size} bytes)")
+                    return data
+                logger.info(f"Downloaded audio to {audio_path} ({size} bytes)")
                 return audio_path
+            except InvalidAudioError as e:
+                if not e.transient:
+                    raise
+                logger.warning(f"{e} Not available yet.")
+                return None
             except requests.RequestException as e:
                 attempt += 1
                 if attempt == max_retries:
@@ -76,254 +150,455 @@ class AudioProcessor:
                 time.sleep(delay)
         return None
 
-    def transcribe_audio(self, audio_path):
-        base = os.path.splitext(os.path.basename(audio_path))[0]
-        json_path = os.path.join(self.transcript_dir, f"{base}.json")
-        cmd = [
-            "whisper-ctranslate2", audio_path, "--model", "medium", "--language", "en", "--output_format", "json",
-            "--output_dir", self.transcript_dir
-        ]
+    def transcribe_audio(self, audio_path, speech=None, data=None, urgent=False):
+        """
+        Transcribe a segment, optionally using its speech-trimmed audio or its in-memory MP3 `data`.
+        `urgent` (live) segments don't wait for a transcription batch to fill. Returns the result dict or None.
+        """
         try:
-            logger.info(f"Running transcription command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                logger.error(f"whisper-ctranslate2 failed (returncode={result.returncode}):\nSTDOUT: {result.stdout}\nSTDERR: {result.stderr}")
-                logger.error(f"Audio file kept for debugging: {audio_path}")
-                return False
-            if not os.path.exists(json_path):
-                logger.error(f"Transcript file {json_path} not found after transcription.\nSTDOUT: {result.stdout}\nSTDERR: {result.stderr}")
-                logger.error(f"Audio file kept for debugging: {audio_path}")
-                return False
-            logger.info(f"Transcription completed and saved to {json_path}")
-            return True
+            if speech is not None:
+                result = self.engine.transcribe(speech.audio, name=os.path.basename(audio_path), urgent=urgent)
+                # Put timestamps back on the original 90-second timeline
+                for seg in result.get("segments", []):
+                    seg["start"] = speech.to_original(seg["start"])
+                    seg["end"] = speech.to_original(seg["end"])
+                result["vad"] = speech.summary()
+            elif data is not None:
+                result = self.engine.transcribe(decode_audio(io.BytesIO(data)), name=os.path.basename(audio_path),
+                                                urgent=urgent)
+            else:
+                result = self.engine.transcribe(audio_path, urgent=urgent)
         except Exception as e:
             logger.error(f"Transcription failed: {e}\nAudio file kept for debugging: {audio_path}")
+            return None
+        return result
+
+    def refresh_vocabulary(self):
+        """Pick up edits to the vocabulary file and pass the new hints on to Whisper."""
+        if self.vocabulary.refresh() and self.vocabulary_hints:
+            self.engine.set_vocabulary(self.vocabulary.prompt, self.vocabulary.hotwords)
+
+    def correct_transcript(self, feed, unixtime, result):
+        """Vocabulary pass between Whisper and the alert check; returns the number of substitutions."""
+        count = self.vocabulary.correct_result(result)
+        if count:
+            logger.info(f"[Vocabulary] Feed {feed} segment {unixtime}: {count} substitutions")
+        return count
+
+    def _write_transcript(self, feed, unixtime, result):
+        result["feed"] = feed
+        result["unixtime"] = unixtime
+        # Committed by the store's background writer in the next batch
+        self.store.add(feed, unixtime, result)
+        if not self.write_json:
+            return True
+        json_path = self.transcript_path(feed, unixtime)
+        try:
+            with open(json_path, "w") as f:
+                json.dump(result, f)
+        except Exception as e:
+            logger.error(f"Failed to write transcript {json_path}: {e}")
+            return False
+        logger.info(f"Transcript saved to {json_path}")
+        return True
+
+    # --- Pipeline stages (see app/audio/pipeline.py) ---
+
+    def download_stage(self, job):
+        t0 = time.monotonic()
+        try:
+            if self.in_memory:
+                job.audio = self.download_audio(job.unixtime, duration=self.segment_duration, feed=job.feed,
+                                                in_memory=True)
+                # Never written unless the segment fails and KEEP_FAILED_AUDIO is set; also names the segment in logs
+                job.audio_path = self.audio_path(job.feed, job.unixtime) if job.audio is not None else None
+            else:
+                job.audio_path = self.download_audio(job.unixtime, duration=self.segment_duration, feed=job.feed)
+        except InvalidAudioError as e:
+            logger.error(f"{e} Skipping segment.")
+            job.result = 'invalid'
+            job.reason = str(e)
+            return False
+        if not job.audio_path:
+            # Network errors, HTTP errors and segments scanrad doesn't have yet: retried up to MAX_SEGMENT_ATTEMPTS
+            job.result = 'failed'
+            job.reason = DOWNLOAD_FAILED
+            return False
+        metrics.DOWNLOAD_SECONDS.observe(time.monotonic() - t0, job.feed)
+        metrics.AVAILABILITY_LAG.observe(time.time() - job.unixtime - self.segment_duration, job.feed)
+        return True
+
+    def prefilter_stage(self, job):
+        """Decode once, skip segments with no speech and trim the rest to their speech regions."""
+        try:
+            audio = decode_audio(io.BytesIO(job.audio) if job.audio is not None else job.audio_path)
+        except Exception as e:
+            logger.warning(f"[VAD] Failed to decode {job.audio_path}: {e}. Sending untrimmed audio to Whisper.")
+            return True
+        job.speech = self.speech_detector.trim(audio)
+        summary = job.speech.summary()
+        with self._vad_lock:
+            self.vad_totals["segments"] += 1
+            self.vad_totals["audio_seconds"] += job.speech.audio_seconds
+            self.vad_totals["speech_seconds"] += job.speech.speech_seconds
+        if job.speech.audio_seconds <= self.min_audio_seconds or not job.speech.has_speech:
+            reason = "audio too short" if job.speech.audio_seconds <= self.min_audio_seconds else "no speech"
+            logger.info(f"[VAD] Feed {job.feed} segment {job.unixtime}: {reason} ({job.speech.audio_seconds:.1f}s audio), skipping transcription.")
+            with self._vad_lock:
+                self.vad_totals["skipped"] += 1
+            self._write_transcript(job.feed, job.unixtime,
+                                   {"text": "", "segments": [], "language": "en", "skipped": reason, "vad": summary})
+            job.result = 'skipped'
+            job.reason = reason
+            job.speech = None
+            self.release_audio(job)
+            return False
+        logger.info(f"[VAD] Feed {job.feed} segment {job.unixtime}: {summary['speech_seconds']}s speech of {summary['audio_seconds']}s "
+                    f"({summary['saved_seconds']}s saved, {len(job.speech.regions)} regions)")
+        return True
+
+    def transcribe_stage(self, job):
+        speech, job.speech = job.speech, None  # release the PCM once handed to Whisper
+        self.refresh_vocabulary()
+        result = self.transcribe_audio(job.audio_path, speech=speech, data=job.audio, urgent=job.source == 'live')
+        if result is not None:
+            if result.get("elapsed") is not None:
+                metrics.TRANSCRIBE_SECONDS.observe(result["elapsed"], job.feed)
+            if result.get("rtf") is not None:
+                metrics.TRANSCRIBE_RTF.observe(result["rtf"], job.feed)
+            if self.autotuner is not None:
+                self.autotuner.observe(result)
+            # Cheap (one regex pass), so it runs right here rather than as a pipeline stage of its own
+            self.correct_transcript(job.feed, job.unixtime, result)
+        if result is not None and self._write_transcript(job.feed, job.unixtime, result):
+            job.transcript = result
+            job.result = 'valid'
+            job.audio = None  # the alert stage only needs the transcript
+            print(f"[{job.source.capitalize()}] Transcript written for: {job.audio_path}")
+            return True
+        job.result = 'failed'
+        job.reason = 'transcription failed'
+        if job.audio is not None:
+            if self.keep_failed_audio and self._spill_audio(job):
+                logger.warning(f"[{job.source.capitalize()}] Transcription failed; audio written to {job.audio_path} for debugging.")
+            else:
+                logger.warning(f"[{job.source.capitalize()}] Transcription failed for feed {job.feed} segment {job.unixtime}. Dropping in-memory audio.")
+            job.audio = None
+        elif job.source == 'sweep':
+            logger.warning(f"[Sweep] Transcription failed for: {job.audio_path}. Deleting audio file anyway.")
+            self._remove_audio(job.audio_path)
+        else:
+            self.audio_files.keep(job.audio_path)
+            logger.warning(f"[Live] Transcription failed for: {job.audio_path}. Audio file kept for debugging.")
+            logger.warning(f"You can manually inspect or retry transcription for: {job.audio_path}")
+        return False
+
+    def release_audio(self, job):
+        """Done with a segment's audio: drop the in-memory copy or delete the downloaded file."""
+        if self.in_memory:
+            job.audio = None
+        elif job.audio_path:
+            self._remove_audio(job.audio_path)
+
+    def _spill_audio(self, job):
+        try:
+            self.audio_files.keep(job.audio_path)
+            with open(job.audio_path, "wb") as f:
+                f.write(job.audio)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to write audio {job.audio_path}: {e}")
             return False
 
+    def _remove_audio(self, audio_path):
+        try:
+            os.remove(audio_path)
+            logger.info(f"Deleted audio file {audio_path}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to delete audio file {audio_path}: {e}")
+            return
+        self.audio_files.untrack(audio_path)
+
+    def log_vad_totals(self):
+        with self._vad_lock:
+            t = dict(self.vad_totals)
+        if not t["segments"]:
+            return
+        saved = t["audio_seconds"] - t["speech_seconds"]
+        logger.info(f"[VAD] {t['segments']} segments, {t['skipped']} skipped as silent; "
+                    f"{t['speech_seconds']/60:.1f} speech min of {t['audio_seconds']/60:.1f} audio min "
+                    f"({saved/60:.1f} min not sent to Whisper)")
+
+class AudioProcessor(SegmentProcessor):
+    """Handles downloading and transcribing audio segments."""
+
+    def __init__(self, audio_dir=None, transcript_dir=None, engine=None, http_client=None, notifier=None, feeds=None):
+        super().__init__(audio_dir, transcript_dir, engine, http_client, feeds)
+        # Optional model/decode profile switching driven by measured RTF and backlog (see app/audio/autotune.py)
+        self.autotuner = Autotuner.from_env(self.engine, feeds=len(self.feeds))
+        # Durable per-segment status (done / invalid / failed / skipped), see app/audio/journal.py
+        self.journal = SegmentJournal.from_env(os.path.join(self.data_dir, 'segments.db'))
+        # With LEASES=1, slots and their alerts are claimed in a store shared with the other nodes (see app/audio/leases.py)
+        self.leases = LeaseStore.from_env(os.path.join(self.data_dir, 'leases.db'))
+        # Archives finished days, applies retention and sweeps untracked audio (see app/storage/lifecycle.py)
+        self.lifecycle = StorageLifecycle.from_env(self.store, self.data_dir, self.feeds,
+                                                   transcript_dir=self.transcript_dir, leases=self.leases,
+                                                   audio=self.audio_files)
+        # Alerts are delivered in the background so a slow mail relay never stalls transcription
+        self.notifier = notifier or Notifier.from_env()
+        # Repeat hits on a zone during an incident are merged into digests, and sends are capped per user
+        self.coalescer = AlertCoalescer.from_env(self.notifier, alert_log=self.store)
+        self.alert_manager = AlertManager(notifier=self.notifier, alert_log=self.store, coalescer=self.coalescer,
+                                          vocabulary=self.vocabulary)
+        # Optional provisional alerts from short chunks of the live segment (see app/audio/early.py)
+        self.early = EarlyAlerter.from_env(self.http, self.alert_manager, self.notifier, self._load_users,
+                                           speech_detector=self.speech_detector if self.vad_enabled else None,
+                                           vocabulary=self.vocabulary, leases=self.leases,
+                                           transcript_lookup=self._stored_text)
+
+    @staticmethod
+    def _load_users():
+        from app.users import user_store
+        users = user_store.load_users()
+        return users, user_store.registry.version
+
+    def _stored_text(self, feed, unixtime):
+        """Text of a committed transcript (possibly written by another node), or None."""
+        transcript = self.store.get(feed, unixtime, with_segments=False)
+        return None if transcript is None else transcript.get("text") or ""
+
+    def alert_stage(self, job):
+        if self.leases is not None and not self.leases.claim(job.feed, job.unixtime, ALERT):
+            # Transcribed twice (e.g. after a lease expired); the other copy sends the alerts
+            logger.info(f"[Leases] Alerts for feed {job.feed} segment {job.unixtime} are handled by another node.")
+            self.release_audio(job)
+            return True
+        try:
+            from app.users import user_store
+            transcript_text = job.transcript.get("text", "")
+            users = user_store.load_users()
+            logger.info(f"[Alert Debug] Checking alerts for {len(users)} users on feed {job.feed}. Transcript snippet: {transcript_text[:120]}")
+            t0 = time.monotonic()
+            matches = self.alert_manager.check_transcript(transcript_text, users, alert_type="email",
+                                                          event_unixtime=job.unixtime,
+                                                          users_version=user_store.registry.version, feed=job.feed,
+                                                          segments=job.transcript.get("segments"))
+            metrics.MATCH_SECONDS.observe(time.monotonic() - t0, job.feed)
+            if self.early is not None:
+                self.early.reconcile(job.feed, job.unixtime, matches)
+        except Exception as e:
+            logger.warning(f"Error during alert check: {e}")
+        if self.leases is not None:
+            self.leases.complete(job.feed, job.unixtime, ALERT)
+        self.release_audio(job)
+        return True
+
+    def build_pipeline(self, on_done=None):
+        return SegmentPipeline(
+            self.download_stage,
+            self.transcribe_stage,
+            self.alert_stage,
+            download_workers=int(os.environ.get('PIPELINE_DOWNLOAD_WORKERS', 4)),
+            # Enough transcription workers to keep every model worker's batch full; the engine is sized to the cores
+            transcribe_workers=self.engine.num_workers * self.engine.batch_size,
+            alert_workers=int(os.environ.get('PIPELINE_ALERT_WORKERS', 1)),
+            queue_size=int(os.environ.get('PIPELINE_QUEUE_SIZE', 8)),
+            on_done=on_done,
+            prefilter_fn=self.prefilter_stage if self.vad_enabled else None,
+            prefilter_workers=int(os.environ.get('PIPELINE_PREFILTER_WORKERS', 1)),
+        )
+
+    @staticmethod
+    def _transcript_unixtimes(directory):
+        unixtimes = []
+        for name in os.listdir(directory):
+            base, ext = os.path.splitext(name)
+            if ext == ".json" and base.startswith("audio_") and base[6:].isdigit():
+                unixtimes.append(int(base[6:]))
+        return unixtimes
+
+    def load_journal(self):
+        """Open the segment journal, importing existing transcript files on first use."""
+        if self.journal.is_empty():
+            # Transcripts from before multi-feed support sit directly in transcript_dir and are all feed 30
+            found = {DEFAULT_FEED: self._transcript_unixtimes(self.transcript_dir)}
+            for feed in os.listdir(self.transcript_dir):
+                feed_dir = os.path.join(self.transcript_dir, feed)
+                if os.path.isdir(feed_dir):
+                    found.setdefault(feed, []).extend(self._transcript_unixtimes(feed_dir))
+            for feed, unixtimes in found.items():
+                if unixtimes:
+                    self.journal.mark_done_bulk(unixtimes, feed=feed, reason="imported from transcript files")
+                    logger.info(f"[Journal] Imported {len(unixtimes)} existing feed {feed} transcripts into {self.journal.path}")
+        self.journal.load_recent()
+
     def run_monitoring_loop(self, start_day=None):
         """
-        Hybrid monitoring loop:
-        1. On startup, sweep through all possible segments for the current day to catch up on missed segments.
-        2. After sweep, enter a polling loop that requests https://scanrad.io/latest/30 every 5s, and only processes new segments as they become available.
-        3. Periodically deletes orphaned .mp3 files in the background.
+        Scheduler-driven monitoring loop, one scheduler thread per feed in FEEDS:
+        1. On startup, resume from the segment journal and queue every due slot that isn't settled yet (the sweep).
+        2. Then sleep until the next 90-second slot passes the feed's adaptive backoff age and queue it, along with any
+           slots missed earlier (failed fetches, restarts), oldest- or newest-first per SCHEDULER_POLICY.
+        3. In the background, deletes audio files left behind and archives finished days of transcripts
+           (see app/storage/lifecycle.py).
+
+        All feeds share one staged download/transcribe/alert pipeline (and so one Whisper model); its queues serve the
+        feeds round-robin so a feed with a long backlog can't starve the others.
         """
-        import threading
-        import time
-        from collections import deque
-
-        # Adaptive backoff parameters
-        import os
-        backoff_seconds = 300  # Start at 5 min
-        min_backoff = 180      # Minimum 3 min
-        max_backoff = int(os.environ.get('MAX_BACKOFF_SECONDS', 900))  # Maximum, env override
-        logger.info(f"[AdaptiveBackoff] max_backoff set to {max_backoff//60}m ({max_backoff}s) via environment or default.")
-        window_size = 10
-        recent_results = deque(maxlen=window_size)
-
-        def log_backoff_change(new_backoff, reason, window):
-            logger.info(f"[AdaptiveBackoff] Backoff now {new_backoff//60}m ({new_backoff}s) due to {reason}. Window: {list(window)}")
-
-        def update_backoff():
-            nonlocal backoff_seconds
-            invalid_count = recent_results.count('invalid')
-            if invalid_count > 2 and backoff_seconds < max_backoff:
-                backoff_seconds = min(backoff_seconds + 60, max_backoff)
-                log_backoff_change(backoff_seconds, f"{invalid_count} invalid in last {window_size}", recent_results)
-            elif invalid_count == 0 and len(recent_results) == window_size and backoff_seconds > min_backoff:
-                backoff_seconds = max(backoff_seconds - 30, min_backoff)
-                log_backoff_change(backoff_seconds, "all valid in window", recent_results)
-
-        def record_result(result, unixtime, age, reason=None):
-            recent_results.append(result)
-            if result == 'valid':
-                logger.info(f"[AdaptiveBackoff] Segment {unixtime} (age: {int(age)}s): valid")
-            else:
-                logger.info(f"[AdaptiveBackoff] Segment {unixtime} (age: {int(age)}s): invalid ({reason})")
-            update_backoff()
+        self.lifecycle.start()
 
-        def periodic_cleanup():
-            try:
-                from scripts.cleanup_orphaned_audio import main as cleanup_orphaned_audio
-            except ImportError:
-                # fallback to subprocess if import fails
-                import subprocess
-                import os
-                def cleanup_orphaned_audio():
-                    script_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../scripts/cleanup_orphaned_audio.py'))
-                    subprocess.run(["python3", script_path])
-            while True:
-                cleanup_orphaned_audio()
-                time.sleep(3600)  # every hour
-        threading.Thread(target=periodic_cleanup, daemon=True).start()
+        # Pick the model and decode settings for this machine before loading the model
+        if self.autotuner is not None:
+            self.autotuner.calibrate()
+        # Load the Whisper model up front so the first segment doesn't pay for it
+        self.engine.start()
 
-        segment_duration = 90  # seconds (1.5 minutes)
         if start_day:
             try:
-                current_start_dt = datetime.strptime(start_day, "%Y-%m-%d")
+                start_dt = datetime.strptime(start_day, "%Y-%m-%d")
             except ValueError:
                 logger.error("AUDIO_DAY must be in YYYY-MM-DD format.")
                 return
         else:
-            current_start_dt = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-
-        start_dt = current_start_dt
-        end_dt = start_dt + timedelta(days=1)
-        logger.info(f"Starting monitoring for day: {start_dt.date()}")
-        processed = set()
-
-        # --- Sweep: process all missing segments for the day so far ---
-        # Configurable max segment age for sweep (default: 1 hour)
-        max_segment_age = int(os.environ.get('MAX_SEGMENT_AGE_SECONDS', 3600))
-        sweep_fail_count = 0
-        for dt in self.daterange(start_dt, datetime.utcnow(), timedelta(seconds=segment_duration)):
-            unixtime = int(dt.timestamp())
-            json_path = os.path.join(self.transcript_dir, f"audio_{unixtime}.json")
-            if os.path.exists(json_path):
-                processed.add(unixtime)
-                continue
-            segment_age = time.time() - unixtime
-            now_dt = datetime.utcfromtimestamp(time.time())
-            lag_seconds = int(time.time() - unixtime)
-            lag_minutes = lag_seconds // 60
-            logger.info(f"[Sweep] Segment {dt.isoformat()} (unixtime {unixtime}) | Now: {now_dt.isoformat()} | Lag: {lag_seconds}s ({lag_minutes}m)")
-            # Skip segments older than max_segment_age
-            if segment_age > max_segment_age:
-                logger.info(f"[Sweep] Segment {unixtime} is too old (age: {int(segment_age)}s), skipping (max allowed: {max_segment_age}s)")
-                continue
-            if segment_age < backoff_seconds:
-                logger.info(f"[Sweep] Segment {unixtime} is too recent (age: {int(segment_age)}s), waiting at least {backoff_seconds//60} minutes before processing.")
-                continue
-            logger.info(f"[Sweep] Processing segment at {dt.isoformat()} (unixtime {unixtime})")
-            audio_path = self.download_audio(unixtime, duration=segment_duration)
-            if not audio_path:
-                record_result('invalid', unixtime, segment_age, reason='download failed or invalid audio')
-                sweep_fail_count += 1
-                if sweep_fail_count % 10 == 1:
-                    logger.warning(f"[Sweep] Failed to download segment at {dt.isoformat()} (failure #{sweep_fail_count})")
-                processed.add(unixtime)
-                continue
-            success = self.transcribe_audio(audio_path)
-            if success:
-                print(f"[Sweep] Transcript (json) written for: {audio_path}")
-                processed.add(unixtime)
-                record_result('valid', unixtime, segment_age)
-                # --- Alert logic ---
-                try:
-                    import json
-                    from app.alerts.alert_manager import AlertManager
-                    from app.users import user_store
-                    base = os.path.splitext(os.path.basename(audio_path))[0]
-                    json_path = os.path.join(self.transcript_dir, f"{base}.json")
-                    with open(json_path, "r") as f:
-                        transcript_data = json.load(f)
-                    transcript_text = transcript_data.get("text", "")
-                    users = user_store.load_users()
-                    alert_manager = AlertManager()
-                    for user in users:
-                        logger.info(f"[Alert Debug] Checking alerts for user: {user.get('email')}")
-                        logger.info(f"[Alert Debug] User zones: {user.get('zones', [])}, keywords: {user.get('keywords', [])}")
-                        logger.info(f"[Alert Debug] Transcript snippet: {transcript_text[:120]}")
-                        alert_manager.check_and_trigger(transcript_text, user, alert_type="email", event_unixtime=unixtime)
-                except Exception as e:
-                    logger.warning(f"Error during alert check: {e}")
-                try:
-                    os.remove(audio_path)
-                    logger.info(f"Deleted audio file {audio_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete audio file {audio_path}: {e}")
-            else:
-                logger.warning(f"[Sweep] Transcription failed for: {audio_path}. Deleting audio file anyway.")
-                try:
-                    os.remove(audio_path)
-                    logger.info(f"Deleted audio file {audio_path} after failed transcription.")
-                except Exception as e:
-                    logger.warning(f"Failed to delete audio file {audio_path} after failed transcription: {e}")
-
-        # --- Polling: monitor for new segments in real time ---
-        logger.info("[POLLING] Initial sweep complete. Entering polling mode for new segments.")
-        print("[POLLING] Initial sweep complete. Entering polling mode for new segments.")
+            start_dt = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        logger.info(f"Starting monitoring for day: {start_dt.date()}, feeds: {', '.join(self.feeds)}")
+        # Resume from the on-disk journal instead of stat()-ing every slot
+        self.load_journal()
+
+        backoffs = {feed: AdaptiveBackoff.from_env(feed=feed) for feed in self.feeds}
+        pipeline = self.build_pipeline(
+            on_done=lambda job: self.on_segment_done(job, backoffs[job.feed], schedulers.get(job.feed)))
+        pipeline.start()
+        schedulers = {}
+        for feed in self.feeds:
+            scheduler = schedulers[feed] = SegmentScheduler(
+                backoffs[feed],
+                is_settled=lambda u, feed=feed: self.journal.is_settled(u, feed),
+                # Slots another node holds a lease on (or finished) count as in flight here
+                is_in_flight=lambda u, feed=feed: pipeline.is_in_flight(feed, u) or (
+                    self.leases is not None and self.leases.is_taken(feed, u)),
+                segment_duration=self.segment_duration,
+                # Configurable max segment age for catch-up (default: 1 hour)
+                lookback_seconds=int(os.environ.get('MAX_SEGMENT_AGE_SECONDS', 3600)),
+                policy=os.environ.get('SCHEDULER_POLICY', 'newest'),
+                # First retry of a failed slot after this long, doubling with each attempt
+                retry_seconds=int(os.environ.get('SEGMENT_RETRY_SECONDS', 120)),
+                start_time=int(start_dt.timestamp()),
+                feed=feed,
+            )
+            threading.Thread(target=self._run_feed, args=(feed, scheduler, pipeline), name=f"feed-{feed}", daemon=True).start()
+        if self.early is not None:
+            self.early.start({feed: scheduler.slot_floor for feed, scheduler in schedulers.items()})
+        if self.autotuner is not None:
+            # Backlog: segments in the pipeline plus due slots still waiting to be queued
+            self.autotuner.start(lambda: pipeline.stats()["in_flight"] +
+                                 sum(len(s.due_slots()) for s in schedulers.values()))
+
+        if threading.current_thread() is threading.main_thread():
+            # Docker and Render stop the service with SIGTERM: shut down as on Ctrl-C
+            signal.signal(signal.SIGTERM, self._on_sigterm)
         try:
-            last_heartbeat = time.time()
             heartbeat_interval = 300  # 5 minutes in seconds
             while True:
-                try:
-                    response = requests.get("https://scanrad.io/latest/30", timeout=10)
-                    if response.status_code == 200:
-                        latest_info = response.json()
-                        if isinstance(latest_info, dict):
-                            latest_unixtime = int(latest_info.get("unixtime") or latest_info.get("timestamp") or 0)
-                        elif isinstance(latest_info, int):
-                            latest_unixtime = latest_info
-                        else:
-                            logger.warning(f"[Polling] Unexpected response type: {type(latest_info)} - {latest_info}")
-                            latest_unixtime = 0
-                        if latest_unixtime and latest_unixtime not in processed:
-                            import time
-                            age = time.time() - latest_unixtime
-                            if age < backoff_seconds:
-                                logger.info(f"[Polling] Segment {latest_unixtime} is too recent (age: {int(age)}s), waiting at least {backoff_seconds//60} minutes before processing.")
-                                time.sleep(30)  # Sleep 30s to reduce log spam and unnecessary polling
-                                continue
-                            logger.info(f"[Polling] New segment detected: unixtime {latest_unixtime}")
-                            audio_path = self.download_audio(latest_unixtime, duration=segment_duration)
-                            if not audio_path:
-                                record_result('invalid', latest_unixtime, age, reason='download failed or invalid audio')
-                                logger.warning(f"[Polling] Failed to download segment: {latest_unixtime}")
-                                processed.add(latest_unixtime)
-                                continue
-                            try:
-                                from mutagen.mp3 import MP3
-                                audio = MP3(audio_path)
-                                if audio.info.length <= 3.0:
-                                    logger.info(f"[Skip] Audio segment {latest_unixtime} is {audio.info.length:.2f}s (open key event?), skipping transcription.")
-                                    continue
-                            except Exception as e:
-                                logger.warning(f"[Polling] Failed to check audio duration for {audio_path}: {e}")
-                            success = self.transcribe_audio(audio_path)
-                            if success:
-                                print(f"[Polling] Transcript (json) written for: {audio_path}")
-                                processed.add(latest_unixtime)
-                                record_result('valid', latest_unixtime, age)
-                                # --- Alert logic ---
-                                try:
-                                    import json
-                                    from app.alerts.alert_manager import AlertManager
-                                    from app.users import user_store
-                                    base = os.path.splitext(os.path.basename(audio_path))[0]
-                                    json_path = os.path.join(self.transcript_dir, f"{base}.json")
-                                    with open(json_path, "r") as f:
-                                        transcript_data = json.load(f)
-                                    transcript_text = transcript_data.get("text", "")
-                                    users = user_store.load_users()
-                                    alert_manager = AlertManager()
-                                    for user in users:
-                                        logger.info(f"[Alert Debug] Checking alerts for user: {user.get('email')}")
-                                        logger.info(f"[Alert Debug] User zones: {user.get('zones', [])}, keywords: {user.get('keywords', [])}")
-                                        logger.info(f"[Alert Debug] Transcript snippet: {transcript_text[:120]}")
-                                        alert_manager.check_and_trigger(transcript_text, user, alert_type="email", event_unixtime=latest_unixtime)
-                                except Exception as e:
-                                    logger.warning(f"Error during alert check: {e}")
-                                try:
-                                    os.remove(audio_path)
-                                    logger.info(f"Deleted audio file {audio_path}")
-                                except Exception as e:
-                                    logger.warning(f"Failed to delete audio file {audio_path}: {e}")
-                            else:
-                                logger.warning(f"[Polling] Transcription failed for: {audio_path}. Audio file kept for debugging.")
-                                logger.warning(f"You can manually inspect or retry transcription for: {audio_path}")
-                    else:
-                        logger.warning(f"[Polling] Failed to get latest segment info: {response.status_code} {response.reason}")
-                except Exception as e:
-                    logger.warning(f"[Polling] Exception during latest segment polling: {e}")
+                time.sleep(heartbeat_interval)
                 # --- Heartbeat log ---
-                now = time.time()
-                if now - last_heartbeat > heartbeat_interval:
-                    logger.info("[POLLING] Still active, waiting for new segments...")
-                    print("[POLLING] Still active, waiting for new segments...")
-                    last_heartbeat = now
-                time.sleep(5)
+                logger.info("[Scheduler] Still active, waiting for new segments...")
+                print("[Scheduler] Still active, waiting for new segments...")
+                pipeline.log_stats()
+                self.log_vad_totals()
+                self.journal.prune_memory()
         except KeyboardInterrupt:
-            logger.info("Polling loop interrupted by user. Exiting.")
+            logger.info("Monitoring loop interrupted. Exiting.")
+            # Don't lose the transcripts still waiting for the next batch, or the alerts held for a digest
+            self.store.flush()
+            self.coalescer.stop()
+            self.notifier.flush(timeout=30)
+            self.lifecycle.stop()
+            if self.leases is not None:
+                self.leases.close()
+
+    @staticmethod
+    def _on_sigterm(signum, frame):
+        raise KeyboardInterrupt
+
+    def _run_feed(self, feed, scheduler, pipeline):
+        """Scheduler loop for one feed: startup sweep, then queue slots as they come due."""
+        backoff = scheduler.backoff
+        self._align_grid(feed, scheduler)
+
+        def submit(unixtime):
+            age = time.time() - unixtime
+            # Anything older than a couple of slots past the backoff is catch-up work
+            source = 'live' if age < backoff.seconds + 2 * self.segment_duration else 'sweep'
+            if self.leases is not None and not self.leases.claim(feed, unixtime):
+                return False
+            logger.info(f"[Scheduler {feed}] Queueing {source} segment {unixtime} (age: {int(age)}s, backoff: {backoff.seconds}s)")
+            # Blocks while the pipeline is full
+            return pipeline.submit(SegmentJob(unixtime, source=source, feed=feed))
+
+        queued = scheduler.run_once(submit)
+        logger.info(f"[Scheduler {feed}] Startup sweep queued {queued} segments. Waiting for new segments on the {self.segment_duration}s grid.")
+        print(f"[Scheduler {feed}] Startup sweep queued {queued} segments. Waiting for new segments on the {self.segment_duration}s grid.")
+        last_align = time.time()
+        align_interval = 300
+        while True:
+            scheduler.wait_for_next()
+            try:
+                scheduler.run_once(submit)
+            except Exception as e:
+                logger.warning(f"[Scheduler {feed}] Exception while queueing due segments: {e}")
+            if time.time() - last_align > align_interval:
+                self._align_grid(feed, scheduler)
+                last_align = time.time()
+
+    def _align_grid(self, feed, scheduler):
+        """Keep the slot grid aligned with what scanrad reports as the feed's latest segment."""
+        try:
+            latest = self.http.latest(feed)
+        except Exception as e:
+            logger.warning(f"[Scheduler {feed}] Could not fetch latest segment to align the grid: {e}")
+            return
+        if latest:
+            scheduler.set_grid_offset(latest)
+
+    def on_segment_done(self, job, backoff, scheduler=None):
+        """Pipeline completion hook: journal the outcome, feed the feed's adaptive backoff and space out retries."""
+        if job.result in ('valid', 'skipped'):
+            # Journaling the slot settles it (and completes its lease), so its transcript must be on disk first
+            try:
+                self.store.ensure_committed(job.feed, job.unixtime)
+            except Exception as e:
+                logger.error(f"Feed {job.feed} segment {job.unixtime}: transcript could not be stored: {e}")
+                job.result, job.reason = 'failed', f"transcript not stored: {e}"
+        metrics.SEGMENTS.inc(job.feed, job.result or 'failed')
+        if job.result == 'valid':
+            self.journal.record(job.unixtime, journal.DONE, feed=job.feed)
+            backoff.record_result('valid', job.unixtime, job.age)
+        elif job.result == 'invalid':
+            self.journal.record(job.unixtime, journal.INVALID, reason=job.reason, feed=job.feed)
+            backoff.record_result('invalid', job.unixtime, job.age, reason=job.reason)
+            logger.warning(f"[{job.source.capitalize()}] Failed to download feed {job.feed} segment: {job.unixtime}")
+        elif job.result == 'skipped':
+            self.journal.record(job.unixtime, journal.SKIPPED, reason=job.reason, feed=job.feed)
+            if self.early is not None:
+                # No speech in the full segment, so nothing confirms an early alert for it
+                self.early.reconcile(job.feed, job.unixtime, [])
+        elif job.result == 'failed':
+            attempts = self.journal.record(job.unixtime, journal.FAILED, reason=job.reason, feed=job.feed)
+            if job.reason == DOWNLOAD_FAILED:
+                backoff.record_result('invalid', job.unixtime, job.age, reason=job.reason)
+            if attempts >= self.journal.max_attempts:
+                logger.warning(f"Feed {job.feed} segment {job.unixtime} failed {attempts} times; giving up on it.")
+            elif scheduler is not None:
+                # Back off before the next attempt, so an outage doesn't use up every attempt at once
+                scheduler.defer(job.unixtime, attempts)
+        if self.leases is not None:
+            # Settled slots are finished cluster-wide; anything to retry goes back to whichever node gets to it first
+            if self.journal.is_settled(job.unixtime, job.feed):
+                self.leases.complete(job.feed, job.unixtime)
+            else:
+                self.leases.release(job.feed, job.unixtime)
 
     @staticmethod
     def daterange(start_dt, end_dt, delta):
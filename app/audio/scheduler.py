@@ -0,0 +1,172 @@
+"""
+Gap-aware scheduling on the 90-second segment grid.
+
+Instead of polling `/latest` every few seconds and only ever looking at the
+newest segment, the scheduler knows the segment grid and computes every slot
+that is old enough to be available (older than the adaptive backoff), not yet
+settled in the journal and not already in flight. It then sleeps until the
+next slot crosses the backoff age. Slots missed because of a failed fetch or a
+slow pipeline are picked up on the next pass instead of being lost.
+"""
+import os
+import threading
+import time
+import logging
+from collections import deque
+
+from app.metrics import monitor as metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveBackoff:
+    """
+    How long after its start a segment is assumed to be downloadable.
+
+    Grows by a minute when more than two of the last `window_size` segments were
+    invalid (not available yet), and shrinks by 30s when a full window was valid.
+    """
+
+    def __init__(self, initial=300, min_backoff=180, max_backoff=900, window_size=10, feed=None):
+        self.feed = feed
+        self.seconds = initial
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.window_size = window_size
+        self.recent_results = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    @classmethod
+    def from_env(cls, feed=None):
+        backoff = cls(
+            initial=int(os.environ.get('INITIAL_BACKOFF_SECONDS', 300)),  # Start at 5 min
+            min_backoff=int(os.environ.get('MIN_BACKOFF_SECONDS', 180)),  # Minimum 3 min
+            max_backoff=int(os.environ.get('MAX_BACKOFF_SECONDS', 900)),  # Maximum, env override
+            feed=feed,
+        )
+        logger.info(f"{backoff._tag} max_backoff set to {backoff.max_backoff//60}m ({backoff.max_backoff}s) via environment or default.")
+        return backoff
+
+    @property
+    def _tag(self):
+        return f"[AdaptiveBackoff {self.feed}]" if self.feed is not None else "[AdaptiveBackoff]"
+
+    def on_change(self, callback):
+        """Register `callback(new_seconds)` to run whenever the backoff moves."""
+        self._listeners.append(callback)
+
+    def _log_change(self, reason):
+        logger.info(f"{self._tag} Backoff now {self.seconds//60}m ({self.seconds}s) due to {reason}. Window: {list(self.recent_results)}")
+
+    def _update(self):
+        invalid_count = self.recent_results.count('invalid')
+        if invalid_count > 2 and self.seconds < self.max_backoff:
+            self.seconds = min(self.seconds + 60, self.max_backoff)
+            self._log_change(f"{invalid_count} invalid in last {self.window_size}")
+            return True
+        if invalid_count == 0 and len(self.recent_results) == self.window_size and self.seconds > self.min_backoff:
+            self.seconds = max(self.seconds - 30, self.min_backoff)
+            self._log_change("all valid in window")
+            return True
+        return False
+
+    def record_result(self, result, unixtime, age, reason=None):
+        with self._lock:
+            self.recent_results.append(result)
+            if result == 'valid':
+                logger.info(f"{self._tag} Segment {unixtime} (age: {int(age)}s): valid")
+            else:
+                logger.info(f"{self._tag} Segment {unixtime} (age: {int(age)}s): invalid ({reason})")
+            changed = self._update()
+            seconds = self.seconds
+        metrics.BACKOFF_RESULTS.inc(self.feed, result)
+        metrics.BACKOFF_SECONDS.set(seconds, self.feed)
+        if changed:
+            for callback in self._listeners:
+                callback(seconds)
+
+
+class SegmentScheduler:
+    """Computes due-but-unprocessed slots on the segment grid and wakes when the next one is due."""
+
+    def __init__(self, backoff, is_settled, is_in_flight, segment_duration=90, lookback_seconds=3600,
+                 policy="newest", start_time=0, grid_offset=0, max_sleep=60.0, retry_seconds=120, clock=time.time,
+                 feed=None):
+        self.feed = feed
+        self.backoff = backoff
+        self.is_settled = is_settled
+        self.is_in_flight = is_in_flight
+        self.segment_duration = segment_duration
+        self.lookback_seconds = lookback_seconds
+        self.policy = policy  # "newest" (live first) or "oldest" (chronological catch-up)
+        self.start_time = start_time  # never schedule slots before this (e.g. AUDIO_DAY midnight)
+        self.grid_offset = grid_offset
+        self.max_sleep = max_sleep
+        self.retry_seconds = retry_seconds
+        self._not_before = {}  # failed slot -> earliest time to try it again
+        self._retry_lock = threading.Lock()
+        self.clock = clock
+        self._wakeup = threading.Event()
+        # A backoff change moves every due time, so re-plan immediately
+        backoff.on_change(lambda _: self.wake())
+
+    def wake(self):
+        self._wakeup.set()
+
+    def slot_floor(self, t):
+        """Start of the grid slot containing time t."""
+        return int((t - self.grid_offset) // self.segment_duration * self.segment_duration + self.grid_offset)
+
+    def set_grid_offset(self, latest_unixtime):
+        """Align the grid to a segment timestamp reported by scanrad."""
+        offset = latest_unixtime % self.segment_duration
+        if offset != self.grid_offset:
+            tag = f"[Scheduler {self.feed}]" if self.feed is not None else "[Scheduler]"
+            logger.info(f"{tag} Segment grid offset {self.grid_offset}s -> {offset}s (from latest {latest_unixtime})")
+            self.grid_offset = offset
+
+    def defer(self, unixtime, attempts):
+        """Hold a failed slot back before its next attempt: `retry_seconds`, doubling with every attempt."""
+        with self._retry_lock:
+            self._not_before[unixtime] = self.clock() + self.retry_seconds * 2 ** max(0, attempts - 1)
+
+    def due_slots(self, now=None):
+        """Slots at least `backoff` old, inside the lookback window, not settled, not in flight and not deferred."""
+        now = self.clock() if now is None else now
+        newest = self.slot_floor(now - self.backoff.seconds)
+        lower = max(now - self.lookback_seconds, self.start_time)
+        oldest = self.slot_floor(lower)
+        if oldest < lower:
+            oldest += self.segment_duration
+        with self._retry_lock:
+            for unixtime in [u for u in self._not_before if u < oldest]:
+                del self._not_before[unixtime]
+            deferred = {u for u, at in self._not_before.items() if at > now}
+        slots = [u for u in range(oldest, newest + 1, self.segment_duration)
+                 if u not in deferred and not self.is_settled(u) and not self.is_in_flight(u)]
+        if self.policy == "newest":
+            slots.reverse()
+        return slots
+
+    def next_due_at(self, now=None):
+        """Time at which the next not-yet-due slot passes the backoff age."""
+        now = self.clock() if now is None else now
+        next_slot = self.slot_floor(now - self.backoff.seconds) + self.segment_duration
+        return next_slot + self.backoff.seconds
+
+    def wait_for_next(self, now=None):
+        """Sleep until the next slot is due (or wake() is called); returns seconds slept."""
+        now = self.clock() if now is None else now
+        delay = min(max(0.0, self.next_due_at(now) - now), self.max_sleep)
+        self._wakeup.wait(delay)
+        self._wakeup.clear()
+        return delay
+
+    def run_once(self, submit, now=None):
+        """Hand every due slot to `submit(unixtime)`; returns how many were submitted."""
+        count = 0
+        for unixtime in self.due_slots(now):
+            if submit(unixtime):
+                count += 1
+        return count
@@ -0,0 +1,89 @@
+import time
+
+import numpy as np
+
+from app.audio.autotune import Autotuner, Profile, build_ladder
+
+COST = {"medium": 0.04, "small": 0.02, "base": 0.01}  # seconds per audio second at beam 5
+
+
+class FakeModel:
+    def __init__(self, model_size, compute_type):
+        self.cost = COST[model_size] * (1.5 if compute_type == "float32" else 1.0)
+
+    def transcribe(self, audio, language=None, beam_size=5):
+        time.sleep(self.cost * (1 if beam_size > 1 else 0.5) * len(audio) / 16000)
+        return iter([]), None
+
+
+class FakeEngine:
+    language = "en"
+    model_size = "medium"
+
+    def __init__(self):
+        self.num_workers = 1
+        self.profile = None
+        self.switches = []
+
+    def build_model(self, model_size, compute_type, cpu_threads, num_workers=None):
+        return FakeModel(model_size, compute_type)
+
+    def reconfigure(self, model_size, compute_type, beam_size, cpu_threads, profile=None):
+        self.profile = profile
+        self.switches.append(profile)
+
+
+def make_tuner(ladder, backlog):
+    engine = FakeEngine()
+    tuner = Autotuner(engine, backlog_fn=lambda: backlog[0], feeds=1, min_dwell=300, clock=lambda: 0.0)
+    tuner.ladder = ladder
+    tuner._apply(0, "test", now=0.0)
+    return tuner, engine
+
+
+def test_ladder_keeps_only_faster_profiles_below_the_budget():
+    profiles = [Profile("medium", "float32", 5, rtf=1.2), Profile("medium", "int8", 5, rtf=0.7),
+                Profile("medium", "int8", 1, rtf=0.75), Profile("small", "int8", 5, rtf=0.4),
+                Profile("base", "int8", 1, rtf=0.1)]
+    ladder = build_ladder(profiles, budget=0.8)
+    assert [p.name for p in ladder] == ["medium-int8-b5", "small-int8-b5", "base-int8-b1"]
+    assert [p.name for p in build_ladder(profiles, budget=0.05)] == ["base-int8-b1"]
+
+
+def test_steps_down_on_backlog_and_back_up_once_drained():
+    backlog = [10]
+    ladder = [Profile("medium", "int8", 5, rtf=0.6), Profile("small", "int8", 5, rtf=0.3)]
+    tuner, engine = make_tuner(ladder, backlog)
+    assert tuner.tick(now=100) is None  # within the dwell time
+    assert tuner.tick(now=400) == 1 and engine.profile == "small-int8-b5"
+    backlog[0] = 0
+    assert tuner.tick(now=500) is None
+    # Live audio runs twice as slow as calibration: medium would be 1.2, over the 0.8 budget
+    for _ in range(20):
+        tuner.observe({"rtf": 0.6, "profile": "small-int8-b5"})
+    tuner.observe({"rtf": 5.0, "profile": "medium-int8-b5"})  # finished on the old profile; ignored
+    assert tuner.tick(now=800) is None
+    tuner.observed_rtf = 0.3
+    assert tuner.tick(now=800) == 0 and engine.switches == ["medium-int8-b5", "small-int8-b5", "medium-int8-b5"]
+
+
+def test_observed_rtf_over_budget_steps_down_without_a_full_backlog():
+    backlog = [2]
+    ladder = [Profile("medium", "int8", 5, rtf=0.6), Profile("small", "int8", 5, rtf=0.3)]
+    tuner, engine = make_tuner(ladder, backlog)
+    tuner.observe({"rtf": 0.95, "profile": "medium-int8-b5"})
+    assert tuner.tick(now=301) == 1
+
+
+def test_calibration_measures_and_caches(tmp_path):
+    engine = FakeEngine()
+    cache = str(tmp_path / "autotune.json")
+    tuner = Autotuner(engine, feeds=1, models=["medium", "small", "base"], compute_types=["int8", "float32"],
+                      beams=[5, 1], headroom=0.8, sample_seconds=1, cache_path=cache)
+    top = tuner.calibrate()
+    assert top.name == "medium-float32-b5"  # everything fits the budget, so the most accurate wins
+    assert [p.model_size for p in tuner.ladder][-1] == "base"
+    assert all(a.rtf > b.rtf for a, b in zip(tuner.ladder, tuner.ladder[1:]))
+    again = Autotuner(FakeEngine(), feeds=1, models=["medium", "small", "base"], compute_types=["int8", "float32"],
+                      beams=[5, 1], sample_seconds=1, cache_path=cache)
+    assert again._load_cache() is not None and again.calibrate().name == top.name
@@ -0,0 +1,89 @@
+from app.audio import backfill, journal
+from app.audio.backfill import Backfill, grid_slots, plan_shards
+from app.audio.leases import LeaseStore
+
+
+def test_grid_slots_follow_offset():
+    assert grid_slots(1000, 1300, 90, grid_offset=30) == [1020, 1110, 1200, 1290]
+    assert grid_slots(1020, 1110, 90, grid_offset=30) == [1020]
+
+
+def test_plan_shards_skips_done_and_interleaves_feeds():
+    done = {("30", 90), ("31", 0)}
+    shards = plan_shards(["30", "31"], 0, 450, lambda feed, u: (feed, u) in done, shard_size=2)
+    assert shards == [
+        [("30", 0), ("30", 180)], [("31", 90), ("31", 180)],
+        [("30", 270), ("30", 360)], [("31", 270), ("31", 360)],
+    ]
+    assert plan_shards(["30"], 0, 90, lambda feed, u: True) == []
+
+
+class FakeProcessor:
+    """Stands in for a worker's SegmentProcessor: slot 90 fails to download, slot 180 raises."""
+    vad_enabled = False
+
+    def __init__(self):
+        self.engine = type("Engine", (), {"batch_size": 1})()
+        self.store = self
+        self.flushes = 0
+        self.released = []
+
+    def download_stage(self, job):
+        if job.unixtime == 90:
+            job.result, job.reason = "failed", "download failed"
+            return False
+        if job.unixtime == 180:
+            raise RuntimeError("boom")
+        return True
+
+    def transcribe_stage(self, job):
+        job.result = "valid"
+        return True
+
+    def release_audio(self, job):
+        self.released.append(job.unixtime)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def new_backfill(tmp_path, **kwargs):
+    return Backfill(["30"], 0, 450, shard_size=2, checkpoint_path=str(tmp_path / "backfill" / "small.db"),
+                    audio_dir=str(tmp_path / "audio"), transcript_dir=str(tmp_path / "transcripts"), **kwargs)
+
+
+def test_run_shard_reports_each_segment_and_settles_its_lease(tmp_path, monkeypatch):
+    processor = FakeProcessor()
+    path = str(tmp_path / "leases.db")
+    ours, theirs = LeaseStore(path, node_id="a"), LeaseStore(path, node_id="b")
+    assert theirs.claim("30", 270, "backfill:small")
+    monkeypatch.setattr(backfill, "_processor", processor)
+    monkeypatch.setattr(backfill, "_leases", ours)
+    monkeypatch.setattr(backfill, "_lease_stage", "backfill:small")
+
+    results = backfill._run_shard([("30", 0), ("30", 90), ("30", 180), ("30", 270)])
+    assert results == [("30", 0, "valid", None), ("30", 90, "failed", "download failed"),
+                       ("30", 180, "failed", "boom"), ("30", 270, "leased", None)]
+    assert processor.released == [0] and processor.flushes == 1
+    # Finished slots stay claimed; failed ones are handed back for another node or run
+    assert not theirs.claim("30", 0, "backfill:small")
+    assert theirs.claim("30", 90, "backfill:small") and theirs.claim("30", 180, "backfill:small")
+
+
+def test_checkpoint_resumes_with_unsettled_segments_only(tmp_path, monkeypatch):
+    monkeypatch.delenv("SEGMENT_JOURNAL_PATH", raising=False)
+    first = new_backfill(tmp_path)
+    assert [u for shard in first.plan() for _, u in shard] == [0, 90, 180, 270, 360]
+    first._record([("30", 0, "valid", None), ("30", 90, "failed", "download failed"),
+                   ("30", 180, "leased", None), ("30", 270, "invalid", "bad audio")])
+    assert first.counts == {"valid": 1, "invalid": 1, "skipped": 0, "failed": 1, "leased": 1}
+    # The live monitor's journal hears about what the backfill settled
+    assert first.journal.get(0, "30")[0] == journal.DONE
+
+    # Rerun: failed slots still have attempts left and leased ones were never recorded
+    resumed = new_backfill(tmp_path)
+    assert [u for shard in resumed.plan() for _, u in shard] == [90, 180, 360]
+    resumed.journal.record(360, journal.DONE, feed="30")
+    assert [u for shard in new_backfill(tmp_path).plan() for _, u in shard] == [90, 180]
+    # Redo ignores the live journal, not the backfill's own checkpoint
+    assert [u for shard in new_backfill(tmp_path, redo=True).plan() for _, u in shard] == [90, 180, 360]
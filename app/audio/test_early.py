@@ -0,0 +1,79 @@
+from app.alerts.alert_manager import AlertManager
+from app.alerts.coalescer import AlertCoalescer, AlertHit
+from app.audio.early import EarlyAlerter
+
+SLOT = 1_000_080  # on the 90-second grid
+
+USERS = [
+    {"id": "a", "email": "a@example.com", "zones": ["Teague Hill"]},
+    {"id": "b", "email": "b@example.com", "zones": ["Rancho San Antonio"]},
+]
+
+
+class FakeClock:
+    def __init__(self, now=SLOT + 30.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingSender:
+    def __init__(self):
+        self.sent = []
+
+    def send_email(self, email, subject, message, feed=None, event_unixtime=None):
+        self.sent.append((email, subject, message))
+
+
+def make(coalescer=None):
+    clock, sender = FakeClock(), RecordingSender()
+    manager = AlertManager(fuzzy=False, coalescer=coalescer)
+    early = EarlyAlerter(None, None, manager, sender, lambda: (USERS, 1), clock=clock)
+    early._slot_floor["30"] = lambda t: int(t) // 90 * 90
+    return early, sender, clock
+
+
+def test_chunk_schedule_follows_the_segment_grid():
+    early, _, _ = make()
+    # 30 s into the slot, with a 20 s lag, only the previous slot's last chunk is ready
+    assert early.current_chunk("30", SLOT + 30) == (SLOT - 30, 30)
+    assert early.current_chunk("30", SLOT + 50) == (SLOT, 30)
+    assert early.chunk_after("30", SLOT + 60) == (SLOT + 90, 30)
+    early.chunk_seconds = 40
+    assert early.chunk_after("30", SLOT + 40) == (SLOT + 80, 10)  # the last piece is clipped to the slot
+
+
+def test_early_alert_is_sent_once_and_confirmed():
+    early, sender, clock = make()
+    slot = SLOT
+    assert early.handle_text("30", slot, slot + 5, "units to teague hill gate") == ["a"]
+    assert early.handle_text("30", slot, slot + 35, "teague hill again") == []
+    assert len(sender.sent) == 1 and "EARLY" in sender.sent[0][1]
+    matches = early.alert_manager.get_matcher(USERS, version=1).first_match_per_user("teague hill").values()
+    early.reconcile("30", slot, list(matches))
+    assert early.stats["confirmed"] == 1 and len(sender.sent) == 1
+    # Still inside the dedupe window on the next segment
+    assert early.handle_text("30", slot + 90, slot + 95, "teague hill") == []
+
+
+def test_unconfirmed_early_alert_is_retracted():
+    early, sender, clock = make()
+    slot = SLOT
+    early.handle_text("30", slot, slot, "rancho san antonio parking lot")
+    early.reconcile("30", slot, [])
+    assert "RETRACTED" in sender.sent[-1][1] and sender.sent[-1][0] == "b@example.com"
+
+    early.handle_text("30", slot + 90, slot + 90, "teague hill")
+    clock.now += early.confirm_timeout
+    early.expire()
+    assert early.stats["retracted"] == 2 and not early._provisional
+
+
+def test_no_early_alert_for_an_open_incident():
+    coalescer = AlertCoalescer(RecordingSender(), window_seconds=600, max_per_hour=0)
+    early, sender, clock = make(coalescer)
+    coalescer.clock = clock
+    coalescer._thread = object()
+    coalescer.submit(AlertHit("a", "email", "a@example.com", "Teague Hill", "teague hill", "subject", "body"))
+    assert early.handle_text("30", SLOT, SLOT, "teague hill") == []
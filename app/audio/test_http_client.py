@@ -0,0 +1,114 @@
+import pytest
+
+from app.audio.http_client import CHUNK_SIZE, InvalidAudioError, ScanradClient
+
+MP3 = b"ID3" + b"\x00" * 5000
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200, content_type="audio/mpeg", headers=None, payload=None):
+        self.body = body
+        self.status_code = status_code
+        self.reason = "Not Found" if status_code == 404 else "OK"
+        self.headers = {"Content-Type": content_type, **(headers or {})}
+        self.payload = payload
+        self.chunks_read = 0
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            self.chunks_read += 1
+            yield self.body[i:i + chunk_size]
+
+    def json(self):
+        return self.payload
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+
+    def get(self, url, stream=False, timeout=None):
+        self.calls.append((url, stream, timeout))
+        return self.response
+
+
+def client_for(response):
+    client = ScanradClient()
+    client.session = FakeSession(response)
+    return client
+
+
+def test_fetch_audio_keeps_body_in_memory(tmp_path):
+    assert client_for(FakeResponse(MP3)).fetch_audio("http://x/download/30/1") == (200, MP3)
+    assert client_for(FakeResponse(b"", status_code=500)).fetch_audio("http://x") == (500, None)
+
+
+def test_fetch_audio_rejects_html_and_short_bodies():
+    # Scanrad's page for a segment it doesn't have yet is worth retrying; a truncated MP3 is not
+    with pytest.raises(InvalidAudioError) as html:
+        client_for(FakeResponse(b"<html>no video with supported format</html>" + b" " * 4000)).fetch_audio("http://x")
+    assert html.value.transient
+    with pytest.raises(InvalidAudioError) as short:
+        client_for(FakeResponse(b"ID3" + b"\x00" * 600)).fetch_audio("http://x")
+    assert not short.value.transient
+
+
+def test_stream_audio_writes_file(tmp_path):
+    dest = tmp_path / "audio_1.mp3"
+    assert client_for(FakeResponse(MP3)).stream_audio("http://x", str(dest)) == (200, len(MP3))
+    assert dest.read_bytes() == MP3
+
+
+def test_one_pooled_session_with_timeouts_on_every_request():
+    client = ScanradClient(base_url="http://scanrad.test/", pool_size=12, connect_timeout=2, read_timeout=20)
+    adapter = client.session.get_adapter("http://scanrad.test/download/30/1")
+    assert adapter is client.session.get_adapter("https://scanrad.io/latest/30")
+    assert adapter._pool_maxsize == 12
+    assert client.download_url("30", 900) == "http://scanrad.test/download/30/900?t=90"
+
+    client.session = FakeSession(FakeResponse(MP3, payload={"unixtime": 990}))
+    client.fetch_audio(client.download_url("30", 900))
+    client.latest("30")
+    assert client.session.calls == [("http://scanrad.test/download/30/900?t=90", True, (2, 20)),
+                                    ("http://scanrad.test/latest/30", False, (2, 20))]
+
+
+def test_bad_responses_are_dropped_after_the_first_chunk():
+    html = FakeResponse(b"<!DOCTYPE html><html>" + b" " * (4 * CHUNK_SIZE))
+    with pytest.raises(InvalidAudioError):
+        client_for(html).fetch_audio("http://x")
+    assert html.chunks_read == 1
+    # A short Content-Length is refused before any of the body is read
+    short = FakeResponse(MP3, headers={"Content-Length": "100"})
+    with pytest.raises(InvalidAudioError):
+        client_for(short).fetch_audio("http://x")
+    assert short.chunks_read == 0
+    # ...but a short page that isn't audio is still the transient "not available yet" case
+    page = b"<html>no video with supported format</html>"
+    not_ready = FakeResponse(page, content_type="text/html", headers={"Content-Length": str(len(page))})
+    with pytest.raises(InvalidAudioError) as error:
+        client_for(not_ready).fetch_audio("http://x")
+    assert error.value.transient
+
+
+def test_stream_audio_leaves_no_file_for_failed_downloads(tmp_path):
+    dest = tmp_path / "audio_1.mp3"
+    assert client_for(FakeResponse(b"", status_code=404)).stream_audio("http://x", str(dest)) == (404, 0)
+    with pytest.raises(InvalidAudioError):
+        client_for(FakeResponse(b"ID3" + b"\x00" * 600)).stream_audio("http://x", str(dest))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_latest_reads_dict_or_int_and_falls_back_to_zero():
+    assert client_for(FakeResponse(b"", payload={"unixtime": 990})).latest("30") == 990
+    assert client_for(FakeResponse(b"", payload={"timestamp": 1080})).latest("30") == 1080
+    assert client_for(FakeResponse(b"", payload=1170)).latest("30") == 1170
+    assert client_for(FakeResponse(b"", payload="soon")).latest("30") == 0
+    assert client_for(FakeResponse(b"", status_code=404)).latest("30") == 0
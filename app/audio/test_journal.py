@@ -0,0 +1,34 @@
+from app.audio import journal
+from app.audio.journal import SegmentJournal
+
+
+def test_statuses_survive_restart_and_count_attempts(tmp_path):
+    path = str(tmp_path / "segments.db")
+    j = SegmentJournal(path, max_attempts=2)
+    j.load_recent(now=10_000)
+    j.record(9_000, journal.DONE)
+    j.record(9_090, journal.INVALID, reason="html error page")
+    j.record(9_180, journal.SKIPPED, reason="no speech")
+    assert j.record(9_270, journal.FAILED) == 1
+    j.close()
+
+    j = SegmentJournal(path, max_attempts=2)
+    assert j.load_recent(now=10_000) == 4
+    assert j.is_settled(9_000) and j.is_settled(9_090) and j.is_settled(9_180)
+    assert not j.is_settled(9_270)
+    assert j.get(9_270) == (journal.FAILED, 1)
+    assert j.record(9_270, journal.FAILED) == 2
+    assert j.is_settled(9_270)
+    assert not j.is_settled(9_360)
+    assert not j.is_settled(9_000, feed="31")
+
+
+def test_memory_window_is_bounded_but_disk_is_not(tmp_path):
+    j = SegmentJournal(str(tmp_path / "segments.db"), window_seconds=1_000)
+    j.load_recent(now=5_000)
+    j.mark_done_bulk(range(4_000, 5_000, 90))
+    assert len(j) == 12
+    assert j.prune_memory(now=5_500) == 6
+    assert len(j) == 6
+    # evicted from memory, still answered from disk
+    assert j.is_settled(4_000)
@@ -0,0 +1,71 @@
+from app.audio import leases
+from app.audio.leases import LeaseStore
+
+
+class FakeClock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def two_nodes(tmp_path, clock):
+    path = str(tmp_path / "leases.db")
+    return (LeaseStore(path, node_id="a", ttl=60, clock=clock),
+            LeaseStore(path, node_id="b", ttl=60, clock=clock))
+
+
+def test_one_node_at_a_time_and_done_is_done(tmp_path):
+    clock = FakeClock()
+    a, b = two_nodes(tmp_path, clock)
+    assert a.claim("30", 9_000)
+    assert a.claim("30", 9_000)  # our own lease renews
+    assert not b.claim("30", 9_000)
+    assert b.is_taken("30", 9_000) and not a.is_taken("30", 9_000)
+    # Stages are independent leases on the same slot
+    assert b.claim("30", 9_000, leases.ALERT)
+    assert a.complete("30", 9_000)
+    assert a.held == 0
+    clock.now += 1_000
+    assert not b.claim("30", 9_000)
+    assert a.is_taken("30", 9_000)
+
+
+def test_released_lease_is_free_at_once(tmp_path):
+    a, b = two_nodes(tmp_path, FakeClock())
+    assert a.claim("30", 9_090)
+    a.release("30", 9_090)
+    assert b.claim("30", 9_090)
+    # Releasing someone else's lease does nothing
+    a.release("30", 9_090)
+    assert not a.claim("30", 9_090)
+
+
+def test_expired_lease_is_reclaimed_unless_renewed(tmp_path):
+    clock = FakeClock()
+    a, b = two_nodes(tmp_path, clock)
+    assert a.claim("30", 9_000) and a.claim("30", 9_090)
+    clock.now += 45
+    assert a.renew() == 0
+    clock.now += 45
+    assert not b.claim("30", 9_000)  # renewed 45s ago, still live
+    clock.now += 30
+    assert b.claim("30", 9_000)
+    assert b.reclaimed == 1
+    # The original holder notices on its next heartbeat and can't complete the work
+    assert a.renew() == 1
+    assert not a.complete("30", 9_000)
+    assert b.complete("30", 9_000)
+
+
+def test_close_hands_back_unfinished_leases_and_prune_forgets_old_ones(tmp_path):
+    clock = FakeClock()
+    a, b = two_nodes(tmp_path, clock)
+    assert a.claim("30", 9_000) and a.claim("30", 9_090)
+    a.complete("30", 9_000)
+    a.close()
+    assert b.claim("30", 9_090)
+    clock.now += b.retention_seconds + 1
+    assert b.prune() == 1
+    assert b.claim("30", 9_000)
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.audio import processor as processor_module
+from app.audio.http_client import InvalidAudioError
+from app.audio.processor import SegmentProcessor
+
+
+class FakeHttp:
+    """Answers stream_audio with the queued responses: status codes, or exceptions to raise."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def download_url(self, feed, unixtime, duration=90):
+        return f"http://scanrad.test/download/{feed}/{unixtime}?t={duration}"
+
+    def stream_audio(self, url, dest_path):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        if response == 200:
+            with open(dest_path, "wb") as f:
+                f.write(b"ID3")
+        return response, 3 if response == 200 else 0
+
+
+@pytest.fixture
+def make_processor(tmp_path, monkeypatch):
+    monkeypatch.delenv("AUDIO_TRACKER_DB", raising=False)
+    monkeypatch.setattr(processor_module.time, "sleep", lambda seconds: None)
+    made = []
+
+    def make(*responses):  # one per test: processors on the same tmp_path share the tracker database
+        engine = SimpleNamespace(set_vocabulary=lambda prompt, hotwords: None)
+        p = SegmentProcessor(audio_dir=str(tmp_path / "audio"), transcript_dir=str(tmp_path / "transcripts"),
+                             engine=engine, http_client=FakeHttp(*responses), feeds=["30"])
+        made.append(p)
+        return p
+
+    yield make
+    for p in made:
+        p.store.close()
+        p.audio_files.close()
+
+
+def test_only_downloaded_files_stay_tracked(make_processor):
+    p = make_processor(500, 200, 404, InvalidAudioError("not yet", transient=True))
+    assert p.download_audio(900, feed="30") == p.audio_path("30", 900)
+    assert p.download_audio(990, feed="30") is None
+    assert p.download_audio(1080, feed="30") is None
+    assert len(p.audio_files) == 1
+
+
+def test_exhausted_retries_and_bad_audio_leave_no_tracker_rows(make_processor):
+    p = make_processor(*[500] * 5, InvalidAudioError("bad magic bytes"))
+    assert p.download_audio(900, feed="30") is None
+    with pytest.raises(InvalidAudioError):
+        p.download_audio(990, feed="30")
+    assert len(p.audio_files) == 0
@@ -0,0 +1,84 @@
+from app.audio.scheduler import AdaptiveBackoff, SegmentScheduler
+
+NOW = 1_700_000_000 - 1_700_000_000 % 90 + 30  # 30s into a grid slot
+
+
+def make_scheduler(settled=(), in_flight=(), policy="oldest", backoff_seconds=300, lookback=1800, **kwargs):
+    backoff = AdaptiveBackoff(initial=backoff_seconds)
+    return SegmentScheduler(backoff, lambda u: u in settled, lambda u: u in in_flight,
+                            lookback_seconds=lookback, policy=policy, clock=lambda: NOW, **kwargs)
+
+
+def test_due_slots_cover_gaps_in_the_lookback_window():
+    sched = make_scheduler()
+    slots = sched.due_slots()
+    assert all(u % 90 == 0 for u in slots)
+    assert slots[-1] == sched.slot_floor(NOW - 300)
+    assert slots[0] >= NOW - 1800
+    assert len(slots) == len(range(slots[0], slots[-1] + 1, 90))
+
+    settled = set(slots[::2])
+    in_flight = {slots[1]}
+    remaining = make_scheduler(settled=settled, in_flight=in_flight).due_slots()
+    assert remaining == [u for u in slots if u not in settled and u not in in_flight]
+
+
+def test_policy_orders_newest_or_oldest_first():
+    oldest = make_scheduler(policy="oldest").due_slots()
+    newest = make_scheduler(policy="newest").due_slots()
+    assert newest == list(reversed(oldest))
+
+
+def test_start_time_and_grid_offset():
+    sched = make_scheduler(start_time=NOW - 600)
+    assert min(sched.due_slots()) >= NOW - 600
+    sched.set_grid_offset(NOW - 30 + 45)
+    assert sched.grid_offset == 45
+    assert all(u % 90 == 45 for u in sched.due_slots())
+
+
+def test_wakes_exactly_when_next_slot_passes_backoff():
+    sched = make_scheduler()
+    next_slot = sched.slot_floor(NOW - 300) + 90
+    assert sched.next_due_at() == next_slot + 300
+    assert next_slot not in sched.due_slots()
+    assert next_slot in sched.due_slots(now=next_slot + 300)
+
+
+def test_backoff_adapts_and_wakes_scheduler():
+    backoff = AdaptiveBackoff(initial=300, min_backoff=180, max_backoff=420, window_size=4)
+    sched = SegmentScheduler(backoff, lambda u: False, lambda u: False, clock=lambda: NOW)
+    for i in range(3):
+        backoff.record_result('invalid', i, 100)
+    assert backoff.seconds == 360
+    assert sched._wakeup.is_set()
+    # still 3 invalid in the window after the first valid result -> capped at max
+    backoff.record_result('valid', 3, 400)
+    assert backoff.seconds == 420
+    for i in range(4, 7):
+        backoff.record_result('valid', i, 400)
+    assert backoff.seconds == 390
+
+
+def test_slots_failed_in_an_outage_are_retried_after_it(tmp_path):
+    from app.audio import journal
+    from app.audio.journal import SegmentJournal
+    j = SegmentJournal(str(tmp_path / "segments.db"), max_attempts=3)
+    j.load_recent(now=NOW)
+    clock = [NOW]
+    sched = SegmentScheduler(AdaptiveBackoff(initial=300), lambda u: j.is_settled(u), lambda u: False,
+                             lookback_seconds=7200, policy="oldest", retry_seconds=120, clock=lambda: clock[0])
+    # scanrad is down: every due slot fails its download, as on_segment_done records it
+    outage = sched.due_slots()
+    for _ in range(2):
+        for u in sched.due_slots():
+            sched.defer(u, j.record(u, journal.FAILED, reason="download failed"))
+        assert sched.due_slots() == []
+        clock[0] += 300
+    # Back up: the recovery pass picks up every gap still inside the lookback window
+    recovery = sched.due_slots()
+    gaps = {u for u in outage if u >= clock[0] - 7200}
+    assert len(gaps) > 60 and gaps <= set(recovery)
+    for u in recovery:
+        j.record(u, journal.DONE)
+    assert sched.due_slots() == []
@@ -0,0 +1,185 @@
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.audio.transcriber import SAMPLE_RATE, TranscriptionEngine
+
+
+class FakeBatched:
+    """Returns one Whisper segment per clip, 0.2 s after its start, so the mapping back can be checked."""
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, clip_timestamps, **kwargs):
+        self.calls.append(clip_timestamps)
+        segments = [SimpleNamespace(id=i + 1, seek=0, start=round(c["start"] + 0.2, 3), end=round(c["end"] - 0.1, 3),
+                                    text=f" clip {i}", tokens=[], temperature=0.0, avg_logprob=-0.1,
+                                    compression_ratio=1.0, no_speech_prob=0.0)
+                    for i, c in enumerate(clip_timestamps)]
+        return iter(segments), SimpleNamespace(language="en")
+
+
+def item(name, urgent=False):
+    return (np.zeros(SAMPLE_RATE, dtype=np.float32), name, Future(), urgent)
+
+
+def test_batch_is_split_back_per_segment_with_timestamps():
+    engine = TranscriptionEngine(batch_size=4)
+    engine._batched = FakeBatched()
+    pcms = [np.zeros(45 * SAMPLE_RATE, dtype=np.float32), np.zeros(10 * SAMPLE_RATE, dtype=np.float32)]
+    first, second = engine._transcribe_batch_in_process(pcms, ["a", "b"])
+    # The 45 s segment is cut into a 30 s and a 15 s clip; one call covers all three clips
+    assert len(engine._batched.calls) == 1 and len(engine._batched.calls[0]) == 3
+    assert [round(s["start"], 3) for s in first["segments"]] == [0.2, 30.2]
+    assert round(first["segments"][1]["end"], 3) == 44.9
+    assert first["text"] == " clip 0 clip 1" and first["duration"] == 45.0
+    assert [round(s["start"], 3) for s in second["segments"]] == [0.2]
+    assert second["text"] == " clip 2"
+
+
+def test_next_batch_takes_queued_segments_and_waits_only_for_sweep():
+    engine = TranscriptionEngine(batch_size=4, batch_wait_ms=100)
+    for name in "abc":
+        engine._queue.put(item(name))
+    t0 = time.monotonic()
+    batch = engine._next_batch()
+    assert [b[1] for b in batch] == ["a", "b", "c"]
+    assert time.monotonic() - t0 >= 0.09  # waited for a fourth that never came
+
+    engine.batch_wait = 5.0
+    engine._queue.put(item("live", urgent=True))
+    engine._queue.put(item("d"))
+    t0 = time.monotonic()
+    assert [b[1] for b in engine._next_batch()] == ["live", "d"]
+    assert time.monotonic() - t0 < 1.0
+
+
+def test_next_batch_leaves_stop_signal_queued():
+    engine = TranscriptionEngine(batch_size=4, batch_wait_ms=0)
+    engine._queue.put(item("a"))
+    engine._queue.put(None)
+    assert [b[1] for b in engine._next_batch()] == ["a"]
+    assert engine._next_batch() is None
+
+
+def test_reconfigure_swaps_the_model_and_reuses_the_previous_one():
+    loads = []
+
+    class Engine(TranscriptionEngine):
+        def build_model(self, model_size, compute_type, cpu_threads, num_workers=None):
+            loads.append((model_size, compute_type))
+            return SimpleNamespace(name=model_size)
+
+    engine = Engine(model_size="medium")
+    engine.start()
+    try:
+        engine.reconfigure("small", "int8", beam_size=1, profile="small-int8-b1")
+        assert engine.model.name == "small" and engine.beam_size == 1 and engine.profile == "small-int8-b1"
+        engine.reconfigure("medium", "int8", beam_size=5, profile="medium-int8-b5")
+        assert engine.model.name == "medium" and loads == [("medium", "int8"), ("small", "int8")]
+    finally:
+        engine.stop()
+
+
+class FakeModel:
+    """Stands in for a faster-whisper WhisperModel: one segment per call, or an error if `fail` is set."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def transcribe(self, audio, **kwargs):
+        self.calls.append(kwargs)
+        if self.fail:
+            raise RuntimeError("model crashed")
+        seg = SimpleNamespace(id=0, seek=0, start=0.0, end=2.0, text=" Engine 5 responding", tokens=[1, 2],
+                              temperature=0.0, avg_logprob=-0.1, compression_ratio=1.0, no_speech_prob=0.0)
+        return iter([seg]), SimpleNamespace(language="en", duration=90.0)
+
+
+def fake_engine(model, **kwargs):
+    loads = []
+
+    class Engine(TranscriptionEngine):
+        def build_model(self, model_size, compute_type, cpu_threads, num_workers=None):
+            loads.append(model_size)
+            return model
+
+    return Engine(**kwargs), loads
+
+
+def test_model_is_loaded_once_and_kept_warm_across_segments():
+    model = FakeModel()
+    engine, loads = fake_engine(model, num_workers=2)
+    engine.set_vocabulary("Midpen, Teague Hill", "Teague")
+    try:
+        results = [engine.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), name=f"seg{i}") for i in range(3)]
+    finally:
+        engine.stop()
+    assert loads == ["medium"] and len(model.calls) == 3
+    assert model.calls[0]["initial_prompt"] == "Midpen, Teague Hill" and model.calls[0]["hotwords"] == "Teague"
+    for result in results:
+        assert result["backend"] == "inprocess" and result["text"] == " Engine 5 responding"
+        assert result["segments"][0]["tokens"] == [1, 2] and result["duration"] == 90.0
+        assert result["rtf"] == result["elapsed"] / 90.0
+
+
+def test_failed_segment_falls_back_to_the_subprocess():
+    engine, _ = fake_engine(FakeModel(fail=True))
+    paths = []
+
+    def subprocess_fallback(audio_path):
+        paths.append(audio_path)
+        return {"text": " from cli", "segments": [{"start": 0.0, "end": 4.0, "text": " from cli"}],
+                "duration": 4.0, "backend": "subprocess"}
+
+    engine._transcribe_subprocess = subprocess_fallback
+    try:
+        from_file = engine.transcribe("/data/audio/30/audio_900.mp3")
+        from_pcm = engine.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32))
+    finally:
+        engine.stop()
+    assert from_file["backend"] == from_pcm["backend"] == "subprocess"
+    # In-memory PCM is written to a temporary WAV for the CLI
+    assert paths[0] == "/data/audio/30/audio_900.mp3" and paths[1].endswith(".wav")
+
+
+def test_unloadable_model_uses_the_subprocess_unless_inprocess_is_required():
+    class Broken(TranscriptionEngine):
+        def build_model(self, *args, **kwargs):
+            raise ImportError("faster_whisper")
+
+    engine = Broken()
+    engine.start()
+    engine.stop()
+    assert engine.model is None
+
+    with pytest.raises(ImportError):
+        Broken(backend="inprocess").start()
+
+
+def test_errors_reach_the_caller_when_every_backend_fails():
+    engine, _ = fake_engine(FakeModel(fail=True))
+
+    def subprocess_fallback(audio_path):
+        raise RuntimeError("whisper-ctranslate2 failed")
+
+    engine._transcribe_subprocess = subprocess_fallback
+    try:
+        future = engine.submit("/data/audio/30/audio_900.mp3")
+        assert isinstance(future.exception(timeout=5), RuntimeError)
+    finally:
+        engine.stop()
+
+
+def test_from_env_reads_whisper_settings_and_overrides_win(monkeypatch):
+    monkeypatch.setenv("WHISPER_MODEL", "small")
+    monkeypatch.setenv("WHISPER_CPU_THREADS", "4")
+    monkeypatch.setenv("WHISPER_NUM_WORKERS", "2")
+    monkeypatch.setenv("WHISPER_BACKEND", "subprocess")
+    engine = TranscriptionEngine.from_env(num_workers=1)
+    assert (engine.model_size, engine.cpu_threads, engine.num_workers, engine.backend) == ("small", 4, 1, "subprocess")
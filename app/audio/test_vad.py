@@ -0,0 +1,41 @@
+import numpy as np
+
+from app.audio.vad import SAMPLE_RATE, SpeechDetector
+
+
+def tone(seconds, amplitude=0.3, freq=300):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def segment_with_bursts(bursts, total=90.0, noise=0.001):
+    rng = np.random.default_rng(0)
+    audio = rng.normal(0, noise, int(total * SAMPLE_RATE)).astype(np.float32)
+    for start, length in bursts:
+        i = int(start * SAMPLE_RATE)
+        audio[i:i + int(length * SAMPLE_RATE)] += tone(length)
+    return audio
+
+
+def test_silent_segment_has_no_speech():
+    trim = SpeechDetector().trim(segment_with_bursts([]))
+    assert not trim.has_speech
+    assert trim.saved_seconds == 90.0
+
+
+def test_trims_to_speech_and_maps_timestamps_back():
+    trim = SpeechDetector(pad_ms=200).trim(segment_with_bursts([(10, 3), (50, 2)]))
+    assert len(trim.regions) == 2
+    assert 4.5 < trim.speech_seconds < 6.0
+    assert trim.saved_seconds > 80
+    assert len(trim.audio) == sum(e - s for s, e in trim.regions)
+    # 1s into the trimmed audio is inside the first burst; just past its length is in the second
+    assert abs(trim.to_original(1.0) - (trim.regions[0][0] / SAMPLE_RATE + 1.0)) < 1e-6
+    first_len = (trim.regions[0][1] - trim.regions[0][0]) / SAMPLE_RATE
+    assert 49 < trim.to_original(first_len + 0.5) < 51
+
+
+def test_drops_clicks_and_keeps_continuous_talk():
+    assert not SpeechDetector().trim(segment_with_bursts([(30, 0.05)])).has_speech
+    talk = SpeechDetector().trim(tone(90))
+    assert talk.regions == [(0, 90 * SAMPLE_RATE)]
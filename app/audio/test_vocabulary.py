@@ -0,0 +1,53 @@
+import json
+import os
+
+from app.audio.vocabulary import Vocabulary, compile_corrections
+
+
+def make_vocabulary(tmp_path, corrections, **extra):
+    path = tmp_path / "vocabulary.json"
+    path.write_text(json.dumps({"corrections": corrections, **extra}))
+    vocabulary = Vocabulary(str(path))
+    vocabulary.refresh()
+    return vocabulary, path
+
+
+def test_correct_single_pass_longest_match_wins(tmp_path):
+    vocabulary, _ = make_vocabulary(tmp_path, {
+        "tiger hill": "Teague Hill",
+        "mount um on hum": "Mount Umunhum",
+        "mount um": "Mount Um",
+        "sierra is all": "Sierra Azul",
+    })
+    text, count = vocabulary.correct("Ranger to Tiger  Hill, then mount um on hum via Sierra is allison road.")
+    # "sierra is allison" is not a word-bounded match, and the longer key beats "mount um"
+    assert text == "Ranger to Teague Hill, then Mount Umunhum via Sierra is allison road."
+    assert count == 2
+
+
+def test_correct_result_rewrites_segments_and_counts(tmp_path):
+    vocabulary, _ = make_vocabulary(tmp_path, {"pure sima": "Purisima"})
+    result = {"text": " Units to pure sima. Copy.", "segments": [{"text": " Units to pure sima."}, {"text": " Copy."}]}
+    assert vocabulary.correct_result(result) == 1
+    assert result["text"] == " Units to Purisima. Copy."
+    assert result["segments"][0]["text"] == " Units to Purisima."
+    assert result["corrections"] == 1
+
+
+def test_hot_reload_and_hotwords(tmp_path):
+    vocabulary, path = make_vocabulary(tmp_path, {"thorn wood": "Thornewood"}, hotwords=["Umunhum"], prompt="Ranger radio.")
+    assert vocabulary.prompt == "Ranger radio."
+    assert vocabulary.hotwords.startswith("Umunhum, Thornewood, ")
+    assert not vocabulary.refresh()
+    path.write_text(json.dumps({"corrections": {"monty bello": "Monte Bello"}}))
+    os.utime(path, ns=(1, 1))
+    assert vocabulary.refresh()
+    assert vocabulary.correct("thorn wood and monty bello") == ("thorn wood and Monte Bello", 1)
+    # A broken edit keeps the last good table
+    path.write_text("{not json")
+    assert not vocabulary.refresh()
+    assert len(vocabulary) == 1
+
+
+def test_compile_corrections_empty():
+    assert compile_corrections({}) is None
@@ -0,0 +1,401 @@
+"""
+Long-lived Whisper transcription engine.
+
+The model is loaded once (faster-whisper / CTranslate2, the same runtime used by
+the whisper-ctranslate2 CLI) and kept warm; segments are handed to it through a
+queue and transcribed by a small pool of worker threads. The whisper-ctranslate2
+subprocess is kept as a fallback for when the in-process model cannot be loaded
+or fails on a segment.
+
+With WHISPER_BATCH_SIZE > 1 a worker takes whatever else is already queued (up
+to the batch size) along with the segment it picked up, packs their audio into
+one buffer and transcribes it in a single batched model call (faster-whisper's
+BatchedInferencePipeline, one clip per <= 30 s piece), then splits the result
+back per segment. Sweep segments may wait up to WHISPER_BATCH_WAIT_MS for a
+batch to fill; a batch holding a live segment never waits.
+"""
+import json
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+import logging
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+CHUNK_SECONDS = 30  # Whisper's window; longer clips are cut into pieces of this size
+
+
+def write_wav(pcm, path, sample_rate=16000):
+    """Write float32 PCM to a 16-bit mono WAV (for the subprocess fallback)."""
+    import wave
+    import numpy as np
+    data = (np.clip(pcm, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(data)
+    return path
+
+
+class TranscriptionEngine:
+    """Warm Whisper model fed by a work queue, with a subprocess fallback."""
+
+    def __init__(self, model_size="medium", compute_type="int8", cpu_threads=0, num_workers=1,
+                 beam_size=5, language="en", backend="auto", batch_size=1, batch_wait_ms=500):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = max(1, num_workers)
+        self.beam_size = beam_size
+        self.language = language
+        self.backend = backend  # "auto", "inprocess" or "subprocess"
+        # Most segments per model call, and how long a sweep-only batch may wait to fill up
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait_ms / 1000.0
+        # Domain vocabulary hints (see app/audio/vocabulary.py), updated by set_vocabulary()
+        self.initial_prompt = None
+        self.hotwords = None
+        # Name of the current settings (see app/audio/autotune.py), recorded on every result
+        self.profile = None
+        self.model = None
+        self._batched = None
+        self._models = OrderedDict()  # (model_size, compute_type, cpu_threads) -> (model, batched), most recent last
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started = False
+
+    @classmethod
+    def from_env(cls, **overrides):
+        """Build an engine from WHISPER_* settings; keyword arguments take precedence."""
+        settings = dict(
+            model_size=os.environ.get("WHISPER_MODEL", "medium"),
+            compute_type=os.environ.get("WHISPER_COMPUTE_TYPE", "int8"),
+            cpu_threads=int(os.environ.get("WHISPER_CPU_THREADS", 0)),
+            # Roughly one model worker per four cores by default
+            num_workers=int(os.environ.get("WHISPER_NUM_WORKERS", max(1, (os.cpu_count() or 1) // 4))),
+            beam_size=int(os.environ.get("WHISPER_BEAM_SIZE", 5)),
+            language=os.environ.get("WHISPER_LANGUAGE", "en"),
+            backend=os.environ.get("WHISPER_BACKEND", "auto"),
+            batch_size=int(os.environ.get("WHISPER_BATCH_SIZE", 1)),
+            batch_wait_ms=int(os.environ.get("WHISPER_BATCH_WAIT_MS", 500)),
+        )
+        settings.update(overrides)
+        return cls(**settings)
+
+    def start(self):
+        """Load the model (once) and start the worker threads."""
+        with self._lock:
+            if self._started:
+                return
+            if self.backend != "subprocess":
+                self._load_model()
+            for i in range(self.num_workers):
+                t = threading.Thread(target=self._worker, name=f"whisper-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            self._started = True
+
+    def stop(self):
+        with self._lock:
+            if not self._started:
+                return
+            for _ in self._threads:
+                self._queue.put(None)
+            for t in self._threads:
+                t.join()
+            self._threads = []
+            self._started = False
+
+    def build_model(self, model_size, compute_type, cpu_threads, num_workers=None):
+        """Load a faster-whisper model with the given settings (used by the autotuner's calibration as well)."""
+        from faster_whisper import WhisperModel
+        return WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads,
+                            num_workers=num_workers or self.num_workers)
+
+    def _load(self, model_size, compute_type, cpu_threads):
+        """(model, batched pipeline or None), reusing the last two loaded so a profile switch back is free."""
+        key = (model_size, compute_type, cpu_threads)
+        if key in self._models:
+            self._models.move_to_end(key)
+            return self._models[key]
+        model = self.build_model(model_size, compute_type, cpu_threads)
+        batched = None
+        if self.batch_size > 1:
+            from faster_whisper import BatchedInferencePipeline
+            batched = BatchedInferencePipeline(model=model)
+        self._models[key] = (model, batched)
+        while len(self._models) > 2:
+            self._models.popitem(last=False)
+        return model, batched
+
+    def _load_model(self):
+        try:
+            t0 = time.monotonic()
+            self.model, self._batched = self._load(self.model_size, self.compute_type, self.cpu_threads)
+            logger.info(f"[Whisper] Loaded model '{self.model_size}' (compute_type={self.compute_type}, "
+                        f"cpu_threads={self.cpu_threads or 'auto'}, workers={self.num_workers}, "
+                        f"batch_size={self.batch_size}) in {time.monotonic() - t0:.1f}s")
+        except Exception as e:
+            if self.backend == "inprocess":
+                raise
+            self.model = None
+            logger.warning(f"[Whisper] In-process model unavailable ({e}); falling back to whisper-ctranslate2 subprocess.")
+
+    def reconfigure(self, model_size=None, compute_type=None, beam_size=None, cpu_threads=None, profile=None):
+        """
+        Switch model and decode settings for every segment transcribed from now on. The new model is loaded
+        before the swap, so segments keep flowing meanwhile; a segment already running finishes on the old one.
+        """
+        model_size = model_size or self.model_size
+        compute_type = compute_type or self.compute_type
+        cpu_threads = self.cpu_threads if cpu_threads is None else cpu_threads
+        model, batched = self.model, self._batched
+        if self._started and self.model is not None and \
+                (model_size, compute_type, cpu_threads) != (self.model_size, self.compute_type, self.cpu_threads):
+            t0 = time.monotonic()
+            model, batched = self._load(model_size, compute_type, cpu_threads)
+            logger.info(f"[Whisper] Loaded model '{model_size}' ({compute_type}) for profile {profile} "
+                        f"in {time.monotonic() - t0:.1f}s")
+        with self._lock:
+            self.model, self._batched = model, batched
+            self.model_size, self.compute_type, self.cpu_threads = model_size, compute_type, cpu_threads
+            if beam_size is not None:
+                self.beam_size = beam_size
+            self.profile = profile
+
+    def set_vocabulary(self, initial_prompt=None, hotwords=None):
+        """Prompt/hotwords for every segment transcribed from now on."""
+        self.initial_prompt = initial_prompt or None
+        self.hotwords = hotwords or None
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, audio, name=None, urgent=False):
+        """
+        Queue a segment for transcription; returns a Future resolving to the result dict.
+        `audio` is a file path or a float32 16 kHz PCM array (e.g. speech-trimmed audio).
+        `urgent` (live) segments are never held back waiting for a batch to fill.
+        """
+        if not self._started:
+            self.start()
+        future = Future()
+        self._queue.put((audio, name or self._describe(audio), future, urgent))
+        return future
+
+    def transcribe(self, audio, name=None, urgent=False):
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(audio, name, urgent).result()
+
+    @staticmethod
+    def _describe(audio):
+        return os.path.basename(audio) if isinstance(audio, str) else f"<pcm {len(audio)} samples>"
+
+    def _next_batch(self):
+        """Block for one segment, then add what is already queued (up to batch_size). None means stop."""
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0 or any(urgent for _, _, _, urgent in batch):
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if item is None:
+                self._queue.put(None)  # leave the stop signal for this worker's next round
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if len(batch) > 1 and self.model is not None:
+                try:
+                    results = self._run_batch(batch)
+                except Exception as e:
+                    logger.error(f"[Whisper] Batch of {len(batch)} failed: {e}. Transcribing them one by one.")
+                else:
+                    for (_, _, future, _), result in zip(batch, results):
+                        future.set_result(result)
+                    continue
+            for audio, name, future, _ in batch:
+                try:
+                    future.set_result(self._run(audio, name))
+                except Exception as e:
+                    future.set_exception(e)
+
+    def _run(self, audio, name):
+        t0 = time.monotonic()
+        result = None
+        if self.model is not None:
+            try:
+                result = self._transcribe_in_process(audio, name)
+            except Exception as e:
+                logger.error(f"[Whisper] In-process transcription failed for {name}: {e}. Trying subprocess fallback.")
+        if result is None:
+            if isinstance(audio, str):
+                result = self._transcribe_subprocess(audio)
+            else:
+                with tempfile.TemporaryDirectory(prefix="whisper-pcm-") as tmp_dir:
+                    result = self._transcribe_subprocess(write_wav(audio, os.path.join(tmp_dir, "segment.wav")))
+        elapsed = time.monotonic() - t0
+        duration = result.get("duration") or 0.0
+        result["elapsed"] = elapsed
+        result["rtf"] = elapsed / duration if duration else None
+        if self.profile:
+            result["profile"] = self.profile
+        rtf_str = f"{result['rtf']:.2f}" if result["rtf"] is not None else "n/a"
+        logger.info(f"[Whisper] {name}: {duration:.1f}s audio in {elapsed:.1f}s "
+                    f"(RTF {rtf_str}, backend={result['backend']})")
+        return result
+
+    def _run_batch(self, batch):
+        """Transcribe several queued segments in one model call; returns one result dict per segment."""
+        t0 = time.monotonic()
+        pcms = [self._pcm(audio) for audio, _, _, _ in batch]
+        results = self._transcribe_batch_in_process(pcms, [name for _, name, _, _ in batch])
+        elapsed = time.monotonic() - t0
+        total = sum(r["duration"] for r in results)
+        for r in results:
+            # Each segment is charged its share of the call, so per-segment RTF stays comparable
+            r["elapsed"] = elapsed * r["duration"] / total if total else elapsed / len(results)
+            r["rtf"] = r["elapsed"] / r["duration"] if r["duration"] else None
+            r["batch_size"] = len(results)
+            if self.profile:
+                r["profile"] = self.profile
+        rtf_str = f"{elapsed / total:.2f}" if total else "n/a"
+        logger.info(f"[Whisper] Batch of {len(batch)}: {total:.1f}s audio in {elapsed:.1f}s (RTF {rtf_str}, backend=batched)")
+        return results
+
+    @staticmethod
+    def _pcm(audio):
+        if not isinstance(audio, str):
+            return audio
+        from faster_whisper.audio import decode_audio
+        return decode_audio(audio, sampling_rate=SAMPLE_RATE)
+
+    @staticmethod
+    def _segment_dict(seg):
+        return {
+            "id": seg.id,
+            "seek": seg.seek,
+            "start": seg.start,
+            "end": seg.end,
+            "text": seg.text,
+            "tokens": list(seg.tokens),
+            "temperature": seg.temperature,
+            "avg_logprob": seg.avg_logprob,
+            "compression_ratio": seg.compression_ratio,
+            "no_speech_prob": seg.no_speech_prob,
+        }
+
+    def _transcribe_batch_in_process(self, pcms, names):
+        """
+        Pack the segments into one buffer (half a second of silence between them, never transcribed)
+        with one clip per <= 30 s piece, run it through the batched pipeline and map each Whisper
+        segment back to its source segment's timeline.
+        """
+        import numpy as np
+        gap = np.zeros(SAMPLE_RATE // 2, dtype=np.float32)
+        step = CHUNK_SECONDS * SAMPLE_RATE
+        parts, clips, pieces = [], [], []  # pieces: (start in buffer, segment index, start in segment), seconds
+        pos = 0
+        for i, pcm in enumerate(pcms):
+            for start in range(0, len(pcm), step):
+                piece = pcm[start:start + step]
+                clips.append({"start": pos / SAMPLE_RATE, "end": (pos + len(piece)) / SAMPLE_RATE})
+                pieces.append((pos / SAMPLE_RATE, i, start / SAMPLE_RATE))
+                parts += [piece, gap]
+                pos += len(piece) + len(gap)
+        out = [[] for _ in pcms]
+        language = self.language
+        if clips:
+            batched, beam_size = self._batched, self.beam_size
+            segments, info = batched.transcribe(
+                np.concatenate(parts).astype(np.float32), language=self.language, beam_size=beam_size,
+                initial_prompt=self.initial_prompt, hotwords=self.hotwords, vad_filter=False, clip_timestamps=clips,
+                batch_size=min(len(clips), 16), without_timestamps=False,
+            )
+            language = info.language
+            starts = [p[0] for p in pieces]
+            for seg in segments:
+                # Whisper rounds to milliseconds; the gap keeps neighbouring pieces unambiguous
+                buffer_start, i, segment_start = pieces[max(0, bisect_right(starts, seg.start + 0.01) - 1)]
+                d = self._segment_dict(seg)
+                d["id"] = len(out[i])
+                d["start"] = max(0.0, seg.start - buffer_start) + segment_start
+                d["end"] = max(0.0, seg.end - buffer_start) + segment_start
+                out[i].append(d)
+        return [{
+            "text": "".join(s["text"] for s in segs),
+            "segments": segs,
+            "language": language,
+            "duration": len(pcm) / SAMPLE_RATE,
+            "backend": "batched",
+        } for segs, pcm in zip(out, pcms)]
+
+    def _transcribe_in_process(self, audio, name=None):
+        model, beam_size = self.model, self.beam_size  # reconfigure() may swap them mid-call
+        segments, info = model.transcribe(audio, language=self.language, beam_size=beam_size,
+                                          initial_prompt=self.initial_prompt, hotwords=self.hotwords)
+        out_segments = [self._segment_dict(seg) for seg in segments]
+        return {
+            "text": "".join(s["text"] for s in out_segments),
+            "segments": out_segments,
+            "language": info.language,
+            "duration": info.duration,
+            "backend": "inprocess",
+        }
+
+    def _transcribe_subprocess(self, audio_path):
+        base = os.path.splitext(os.path.basename(audio_path))[0]
+        with tempfile.TemporaryDirectory(prefix="whisper-") as out_dir:
+            cmd = [
+                "whisper-ctranslate2", audio_path, "--model", self.model_size, "--language", self.language,
+                "--output_format", "json", "--output_dir", out_dir
+            ]
+            if self.compute_type:
+                cmd += ["--compute_type", self.compute_type]
+            if self.cpu_threads:
+                cmd += ["--threads", str(self.cpu_threads)]
+            if self.initial_prompt:
+                cmd += ["--initial_prompt", self.initial_prompt]
+            if self.hotwords:
+                cmd += ["--hotwords", self.hotwords]
+            logger.info(f"Running transcription command: {' '.join(cmd)}")
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"whisper-ctranslate2 failed (returncode={result.returncode}):\n"
+                                   f"STDOUT: {result.stdout}\nSTDERR: {result.stderr}")
+            json_path = os.path.join(out_dir, f"{base}.json")
+            if not os.path.exists(json_path):
+                raise RuntimeError(f"Transcript file {json_path} not found after transcription.\n"
+                                   f"STDOUT: {result.stdout}\nSTDERR: {result.stderr}")
+            with open(json_path, "r") as f:
+                data = json.load(f)
+        segments = data.get("segments") or []
+        data["duration"] = segments[-1].get("end", 0.0) if segments else 0.0
+        data["backend"] = "subprocess"
+        return data
@@ -0,0 +1,155 @@
+"""
+Speech pre-filter run before Whisper.
+
+Scanner audio is mostly squelch. Each MP3 is decoded once to 16 kHz mono PCM,
+speech regions are found with a frame-energy detector (or faster-whisper's
+Silero VAD), silent segments are skipped outright and the rest are cut down to
+their speech regions. `SpeechTrim.to_original` maps timestamps in the trimmed
+audio back onto the original segment.
+"""
+import bisect
+import os
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def decode_audio(source):
+    """Decode an audio file path or binary file object to float32 mono PCM at 16 kHz."""
+    from faster_whisper.audio import decode_audio as _decode
+    return _decode(source, sampling_rate=SAMPLE_RATE)
+
+
+class SpeechTrim:
+    """Speech regions of one segment plus the trimmed audio made from them."""
+
+    def __init__(self, regions, audio, total_samples):
+        self.regions = regions  # [(start_sample, end_sample)] in the original audio
+        self.audio = audio
+        self.audio_seconds = total_samples / SAMPLE_RATE
+        self.speech_seconds = sum(end - start for start, end in regions) / SAMPLE_RATE
+        # Start of each region inside the trimmed audio, for timestamp mapping
+        self._trimmed_starts = []
+        pos = 0
+        for start, end in regions:
+            self._trimmed_starts.append(pos)
+            pos += end - start
+
+    @property
+    def has_speech(self):
+        return bool(self.regions)
+
+    @property
+    def saved_seconds(self):
+        return self.audio_seconds - self.speech_seconds
+
+    def to_original(self, seconds):
+        """Map a time (seconds) in the trimmed audio to the original segment."""
+        if not self.regions:
+            return seconds
+        sample = int(round(seconds * SAMPLE_RATE))
+        i = max(0, bisect.bisect_right(self._trimmed_starts, sample) - 1)
+        start, end = self.regions[i]
+        return min(start + sample - self._trimmed_starts[i], end) / SAMPLE_RATE
+
+    def summary(self):
+        return {
+            "audio_seconds": round(self.audio_seconds, 2),
+            "speech_seconds": round(self.speech_seconds, 2),
+            "saved_seconds": round(self.saved_seconds, 2),
+            "regions": [[round(s / SAMPLE_RATE, 2), round(e / SAMPLE_RATE, 2)] for s, e in self.regions],
+        }
+
+
+class SpeechDetector:
+    """Frame-energy speech detector with an adaptive noise floor."""
+
+    def __init__(self, method="energy", frame_ms=30, threshold_db=10.0, floor_dbfs=-50.0, loud_dbfs=-35.0,
+                 min_speech_ms=250, pad_ms=300, merge_gap_ms=600):
+        self.method = method
+        self.frame = int(SAMPLE_RATE * frame_ms / 1000)
+        self.threshold_db = threshold_db
+        self.floor_dbfs = floor_dbfs
+        self.loud_dbfs = loud_dbfs
+        self.min_speech = int(SAMPLE_RATE * min_speech_ms / 1000)
+        self.pad = int(SAMPLE_RATE * pad_ms / 1000)
+        self.merge_gap = int(SAMPLE_RATE * merge_gap_ms / 1000)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            method=os.environ.get("VAD_METHOD", "energy"),
+            threshold_db=float(os.environ.get("VAD_THRESHOLD_DB", 10)),
+            floor_dbfs=float(os.environ.get("VAD_FLOOR_DBFS", -50)),
+            loud_dbfs=float(os.environ.get("VAD_LOUD_DBFS", -35)),
+            min_speech_ms=int(os.environ.get("VAD_MIN_SPEECH_MS", 250)),
+            pad_ms=int(os.environ.get("VAD_PAD_MS", 300)),
+        )
+
+    def detect(self, audio):
+        """Return merged, padded [(start_sample, end_sample)] speech regions."""
+        if self.method == "silero":
+            regions = self._detect_silero(audio)
+        else:
+            regions = self._detect_energy(audio)
+        return self._pad_and_merge(regions, len(audio))
+
+    def _detect_energy(self, audio):
+        n_frames = len(audio) // self.frame
+        if n_frames == 0:
+            return []
+        frames = audio[:n_frames * self.frame].reshape(n_frames, self.frame)
+        rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+        db = 20 * np.log10(np.maximum(rms, 1e-10))
+        # Squelch tail / carrier hiss sets the floor; speech has to clear it by threshold_db.
+        # Capped at loud_dbfs so a segment that is talk from end to end still counts as speech.
+        noise_floor = np.percentile(db, 10)
+        threshold = max(self.floor_dbfs, min(noise_floor + self.threshold_db, self.loud_dbfs))
+        active = db > threshold
+        regions = []
+        start = None
+        for i, is_active in enumerate(active):
+            if is_active and start is None:
+                start = i
+            elif not is_active and start is not None:
+                regions.append((start * self.frame, i * self.frame))
+                start = None
+        if start is not None:
+            regions.append((start * self.frame, n_frames * self.frame))
+        return regions
+
+    def _detect_silero(self, audio):
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        options = VadOptions(min_speech_duration_ms=int(self.min_speech * 1000 / SAMPLE_RATE),
+                             speech_pad_ms=0, min_silence_duration_ms=int(self.merge_gap * 1000 / SAMPLE_RATE))
+        return [(ts["start"], ts["end"]) for ts in get_speech_timestamps(audio, options)]
+
+    def _pad_and_merge(self, regions, total):
+        merged = []
+        for start, end in regions:
+            if merged and start - merged[-1][1] <= self.merge_gap:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        # Drop clicks (key-up / squelch bursts) that never reach min_speech
+        padded = []
+        for start, end in merged:
+            if end - start < self.min_speech:
+                continue
+            start = max(0, start - self.pad)
+            end = min(total, end + self.pad)
+            if padded and start <= padded[-1][1]:
+                padded[-1] = (padded[-1][0], end)
+            else:
+                padded.append((start, end))
+        return padded
+
+    def trim(self, audio):
+        """Detect speech and build the trimmed audio from it."""
+        regions = self.detect(audio)
+        if regions:
+            trimmed = np.concatenate([audio[s:e] for s, e in regions]).astype(np.float32)
+        else:
+            trimmed = np.zeros(0, dtype=np.float32)
+        return SpeechTrim(regions, trimmed, len(audio))
@@ -0,0 +1,159 @@
+"""
+Domain vocabulary: corrections for words Whisper reliably gets wrong, and hints to stop it getting them wrong.
+
+The vocabulary file (VOCABULARY_PATH, default app/data/vocabulary.json) looks like:
+
+    {
+      "prompt": "Midpen ranger radio traffic.",
+      "hotwords": ["Umunhum"],
+      "corrections": {"tiger hill": "Teague Hill", "sierra azure": "Sierra Azul"}
+    }
+
+All corrections are compiled into one regex built from a character trie of the
+(lower-cased) misspellings, so a transcript is rewritten in a single pass no
+matter how long the table gets, and the longest misspelling wins where several
+start at the same place. Matches are case-insensitive, must start and end on
+word boundaries, and any run of whitespace matches a space in the table.
+
+The correction targets, the zone names and `hotwords` are also handed to
+Whisper as hotwords (with `prompt` as its initial prompt) so the model is
+nudged towards the right spelling in the first place.
+
+The file is re-read whenever its mtime or size changes; a broken edit keeps
+the last good table.
+"""
+import json
+import os
+import re
+import threading
+import logging
+
+from app.alerts.zones import ZONES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "vocabulary.json")
+MAX_HOTWORDS_CHARS = 600  # Whisper's prompt window is ~224 tokens, shared with the initial prompt
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def compile_corrections(corrections):
+    """One case-insensitive regex matching any key of `corrections` (already normalized), or None if empty."""
+    trie = {}
+    for key in corrections:
+        node = trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        alternatives = [(r"\s+" if ch == " " else re.escape(ch)) + build(child)
+                        for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        # Greedy, so a longer key is tried before the shorter one it extends
+        return f"(?:{body})?" if "" in node else body
+
+    if not trie:
+        return None
+    return re.compile(r"(?<!\w)" + build(trie) + r"(?!\w)", re.IGNORECASE)
+
+
+class Vocabulary:
+    """Hot-reloaded correction table and Whisper hotwords."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.version = 0  # bumped every time the table changes
+        self.prompt = None
+        self.hotwords = None
+        self._corrections = {}
+        self._pattern = None
+        self._lock = threading.Lock()
+        self._stat_key = None
+        self._loaded = False
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get("VOCABULARY_PATH", DEFAULT_PATH))
+
+    def __len__(self):
+        return len(self._corrections)
+
+    def _current_stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def refresh(self):
+        """Reload the file if it changed on disk; returns True if a reload happened."""
+        with self._lock:
+            stat_key = self._current_stat()
+            if self._loaded and stat_key == self._stat_key:
+                return False
+            self._stat_key = stat_key
+            self._loaded = True
+            if stat_key is None:
+                logger.info(f"[Vocabulary] No vocabulary file at {self.path}; transcripts are not corrected.")
+                self.load({})
+                return True
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.load(data)
+            except Exception as e:
+                logger.error(f"[Vocabulary] Failed to load {self.path}: {e}. Keeping the previous table.")
+                return False
+            logger.info(f"[Vocabulary] Loaded {len(self._corrections)} corrections and "
+                        f"{len(self.hotwords or '')} chars of hotwords from {self.path}")
+            return True
+
+    def load(self, data):
+        """Compile a vocabulary dict (the file's contents)."""
+        corrections = {}
+        for wrong, right in (data.get("corrections") or {}).items():
+            key = _normalize(wrong)
+            if key and right and key != _normalize(right):
+                corrections[key] = right
+        terms = list(dict.fromkeys(list(data.get("hotwords") or []) + list(corrections.values()) + ZONES))
+        hotwords = ""
+        for term in terms:
+            if len(hotwords) + len(term) + 2 > MAX_HOTWORDS_CHARS:
+                break
+            hotwords = f"{hotwords}, {term}" if hotwords else term
+        self._pattern = compile_corrections(corrections)
+        self._corrections = corrections
+        self.prompt = data.get("prompt") or None
+        self.hotwords = hotwords or None
+        self.version += 1
+
+    def correct(self, text):
+        """Return (corrected text, number of substitutions)."""
+        pattern, corrections = self._pattern, self._corrections
+        if pattern is None or not text:
+            return text, 0
+        count = 0
+
+        def replace(m):
+            nonlocal count
+            count += 1
+            return corrections[_normalize(m.group())]
+
+        return pattern.sub(replace, text), count
+
+    def correct_result(self, result):
+        """Correct a transcription result in place (text and every segment); returns the substitution count."""
+        text, count = self.correct(result.get("text", ""))
+        if not count:
+            return 0
+        result["text"] = text
+        for seg in result.get("segments") or []:
+            seg["text"] = self.correct(seg.get("text", ""))[0]
+        result["corrections"] = count
+        return count
@@ -8,7 +8,7 @@ from app.alerts.alert_manager import AlertManager
 from app.users.models import User, Subscription
 from app.notifications.notifier import Notifier
 
-# Future: add API endpoints, DB setup, and orchestrate the workflow
+# The HTTP query API (app/api/server.py) runs alongside the monitor in the same process
 
 import logging
 logging.basicConfig(level=logging.INFO)
@@ -20,6 +20,12 @@ def main():
     from app.alerts.alert_manager import AlertManager
     audio_day = os.environ.get("AUDIO_DAY")
     processor = AudioProcessor()
+    if os.environ.get("API_ENABLED", "1").lower() not in ("0", "false", "no"):
+        from app.api.server import ApiServer
+        try:
+            ApiServer.from_env(processor.store, archive=processor.lifecycle.archive).start()
+        except ValueError as e:
+            print(f"[API] Not started: {e}")
     processor.run_monitoring_loop(start_day=audio_day)
     # --- AlertManager email test ---
     alert_manager = AlertManager()
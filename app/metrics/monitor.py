@@ -0,0 +1,53 @@
+"""
+The monitor's metrics: one histogram per step between a radio call and the alert about it, labelled by feed.
+"""
+from app.metrics.registry import REGISTRY
+
+LAG_BUCKETS = (30, 60, 120, 180, 240, 300, 420, 600, 900, 1200, 1800, 3600)
+BYTES_BUCKETS = (64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3)
+MATCH_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+AVAILABILITY_LAG = REGISTRY.histogram(
+    "midpen_segment_availability_lag_seconds",
+    "Time from the end of a segment until its audio was downloaded (scanrad lag plus backoff wait).",
+    labels=("feed",), buckets=LAG_BUCKETS)
+DOWNLOAD_SECONDS = REGISTRY.histogram(
+    "midpen_download_seconds", "Time to download one segment, including retries.", labels=("feed",))
+DOWNLOAD_BYTES = REGISTRY.histogram(
+    "midpen_download_bytes", "Size of each downloaded segment.", labels=("feed",), buckets=BYTES_BUCKETS)
+TRANSCRIBE_SECONDS = REGISTRY.histogram(
+    "midpen_transcription_seconds", "Whisper time per segment.", labels=("feed",))
+TRANSCRIBE_RTF = REGISTRY.histogram(
+    "midpen_transcription_rtf", "Whisper real-time factor (transcription time / audio duration).",
+    labels=("feed",), buckets=RTF_BUCKETS)
+MATCH_SECONDS = REGISTRY.histogram(
+    "midpen_match_seconds", "Keyword/zone matching time per transcript.", labels=("feed",), buckets=MATCH_BUCKETS)
+NOTIFY_SECONDS = REGISTRY.histogram(
+    "midpen_notification_send_seconds", "Time to hand one notification to the mail relay or Twilio.",
+    labels=("feed", "channel"))
+ALERT_LAG = REGISTRY.histogram(
+    "midpen_alert_lag_seconds", "Time from the radio traffic to its alert being sent.",
+    labels=("feed", "channel"), buckets=LAG_BUCKETS)
+NOTIFICATIONS = REGISTRY.counter(
+    "midpen_notifications_total", "Notifications by outcome (sent or failed).", labels=("feed", "channel", "outcome"))
+SEGMENTS = REGISTRY.counter(
+    "midpen_segments_total", "Finished segments by result (valid, invalid, skipped, failed).", labels=("feed", "result"))
+BACKOFF_RESULTS = REGISTRY.counter(
+    "midpen_backoff_results_total", "Results fed into the adaptive backoff window.", labels=("feed", "result"))
+BACKOFF_SECONDS = REGISTRY.gauge(
+    "midpen_backoff_seconds", "Current adaptive backoff.", labels=("feed",))
+ALERTS_COALESCED = REGISTRY.counter(
+    "midpen_alerts_coalesced_total", "Alerts held for a digest instead of sent on their own.", labels=("feed", "channel"))
+ALERT_DIGESTS = REGISTRY.counter(
+    "midpen_alert_digests_total", "Digests sent for held alerts.", labels=("channel",))
+EARLY_ALERTS = REGISTRY.counter(
+    "midpen_early_alerts_total", "Provisional early alerts by outcome (sent, confirmed, retracted).",
+    labels=("feed", "outcome"))
+TRANSCRIPTION_PROFILE = REGISTRY.gauge(
+    "midpen_transcription_profile", "1 for the autotuner's current model/decode profile, 0 for the others.",
+    labels=("profile",))
+AUDIO_ORPHANS = REGISTRY.counter(
+    "midpen_audio_orphans_deleted_total", "Audio files deleted by the storage lifecycle after they were left behind.")
+TRANSCRIPT_DAYS_ARCHIVED = REGISTRY.counter(
+    "midpen_transcript_days_archived_total", "Days of transcripts compacted into a daily archive.", labels=("feed",))
@@ -0,0 +1,29 @@
+from app.metrics.registry import Registry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    h = registry.histogram("lag_seconds", "Lag.", labels=("feed",), buckets=(1, 5))
+    for value in (0.5, 1, 3, 10):
+        h.observe(value, "30")
+    lines = registry.render().splitlines()
+    assert 'lag_seconds_bucket{feed="30",le="1.0"} 2' in lines
+    assert 'lag_seconds_bucket{feed="30",le="5.0"} 3' in lines
+    assert 'lag_seconds_bucket{feed="30",le="+Inf"} 4' in lines
+    assert 'lag_seconds_sum{feed="30"} 14.5' in lines
+    assert h.snapshot("30") == (4, 14.5)
+
+
+def test_counter_gauge_and_label_escaping():
+    registry = Registry()
+    c = registry.counter("results_total", "Results.", labels=("feed", "result"))
+    c.inc("30", "valid")
+    c.inc("30", "valid", amount=2)
+    c.inc(None, 'in"valid')
+    registry.gauge("backoff_seconds", "Backoff.").set(240)
+    text = registry.render()
+    assert 'results_total{feed="30",result="valid"} 3' in text
+    assert 'results_total{feed="",result="in\\"valid"} 1' in text
+    assert "backoff_seconds 240" in text
+    # Registering the same metric again returns the existing one
+    assert registry.counter("results_total", "Results.", labels=("feed", "result")) is c
@@ -1,12 +1,171 @@
+"""
+Background notification dispatcher.
+
+Alerts are queued and sent by a pool of worker threads so the monitoring loop
+never waits on the mail relay or Twilio. Each worker keeps one authenticated
+SMTP session open across messages (reconnecting if it goes stale), Twilio
+clients are cached, and failed sends are retried with exponential backoff.
+"""
+import os
+import queue
+import random
+import threading
+import time
+import logging
+from concurrent.futures import Future
+
+from app.alerts.email_alert import SMTPSession, smtp_config_from_env
+from app.metrics import monitor as metrics
+
+logger = logging.getLogger("notifications.notifier")
+
+
+class Notification:
+    """A single queued email or SMS."""
+    def __init__(self, channel, to, body, subject=None, feed=None, event_unixtime=None):
+        self.channel = channel  # "email" or "sms"
+        self.to = to
+        self.subject = subject
+        self.body = body
+        # What the alert is about, for the latency metrics
+        self.feed = feed
+        self.event_unixtime = event_unixtime
+        self.attempt = 0
+        self.future = Future()
+
+
 class Notifier:
     """Handles sending notifications via email/SMS."""
-    def __init__(self):
-        pass
+    def __init__(self, workers=2, max_retries=4, base_delay=2.0, smtp_idle_timeout=60.0, smtp_config=None,
+                 sms_sender=None):
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.smtp_idle_timeout = smtp_idle_timeout
+        self.smtp_config = smtp_config
+        self._sms_sender = sms_sender
+        # Unbounded on purpose: a slow relay must never back up into transcription
+        self._queue = queue.Queue()
+        self._threads = []
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._started = False
+        self._lock = threading.Lock()
+        self.sent = {"email": 0, "sms": 0}
+        self.failed = {"email": 0, "sms": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            workers=int(os.environ.get("NOTIFIER_WORKERS", 2)),
+            max_retries=int(os.environ.get("NOTIFIER_MAX_RETRIES", 4)),
+            base_delay=float(os.environ.get("NOTIFIER_RETRY_DELAY", 2)),
+            smtp_idle_timeout=float(os.environ.get("ALERT_SMTP_IDLE_TIMEOUT", 60)),
+        )
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"notifier-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            self._started = True
+
+    def stop(self, timeout=None):
+        """Wait for queued notifications to finish, then stop the workers."""
+        self.flush(timeout)
+        with self._lock:
+            for _ in self._threads:
+                self._queue.put(None)
+            for t in self._threads:
+                t.join(timeout)
+            self._threads = []
+            self._started = False
+
+    def flush(self, timeout=None):
+        """Block until every queued notification (including retries) is done."""
+        with self._pending_cond:
+            return self._pending_cond.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def send_email(self, email, subject, message, feed=None, event_unixtime=None):
+        return self._enqueue(Notification("email", email, message, subject=subject, feed=feed,
+                                          event_unixtime=event_unixtime))
+
+    def send_sms(self, phone, message, feed=None, event_unixtime=None):
+        return self._enqueue(Notification("sms", phone, message, feed=feed, event_unixtime=event_unixtime))
+
+    def _enqueue(self, notification):
+        if not self._started:
+            self.start()
+        with self._pending_cond:
+            self._pending += 1
+        self._queue.put(notification)
+        depth = self._queue.qsize()
+        if depth and depth % 100 == 0:
+            logger.warning(f"[Notifier] {depth} notifications queued; delivery is falling behind.")
+        return notification.future
+
+    def _done(self, notification, result=None, error=None):
+        if error is None:
+            notification.future.set_result(result)
+        else:
+            notification.future.set_exception(error)
+        metrics.NOTIFICATIONS.inc(notification.feed, notification.channel, "sent" if error is None else "failed")
+        with self._pending_cond:
+            (self.sent if error is None else self.failed)[notification.channel] += 1
+            self._pending -= 1
+            self._pending_cond.notify_all()
+
+    def _worker(self):
+        smtp = SMTPSession(self.smtp_config or smtp_config_from_env())
+        while True:
+            try:
+                notification = self._queue.get(timeout=self.smtp_idle_timeout)
+            except queue.Empty:
+                # Don't hold an idle session open until the server drops it
+                smtp.close()
+                continue
+            if notification is None:
+                smtp.close()
+                break
+            notification.attempt += 1
+            t0 = time.monotonic()
+            try:
+                if notification.channel == "email":
+                    result = smtp.send(notification.to, notification.subject, notification.body)
+                else:
+                    result = self._send_sms(notification.to, notification.body)
+            except Exception as e:
+                self._retry_or_fail(notification, e)
+                continue
+            metrics.NOTIFY_SECONDS.observe(time.monotonic() - t0, notification.feed, notification.channel)
+            if notification.event_unixtime is not None:
+                metrics.ALERT_LAG.observe(time.time() - notification.event_unixtime, notification.feed, notification.channel)
+            logger.info(f"[Notifier] {notification.channel} sent to {notification.to} (attempt {notification.attempt}).")
+            self._done(notification, result)
 
-    def send_email(self, email, subject, message):
-        # Placeholder for email sending logic
-        pass
+    def _send_sms(self, to, body):
+        if self._sms_sender is None:
+            from app.alerts.sms_alert import send_sms_alert
+            self._sms_sender = send_sms_alert
+        return self._sms_sender(to, body)
 
-    def send_sms(self, phone, message):
-        # Placeholder for SMS sending logic
-        pass
+    def _retry_or_fail(self, notification, error):
+        if notification.attempt >= self.max_retries or isinstance(error, ValueError):
+            logger.error(f"[Notifier] Giving up on {notification.channel} to {notification.to} after "
+                         f"{notification.attempt} attempt(s): {error}")
+            self._done(notification, error=error)
+            return
+        delay = self.base_delay * (2 ** (notification.attempt - 1)) * random.uniform(0.8, 1.2)
+        logger.warning(f"[Notifier] {notification.channel} to {notification.to} failed (attempt "
+                       f"{notification.attempt}/{self.max_retries}): {error}. Retrying in {delay:.1f}s.")
+        # Re-queue from a timer so the worker stays free for other messages
+        timer = threading.Timer(delay, self._queue.put, args=(notification,))
+        timer.daemon = True
+        timer.start()
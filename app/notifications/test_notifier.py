@@ -0,0 +1,114 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from app.notifications.notifier import Notifier
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.messages.append((envelope.rcpt_tos, envelope.content))
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_controller(handler, port):
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    return controller
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = start_controller(handler, free_port())
+    try:
+        yield handler, controller
+    finally:
+        controller.stop()
+
+
+def smtp_config(controller):
+    return {
+        "server": controller.hostname,
+        "port": controller.port,
+        "user": None,
+        "password": None,
+        "from_email": "monitor@example.com",
+        "starttls": False,
+        "timeout": 5,
+    }
+
+
+def test_emails_share_one_smtp_session(smtp_server):
+    handler, controller = smtp_server
+    notifier = Notifier(workers=1, smtp_config=smtp_config(controller))
+    futures = [notifier.send_email(f"user{i}@example.com", "Alert", f"body {i}") for i in range(5)]
+    assert notifier.flush(timeout=10)
+    for f in futures:
+        f.result(timeout=1)
+    assert len(handler.messages) == 5
+    assert len(handler.sessions) == 1
+    assert notifier.sent["email"] == 5
+    notifier.stop(timeout=5)
+
+
+def test_reconnects_after_server_drops_session():
+    handler = RecordingHandler()
+    controller = start_controller(handler, free_port())
+    notifier = Notifier(workers=1, base_delay=0.01, smtp_config=smtp_config(controller))
+    try:
+        notifier.send_email("a@example.com", "Alert", "first").result(timeout=10)
+        controller.stop()
+        # New server on the same port; the pooled connection is now dead
+        controller = start_controller(handler, controller.port)
+        notifier.send_email("b@example.com", "Alert", "second").result(timeout=10)
+    finally:
+        controller.stop()
+    assert [m[0] for m in handler.messages] == [["a@example.com"], ["b@example.com"]]
+    notifier.stop(timeout=5)
+
+
+def test_sms_retries_with_backoff_without_blocking_callers():
+    calls = []
+    lock = threading.Lock()
+
+    def flaky_sms(to, body):
+        with lock:
+            calls.append(time.monotonic())
+            if len(calls) < 3:
+                raise RuntimeError("twilio unavailable")
+        return "SM123"
+
+    notifier = Notifier(workers=1, base_delay=0.05, max_retries=4, sms_sender=flaky_sms,
+                        smtp_config={"server": None})
+    t0 = time.monotonic()
+    future = notifier.send_sms("+15555550123", "Alert")
+    assert time.monotonic() - t0 < 0.05
+    assert future.result(timeout=5) == "SM123"
+    assert len(calls) == 3
+    # second retry waits roughly twice as long as the first
+    assert calls[2] - calls[1] > (calls[1] - calls[0]) * 1.2
+    notifier.stop(timeout=5)
+
+
+def test_missing_smtp_config_fails_without_retrying():
+    notifier = Notifier(workers=1, base_delay=0.01, smtp_config={"server": None})
+    with pytest.raises(ValueError):
+        notifier.send_email("a@example.com", "Alert", "body").result(timeout=5)
+    assert notifier.failed["email"] == 1
+    notifier.stop(timeout=5)
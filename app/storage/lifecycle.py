@@ -0,0 +1,310 @@
+"""
+Storage lifecycle: cleans up audio left on disk, archives transcripts and applies retention.
+
+Audio. Every downloaded MP3 is recorded in a small SQLite table
+(`data/audio_files.db`) before it is written, and removed from the table when
+the file is deleted. Files that stay in the table longer than
+`AUDIO_ORPHAN_SECONDS` are orphans: a crash or a bug left them behind. They
+are deleted without listing the audio directories. Audio kept on purpose
+(failed live segments, KEEP_FAILED_AUDIO) is deleted once
+`AUDIO_DEBUG_RETENTION_SECONDS` have passed.
+
+Transcripts. When a UTC day has been over for `TRANSCRIPT_ARCHIVE_DELAY_HOURS`,
+each feed's transcripts for that day are compacted into one compressed archive
+(see app/transcripts/archive.py). A day is archived again if segments were
+re-transcribed afterwards (by a backfill, say), with the new transcripts
+merged into its existing archive. The day's JSON transcript files
+(TRANSCRIPT_JSON_FILES) are then deleted. After `TRANSCRIPT_RETENTION_DAYS`,
+archived days are removed from the SQLite store, which keeps the search index
+small. Archives are deleted after `ARCHIVE_RETENTION_DAYS`; 0 keeps them
+forever.
+
+Everything lives under DATA_DIR (default `data`, `/app/data` in the container
+and on the persistent disk).
+
+    python -m app.storage.lifecycle [--adopt]
+
+runs a single pass. `--adopt` first records the audio files already on disk
+(from before this tracking existed) with their modification times, so those
+older than AUDIO_ORPHAN_SECONDS are deleted in the same pass.
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+from app.metrics import monitor as metrics
+from app.transcripts.archive import DAY, TranscriptArchive, day_name, day_start
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE = "archive"
+
+
+def data_path(*parts):
+    """A path under DATA_DIR, the root of the persistent data layout."""
+    return os.path.join(os.environ.get("DATA_DIR", "data"), *parts)
+
+
+class AudioTracker:
+    """Durable record of the audio files written to disk and not yet deleted."""
+
+    def __init__(self, path, keep_seconds=86400, clock=time.time):
+        self.path = path
+        self.keep_seconds = keep_seconds
+        self.clock = clock
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS audio_files ("
+            " path TEXT PRIMARY KEY,"
+            " created_at REAL NOT NULL,"
+            " keep_until REAL"
+            ") WITHOUT ROWID"
+        )
+
+    @classmethod
+    def from_env(cls, default_path):
+        return cls(
+            os.environ.get("AUDIO_TRACKER_DB", default_path),
+            keep_seconds=float(os.environ.get("AUDIO_DEBUG_RETENTION_SECONDS", 86400)),
+        )
+
+    def track(self, path, created_at=None):
+        """Record a file about to be written."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO audio_files (path, created_at) VALUES (?, ?)",
+                             (os.path.abspath(path), self.clock() if created_at is None else created_at))
+
+    def keep(self, path, seconds=None):
+        """Keep a file on purpose (for debugging) for `seconds` (default keep_seconds), then let it be deleted."""
+        seconds = self.keep_seconds if seconds is None else seconds
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO audio_files (path, created_at, keep_until) VALUES (?, ?, ?)",
+                             (os.path.abspath(path), self.clock(), self.clock() + seconds))
+
+    def untrack(self, path):
+        """The file was deleted."""
+        with self._lock:
+            self._db.execute("DELETE FROM audio_files WHERE path = ?", (os.path.abspath(path),))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM audio_files").fetchone()[0]
+
+    def sweep(self, orphan_seconds, now=None):
+        """Delete files left tracked for longer than `orphan_seconds` and kept files past their time."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            paths = [r[0] for r in self._db.execute(
+                "SELECT path FROM audio_files WHERE (keep_until IS NULL AND created_at < ?) OR keep_until < ?",
+                (now - orphan_seconds, now))]
+        deleted = []
+        for path in paths:
+            try:
+                os.remove(path)
+                deleted.append(path)
+                logger.info(f"[Lifecycle] Deleted orphaned audio {path}")
+            except FileNotFoundError:
+                pass  # a failed download that never created the file
+            except OSError as e:
+                logger.warning(f"[Lifecycle] Failed to delete {path}: {e}")
+                continue
+            self.untrack(path)
+        if deleted:
+            metrics.AUDIO_ORPHANS.inc(amount=len(deleted))
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class StorageLifecycle:
+    """Runs the audio sweep, transcript archiving and retention every `interval` seconds."""
+
+    def __init__(self, store, archive, audio, feeds, transcript_dir=None, orphan_seconds=7200, archive_delay_hours=6, retention_days=30, archive_retention_days=0,
+                 interval=3600, leases=None, clock=time.time):
+        self.store = store
+        self.archive = archive
+        self.audio = audio
+        self.feeds = [str(f) for f in feeds]
+        self.transcript_dir = transcript_dir
+        self.orphan_seconds = orphan_seconds
+        self.archive_delay = archive_delay_hours * 3600
+        self.retention_days = retention_days
+        self.archive_retention_days = archive_retention_days
+        self.interval = interval
+        self.leases = leases
+        self.clock = clock
+        self._built = {}  # (feed, day) -> built_at of its archive, so unchanged days cost one query
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, store, data_dir, feeds, transcript_dir=None, leases=None, audio=None):
+        return cls(
+            store,
+            TranscriptArchive(os.environ.get("ARCHIVE_DIR", os.path.join(data_dir, ARCHIVE))),
+            audio or AudioTracker.from_env(os.path.join(data_dir, "audio_files.db")),
+            feeds,
+            transcript_dir=transcript_dir,
+            orphan_seconds=float(os.environ.get("AUDIO_ORPHAN_SECONDS", 7200)),
+            archive_delay_hours=float(os.environ.get("TRANSCRIPT_ARCHIVE_DELAY_HOURS", 6)),
+            retention_days=int(os.environ.get("TRANSCRIPT_RETENTION_DAYS", 30)),
+            archive_retention_days=int(os.environ.get("ARCHIVE_RETENTION_DAYS", 0)),
+            interval=float(os.environ.get("LIFECYCLE_INTERVAL", 3600)),
+            leases=leases,
+        )
+
+    def run_once(self, now=None):
+        """One pass of every lifecycle step; returns what each did."""
+        now = self.clock() if now is None else now
+        summary = {}
+        steps = (("orphans", lambda: len(self.audio.sweep(self.orphan_seconds, now))),
+                 ("archived", lambda: self.compact(now)),
+                 ("expired", lambda: self.apply_retention(now)))
+        for name, step in steps:
+            try:
+                summary[name] = step()
+            except Exception as e:
+                logger.error(f"[Lifecycle] {name} step failed: {e}")
+        logger.info(f"[Lifecycle] {summary}")
+        return summary
+
+    def _days_before(self, feed, end):
+        """Start times of the days of a feed's stored transcripts that begin before `end`."""
+        first = self.store.first_unixtime(feed)
+        if first is None:
+            return range(0)
+        return range(day_start(first), end, DAY)
+
+    def compact(self, now=None):
+        """Archive every finished day of every feed that isn't archived, or changed since; returns days written."""
+        now = self.clock() if now is None else now
+        written = 0
+        for feed in self.feeds:
+            for start in self._days_before(feed, day_start(now - self.archive_delay)):
+                count, changed_at = self.store.range_stats(start, start + DAY, feed)
+                if not count or self._archived_at(feed, start) >= changed_at:
+                    continue
+                if self.leases is not None and not self.leases.claim(feed, start, ARCHIVE):
+                    continue  # another node is writing it
+                try:
+                    self._archive_day(feed, start, changed_at)
+                finally:
+                    if self.leases is not None:
+                        # The archive itself records that the day is done; a re-transcribed day is claimed again
+                        self.leases.release(feed, start, ARCHIVE)
+                written += 1
+        return written
+
+    def _archived_at(self, feed, start):
+        built_at = self._built.get((feed, start))
+        if built_at is None:
+            index = self.archive.index(feed, start)
+            built_at = self._built[(feed, start)] = index["built_at"] if index else 0.0
+        return built_at
+
+    def _archive_day(self, feed, start, changed_at):
+        stored = self.store.export(start, start + DAY, feed)
+        # Retention may already have dropped most of the day from the store (a backfill re-transcribing an old
+        # slot, say), so the new archive is the old one with the stored transcripts replacing theirs
+        merged = {item["unixtime"]: item for item in self.archive.iter_day(feed, start)}
+        merged.update((item["unixtime"], item) for item in stored)
+        items = [merged[u] for u in sorted(merged)]
+        # Stamped with the store's last write time for the day (not the clock), so any later write makes it stale
+        index = self.archive.write_day(feed, start, items, built_at=changed_at)
+        self._built[(feed, start)] = changed_at
+        metrics.TRANSCRIPT_DAYS_ARCHIVED.inc(feed)
+        logger.info(f"[Lifecycle] Archived {len(items)} feed {feed} transcripts for {day_name(start)} "
+                    f"({index['bytes']} bytes)")
+        if self.transcript_dir:
+            # The JSON copies are named after their segments, so no directory listing is needed
+            for item in stored:
+                try:
+                    os.remove(os.path.join(self.transcript_dir, feed, f"audio_{item['unixtime']}.json"))
+                except FileNotFoundError:
+                    pass
+
+    def apply_retention(self, now=None):
+        """Drop archived days past retention from the store, and old archives; returns days removed."""
+        now = self.clock() if now is None else now
+        removed = 0
+        for feed in self.feeds:
+            if self.retention_days > 0:
+                cutoff = day_start(now) - self.retention_days * DAY
+                for start in self._days_before(feed, cutoff):
+                    count, changed_at = self.store.range_stats(start, start + DAY, feed)
+                    # Only what is safely in an up-to-date archive leaves the store
+                    if count and self._archived_at(feed, start) >= changed_at:
+                        self.store.delete_range(start, start + DAY, feed)
+                        removed += 1
+            if self.archive_retention_days > 0:
+                cutoff = day_start(now) - self.archive_retention_days * DAY
+                for start in self.archive.days(feed):
+                    if start < cutoff:
+                        self.archive.remove_day(feed, start)
+                        self._built.pop((feed, start), None)
+                        removed += 1
+        return removed
+
+    def adopt(self, audio_dir):
+        """Track the audio files already on disk (a one-time scan when upgrading); returns how many."""
+        count = 0
+        for dirpath, _, filenames in os.walk(audio_dir):
+            for name in filenames:
+                if name.endswith(".mp3"):
+                    path = os.path.join(dirpath, name)
+                    self.audio.track(path, created_at=os.path.getmtime(path))
+                    count += 1
+        return count
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="storage-lifecycle", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self.run_once()
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def main(argv=None):
+    from app.audio.processor import DEFAULT_FEED, parse_feeds
+    from app.transcripts.store import TranscriptStore
+    parser = argparse.ArgumentParser(description="Run one storage lifecycle pass.")
+    parser.add_argument("--data-dir", default=data_path())
+    parser.add_argument("--feeds", default=os.environ.get("FEEDS", DEFAULT_FEED), help="comma-separated feed ids")
+    parser.add_argument("--adopt", action="store_true", help="first track the audio files already on disk")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    data_dir = os.path.abspath(args.data_dir)
+    store = TranscriptStore.from_env(os.path.join(data_dir, "transcripts.db"))
+    lifecycle = StorageLifecycle.from_env(store, data_dir, parse_feeds(args.feeds),
+                                          transcript_dir=os.path.join(data_dir, "transcripts"))
+    if args.adopt:
+        logger.info(f"[Lifecycle] Tracking {lifecycle.adopt(os.path.join(data_dir, 'audio'))} existing audio files")
+    lifecycle.run_once()
+    store.close()
+    lifecycle.audio.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
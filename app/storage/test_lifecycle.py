@@ -0,0 +1,82 @@
+import os
+
+from app.storage.lifecycle import AudioTracker, StorageLifecycle
+from app.transcripts.archive import DAY, TranscriptArchive, day_start
+from app.transcripts.store import TranscriptStore
+
+DAY1 = day_start(1_760_000_000)
+
+
+def result(text):
+    return {"text": text, "language": "en", "duration": 90.0, "segments": [{"start": 0.0, "end": 3.0, "text": text}]}
+
+
+def test_tracked_audio_is_swept_without_listing_directories(tmp_path):
+    tracker = AudioTracker(str(tmp_path / "audio_files.db"), clock=lambda: 1_000.0)
+    paths = [str(tmp_path / f"audio_{i}.mp3") for i in range(4)]
+    for path in paths:
+        open(path, "wb").close()
+        tracker.track(path)
+    os.remove(paths[0])
+    tracker.untrack(paths[0])  # finished normally
+    tracker.keep(paths[1], 500)  # kept for debugging
+    tracker.track(str(tmp_path / "never_written.mp3"))
+    tracker.track(paths[3], created_at=1_900.0)  # still in flight
+
+    assert tracker.sweep(600, now=1_200.0) == []
+    assert tracker.sweep(600, now=1_700.0) == [paths[1], paths[2]]
+    assert not os.path.exists(paths[1]) and not os.path.exists(paths[2]) and os.path.exists(paths[3])
+    assert len(tracker) == 1
+    tracker.close()
+
+
+def test_finished_days_are_archived_then_dropped_from_the_store(tmp_path):
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+    json_dir = tmp_path / "transcripts" / "30"
+    json_dir.mkdir(parents=True)
+    (json_dir / f"audio_{DAY1}.json").write_text("{}")
+    store.add_many([("30", DAY1, result("engine 5 sierra azul")), ("30", DAY1 + 90, result("copy")),
+                    ("30", DAY1 + DAY, result("next day"))])
+    archive = TranscriptArchive(str(tmp_path / "archive"))
+    lifecycle = StorageLifecycle(store, archive, AudioTracker(str(tmp_path / "audio_files.db")), ["30"],
+                                 transcript_dir=str(tmp_path / "transcripts"), archive_delay_hours=6,
+                                 retention_days=2)
+
+    # Day 2 is over but still inside the delay
+    assert lifecycle.compact(now=DAY1 + 2 * DAY + 3600) == 1
+    assert archive.days("30") == [DAY1]
+    assert archive.get("30", DAY1 + 90)["text"] == "copy"
+    assert not (json_dir / f"audio_{DAY1}.json").exists()
+    assert lifecycle.compact(now=DAY1 + 2 * DAY + 3600) == 0
+
+    # A re-transcribed segment makes the day stale, so it is archived again
+    store.add_many([("30", DAY1 + 90, result("copy that"))])
+    assert lifecycle.compact(now=DAY1 + 2 * DAY + 3600) == 1
+    assert archive.get("30", DAY1 + 90)["text"] == "copy that"
+
+    assert lifecycle.apply_retention(now=DAY1 + 3 * DAY + 60) == 1
+    assert store.get("30", DAY1) is None and store.search("sierra azul") == []
+    assert store.get("30", DAY1 + DAY)["text"] == "next day"
+    store.close()
+
+
+def test_retranscribing_a_retained_day_keeps_the_rest_of_its_archive(tmp_path):
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+    store.add_many([("30", DAY1 + i * 90, result(f"call {i}")) for i in range(10)])
+    archive = TranscriptArchive(str(tmp_path / "archive"))
+    lifecycle = StorageLifecycle(store, archive, AudioTracker(str(tmp_path / "audio_files.db")), ["30"],
+                                 retention_days=2)
+    now = DAY1 + 3 * DAY + 60
+    assert lifecycle.compact(now=now) == 1
+    assert lifecycle.apply_retention(now=now) == 1
+    assert len(store) == 0
+
+    # e.g. backfill --redo after a model upgrade
+    store.add_many([("30", DAY1 + 3 * 90, result("call 3 again"))])
+    assert lifecycle.compact(now=now) == 1
+    assert archive.index("30", DAY1)["count"] == 10
+    assert archive.get("30", DAY1 + 3 * 90)["text"] == "call 3 again"
+    assert archive.get("30", DAY1 + 7 * 90)["text"] == "call 7"
+    assert lifecycle.apply_retention(now=now) == 1
+    assert len(store) == 0 and archive.index("30", DAY1)["count"] == 10
+    store.close()
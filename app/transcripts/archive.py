@@ -0,0 +1,152 @@
+"""
+Compressed daily transcript archives.
+
+Once a day is over, its transcripts are written to one file per feed and day,
+`<root>/<feed>/<YYYY-MM-DD>.jsonl.gz`: one JSON transcript (with segments) per
+line, oldest first. The file is a series of gzip members of `block_size`
+lines each. It reads as a single ordinary gzip file (`zcat`, `gzip.open`), and
+any one block can be decompressed on its own.
+
+Next to it, `<YYYY-MM-DD>.idx.json` records the byte offset, length and first
+and last unixtime of every block. Looking up one segment reads the index,
+seeks to its block and decompresses only that block.
+
+Days are UTC, matching the 90-second segment grid.
+"""
+import bisect
+import gzip
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+
+def day_start(unixtime):
+    return int(unixtime) // DAY * DAY
+
+
+def day_name(start):
+    return datetime.fromtimestamp(start, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def parse_day_name(name):
+    """UTC start of the day in an archive file name, or None if it isn't one."""
+    try:
+        day = datetime.strptime(name.split(".", 1)[0], "%Y-%m-%d")
+    except ValueError:
+        return None
+    return int(day.replace(tzinfo=timezone.utc).timestamp())
+
+
+class TranscriptArchive:
+    """Writes and reads the per-feed daily archives under `root`."""
+
+    def __init__(self, root, block_size=64, compresslevel=6, cached_indexes=32):
+        self.root = root
+        self.block_size = max(1, block_size)
+        self.compresslevel = compresslevel
+        self.cached_indexes = cached_indexes
+        self._indexes = OrderedDict()  # (feed, day) -> index, most recently used last
+        self._lock = threading.Lock()
+
+    def paths(self, feed, start):
+        base = os.path.join(self.root, str(feed), day_name(start))
+        return base + ".jsonl.gz", base + ".idx.json"
+
+    def write_day(self, feed, start, items, built_at=None):
+        """Replace the archive of one feed and day with `items` (transcript dicts, oldest first)."""
+        data_path, index_path = self.paths(feed, start)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        blocks = []
+        offset = 0
+        with open(data_path + ".tmp", "wb") as f:
+            for i in range(0, len(items), self.block_size):
+                chunk = items[i:i + self.block_size]
+                lines = "".join(json.dumps({k: v for k, v in item.items() if k != "id"}) + "\n" for item in chunk)
+                member = gzip.compress(lines.encode("utf-8"), compresslevel=self.compresslevel, mtime=0)
+                f.write(member)
+                blocks.append([offset, len(member), chunk[0]["unixtime"], chunk[-1]["unixtime"]])
+                offset += len(member)
+            f.flush()
+            os.fsync(f.fileno())
+        index = {"feed": str(feed), "day": day_name(start), "start": int(start), "count": len(items),
+                 "bytes": offset, "built_at": time.time() if built_at is None else built_at, "blocks": blocks}
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(index, f)
+        # Data first: an index never points into a file it wasn't built from
+        os.replace(data_path + ".tmp", data_path)
+        os.replace(index_path + ".tmp", index_path)
+        with self._lock:
+            self._indexes.pop((str(feed), int(start)), None)
+        return index
+
+    def index(self, feed, start):
+        """The index of one feed and day, or None if that day isn't archived."""
+        key = (str(feed), int(start))
+        with self._lock:
+            if key in self._indexes:
+                self._indexes.move_to_end(key)
+                return self._indexes[key]
+        try:
+            with open(self.paths(feed, start)[1]) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.cached_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    def get(self, feed, unixtime):
+        """One archived transcript, or None."""
+        unixtime = int(unixtime)
+        index = self.index(feed, day_start(unixtime))
+        if index is None:
+            return None
+        blocks = index["blocks"]
+        i = bisect.bisect_right([b[2] for b in blocks], unixtime) - 1
+        if i < 0 or unixtime > blocks[i][3]:
+            return None
+        offset, length = blocks[i][0], blocks[i][1]
+        with open(self.paths(feed, index["start"])[0], "rb") as f:
+            f.seek(offset)
+            lines = gzip.decompress(f.read(length)).decode("utf-8").splitlines()
+        for line in lines:
+            item = json.loads(line)
+            if item["unixtime"] == unixtime:
+                return item
+        return None
+
+    def iter_day(self, feed, start):
+        """Every transcript of one feed and day, oldest first."""
+        data_path = self.paths(feed, start)[0]
+        if not os.path.exists(data_path):
+            return
+        with gzip.open(data_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def days(self, feed):
+        """Start times of the archived days of a feed, oldest first."""
+        try:
+            names = os.listdir(os.path.join(self.root, str(feed)))
+        except FileNotFoundError:
+            return []
+        return sorted(d for d in (parse_day_name(n) for n in names if n.endswith(".idx.json")) if d is not None)
+
+    def remove_day(self, feed, start):
+        for path in self.paths(feed, start):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._indexes.pop((str(feed), int(start)), None)
@@ -0,0 +1,84 @@
+"""
+Import `audio_{unixtime}.json` transcript files into the transcript store.
+
+Handles both the flat layout from before multi-feed support (all feed 30) and
+the per-feed `data/transcripts/<feed>/` directories. Safe to run repeatedly;
+segments already in the store are replaced with the file's contents.
+
+    python -m app.transcripts.importer [--dir data/transcripts] [--db data/transcripts.db]
+"""
+import argparse
+import json
+import os
+import time
+import logging
+
+from app.transcripts.store import TranscriptStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEED = "30"
+
+
+def iter_transcript_files(directory, default_feed=DEFAULT_FEED):
+    """Yield (feed, unixtime, path) for every audio_<unixtime>.json under `directory`."""
+    for entry in sorted(os.listdir(directory)):
+        path = os.path.join(directory, entry)
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                unixtime = _unixtime(name)
+                if unixtime is not None:
+                    yield entry, unixtime, os.path.join(path, name)
+        else:
+            unixtime = _unixtime(entry)
+            if unixtime is not None:
+                yield default_feed, unixtime, path
+
+
+def _unixtime(name):
+    base, ext = os.path.splitext(name)
+    if ext == ".json" and base.startswith("audio_") and base[6:].isdigit():
+        return int(base[6:])
+    return None
+
+
+def import_json_dir(store, directory, default_feed=DEFAULT_FEED, batch_size=500):
+    """Load every transcript file into `store` in batched transactions; returns (imported, failed)."""
+    t0 = time.monotonic()
+    imported = failed = 0
+    batch = []
+    for feed, unixtime, path in iter_transcript_files(directory, default_feed):
+        try:
+            with open(path, "r") as f:
+                result = json.load(f)
+        except Exception as e:
+            logger.warning(f"[Importer] Skipping unreadable transcript {path}: {e}")
+            failed += 1
+            continue
+        batch.append((result.get("feed", feed), result.get("unixtime", unixtime), result))
+        if len(batch) >= batch_size:
+            imported += store.add_many(batch)
+            batch = []
+    imported += store.add_many(batch)
+    logger.info(f"[Importer] Imported {imported} transcripts from {directory} into {store.path} "
+                f"in {time.monotonic() - t0:.1f}s ({failed} unreadable)")
+    return imported, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import JSON transcript files into the transcript store.")
+    parser.add_argument("--dir", default="data/transcripts", help="transcript directory to import")
+    parser.add_argument("--db", default=os.environ.get("TRANSCRIPT_DB_PATH", "data/transcripts.db"))
+    parser.add_argument("--default-feed", default=DEFAULT_FEED, help="feed for files directly in --dir")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    store = TranscriptStore(args.db)
+    try:
+        import_json_dir(store, args.dir, default_feed=args.default_feed)
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,398 @@
+"""
+SQLite transcript store with a full-text index (and the log of sent alerts).
+
+One row per (feed, unixtime) segment in `transcripts`, one row per Whisper
+segment (text plus start/end seconds inside the 90-second segment) in
+`segments`, and an FTS5 index over the segment text kept in sync by triggers.
+Writes are buffered and committed in batches by a background thread, so the
+pipeline never waits on a per-file fsync, and "when was Sierra Azul mentioned
+last week" is a single indexed query instead of opening every JSON file.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY,
+    feed TEXT NOT NULL,
+    unixtime INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    language TEXT,
+    duration REAL,
+    skipped TEXT,
+    meta TEXT,
+    written_at REAL NOT NULL,
+    UNIQUE (feed, unixtime)
+);
+CREATE INDEX IF NOT EXISTS transcripts_time ON transcripts (unixtime);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    feed TEXT NOT NULL,
+    unixtime INTEGER NOT NULL,
+    start_sec REAL NOT NULL,
+    end_sec REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_slot ON segments (feed, unixtime);
+CREATE INDEX IF NOT EXISTS segments_time ON segments (unixtime);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    feed TEXT,
+    unixtime INTEGER,
+    user TEXT,
+    keyword TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    sent_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alerts_slot ON alerts (feed, unixtime);
+"""
+
+# Result keys stored in their own columns; everything else goes to `meta`
+_COLUMNS = ("text", "segments", "language", "duration", "skipped", "feed", "unixtime")
+
+
+def phrase_query(text):
+    """Quote free text as a single FTS5 phrase."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+class TranscriptStore:
+    """Batched writer and indexed reader for segment transcripts."""
+
+    def __init__(self, path, batch_size=50, flush_interval=2.0):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._write_lock = threading.Lock()
+        # Held from taking a batch until it is committed, so "not pending" always means "committed"
+        self._flush_lock = threading.Lock()
+        self._db = self._connect()
+        self._db.executescript(SCHEMA)
+        self._local = threading.local()
+        # Never writes, so its data_version moves with every commit from any connection or process
+        self._version_db = self._connect()
+        self._version_lock = threading.Lock()
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.listeners = []  # callables run with the rows of each committed batch
+
+    @classmethod
+    def from_env(cls, default_path):
+        return cls(
+            os.environ.get("TRANSCRIPT_DB_PATH", default_path),
+            batch_size=int(os.environ.get("TRANSCRIPT_BATCH_SIZE", 50)),
+            flush_interval=float(os.environ.get("TRANSCRIPT_FLUSH_SECONDS", 2)),
+        )
+
+    def _connect(self):
+        # Backfill workers write from other processes, so wait out their transactions
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.row_factory = sqlite3.Row
+        return db
+
+    def _reader(self):
+        """Per-thread read connection, so queries don't queue behind the writer."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    # --- Writing ---
+
+    def add(self, feed, unixtime, result):
+        """Queue one segment's transcript result for the next batch."""
+        with self._cond:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._flush_loop, name="transcript-store", daemon=True)
+                self._thread.start()
+            self._pending.append((str(feed), int(unixtime), result))
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def add_many(self, items):
+        """Write (feed, unixtime, result) items right away in one transaction."""
+        return self._commit([(str(f), int(u), r) for f, u, r in items])
+
+    def flush(self):
+        """Commit everything queued so far."""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            return self._commit_or_requeue(batch)
+
+    def ensure_committed(self, feed, unixtime):
+        """Return once the segment's queued transcript is committed, flushing its batch early if it's still queued."""
+        key = (str(feed), int(unixtime))
+        with self._flush_lock:
+            with self._cond:
+                if not any((f, u) == key for f, u, _ in self._pending):
+                    return False
+                batch, self._pending = self._pending, []
+            self._commit_or_requeue(batch)
+            return True
+
+    def _commit_or_requeue(self, batch):
+        try:
+            return self._commit(batch)
+        except Exception:
+            # Keep the batch for the next flush rather than dropping transcripts on a locked or full disk
+            with self._cond:
+                self._pending[:0] = batch
+            raise
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pending) >= self.batch_size or self._closed,
+                                    timeout=self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"[TranscriptStore] Batch write failed: {e}")
+            if closed:
+                return
+
+    def _commit(self, batch):
+        if not batch:
+            return 0
+        now = time.time()
+        rows = []
+        with self._write_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for feed, unixtime, result in batch:
+                    rows.append(self._write_one(feed, unixtime, result, now))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        for listener in self.listeners:
+            try:
+                listener(rows)
+            except Exception as e:
+                logger.warning(f"[TranscriptStore] Listener failed: {e}")
+        return len(batch)
+
+    def _write_one(self, feed, unixtime, result, now):
+        text = (result.get("text") or "").strip()
+        meta = {k: v for k, v in result.items() if k not in _COLUMNS}
+        # Re-transcribing a segment (e.g. a backfill with a new model) replaces it
+        self._db.execute("DELETE FROM segments WHERE feed = ? AND unixtime = ?", (feed, unixtime))
+        self._db.execute("DELETE FROM transcripts WHERE feed = ? AND unixtime = ?", (feed, unixtime))
+        cur = self._db.execute(
+            "INSERT INTO transcripts (feed, unixtime, text, language, duration, skipped, meta, written_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (feed, unixtime, text, result.get("language"), result.get("duration"), result.get("skipped"),
+             json.dumps(meta) if meta else None, now),
+        )
+        segments = result.get("segments") or []
+        if not segments and text:
+            segments = [{"start": 0.0, "end": result.get("duration") or 0.0, "text": text}]
+        self._db.executemany(
+            "INSERT INTO segments (feed, unixtime, start_sec, end_sec, text) VALUES (?, ?, ?, ?, ?)",
+            [(feed, unixtime, float(s.get("start", 0.0)), float(s.get("end", 0.0)), (s.get("text") or "").strip())
+             for s in segments],
+        )
+        return {"id": cur.lastrowid, "feed": feed, "unixtime": unixtime, "text": text, "skipped": result.get("skipped")}
+
+    def record_alert(self, feed, unixtime, user, keyword, channel):
+        """Log one sent alert (written immediately; alerts are rare)."""
+        with self._write_lock:
+            self._db.execute(
+                "INSERT INTO alerts (feed, unixtime, user, keyword, channel, sent_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (None if feed is None else str(feed), unixtime, user, keyword, channel, time.time()),
+            )
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+        with self._write_lock:
+            self._db.close()
+        with self._version_lock:
+            self._version_db.close()
+
+    # --- Queries ---
+
+    def get(self, feed, unixtime, with_segments=True):
+        """One transcript with its segments, or None."""
+        db = self._reader()
+        row = db.execute("SELECT * FROM transcripts WHERE feed = ? AND unixtime = ?",
+                         (str(feed), int(unixtime))).fetchone()
+        if row is None:
+            return None
+        item = self._transcript(row)
+        if with_segments:
+            item["segments"] = [
+                {"start": s["start_sec"], "end": s["end_sec"], "text": s["text"]}
+                for s in db.execute("SELECT start_sec, end_sec, text FROM segments WHERE feed = ? AND unixtime = ? "
+                                    "ORDER BY start_sec", (str(feed), int(unixtime)))
+            ]
+        return item
+
+    def exists(self, feed, unixtime):
+        return self._reader().execute("SELECT 1 FROM transcripts WHERE feed = ? AND unixtime = ?",
+                                      (str(feed), int(unixtime))).fetchone() is not None
+
+    def list(self, start=None, end=None, feed=None, limit=50, offset=0, newest_first=True, include_skipped=False):
+        """Transcripts with `start <= unixtime < end`, paginated."""
+        where, params = self._filters(start, end, feed, "t")
+        if not include_skipped:
+            where.append("t.skipped IS NULL")
+        sql = "SELECT t.* FROM transcripts t"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY t.unixtime {'DESC' if newest_first else 'ASC'}, t.feed LIMIT ? OFFSET ?"
+        return [self._transcript(r) for r in self._reader().execute(sql, params + [int(limit), int(offset)])]
+
+    def search(self, query, start=None, end=None, feed=None, limit=50, offset=0, phrase=True):
+        """
+        Segments matching `query` within the time range, newest first.
+        With `phrase=True` the query is matched as a literal phrase, otherwise it is FTS5 query syntax.
+        """
+        match = phrase_query(query) if phrase else query
+        where, params = self._filters(start, end, feed, "s")
+        sql = ("SELECT s.feed, s.unixtime, s.start_sec, s.end_sec, s.text, "
+               "snippet(segments_fts, 0, '[', ']', '...', 12) AS snippet "
+               "FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid WHERE segments_fts MATCH ?")
+        if where:
+            sql += " AND " + " AND ".join(where)
+        sql += " ORDER BY s.unixtime DESC, s.start_sec LIMIT ? OFFSET ?"
+        try:
+            rows = self._reader().execute(sql, [match] + params + [int(limit), int(offset)]).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query {query!r}: {e}")
+        return [
+            {"feed": r["feed"], "unixtime": r["unixtime"], "start": r["start_sec"], "end": r["end_sec"],
+             "time": r["unixtime"] + r["start_sec"], "text": r["text"], "snippet": r["snippet"]}
+            for r in rows
+        ]
+
+    def export(self, start, end, feed):
+        """Every transcript of a feed with `start <= unixtime < end`, with segments, oldest first (for archiving)."""
+        db = self._reader()
+        params = (str(feed), int(start), int(end))
+        segments = {}
+        for s in db.execute("SELECT unixtime, start_sec, end_sec, text FROM segments "
+                            "WHERE feed = ? AND unixtime >= ? AND unixtime < ? ORDER BY unixtime, start_sec", params):
+            segments.setdefault(s["unixtime"], []).append({"start": s["start_sec"], "end": s["end_sec"],
+                                                           "text": s["text"]})
+        items = []
+        for row in db.execute("SELECT * FROM transcripts WHERE feed = ? AND unixtime >= ? AND unixtime < ? "
+                              "ORDER BY unixtime", params):
+            item = self._transcript(row)
+            item["segments"] = segments.get(row["unixtime"], [])
+            items.append(item)
+        return items
+
+    def range_stats(self, start, end, feed):
+        """(count, latest written_at) of a feed's transcripts with `start <= unixtime < end`."""
+        row = self._reader().execute(
+            "SELECT COUNT(*), MAX(written_at) FROM transcripts WHERE feed = ? AND unixtime >= ? AND unixtime < ?",
+            (str(feed), int(start), int(end))).fetchone()
+        return row[0], row[1]
+
+    def first_unixtime(self, feed):
+        return self._reader().execute("SELECT MIN(unixtime) FROM transcripts WHERE feed = ?",
+                                      (str(feed),)).fetchone()[0]
+
+    def delete_range(self, start, end, feed):
+        """Remove a feed's transcripts (and their search index entries) with `start <= unixtime < end`."""
+        params = (str(feed), int(start), int(end))
+        with self._write_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM segments WHERE feed = ? AND unixtime >= ? AND unixtime < ?", params)
+                cur = self._db.execute("DELETE FROM transcripts WHERE feed = ? AND unixtime >= ? AND unixtime < ?",
+                                       params)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return cur.rowcount
+
+    def since(self, last_id, limit=100):
+        """Transcripts committed after row id `last_id` (for streaming new transcripts)."""
+        rows = self._reader().execute("SELECT * FROM transcripts WHERE id > ? ORDER BY id LIMIT ?",
+                                      (int(last_id), int(limit)))
+        return [self._transcript(r) for r in rows]
+
+    def alerts(self, start=None, end=None, feed=None, limit=50, offset=0):
+        """Recent alerts, one entry per (feed, segment, keyword) with its recipient count, newest first."""
+        where, params = self._filters(start, end, feed, "a")
+        sql = ("SELECT a.feed, a.unixtime, a.keyword, MAX(a.id) AS id, COUNT(*) AS recipients, "
+               "GROUP_CONCAT(DISTINCT a.channel) AS channels, MAX(a.sent_at) AS sent_at FROM alerts a")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " GROUP BY a.feed, a.unixtime, a.keyword ORDER BY id DESC LIMIT ? OFFSET ?"
+        return [
+            {"id": r["id"], "feed": r["feed"], "unixtime": r["unixtime"], "keyword": r["keyword"],
+             "recipients": r["recipients"], "channels": r["channels"].split(","), "sent_at": r["sent_at"]}
+            for r in self._reader().execute(sql, params + [int(limit), int(offset)])
+        ]
+
+    def data_version(self):
+        """Changes whenever anything commits to the database; cheap enough to check per request."""
+        with self._version_lock:
+            return self._version_db.execute("PRAGMA data_version").fetchone()[0]
+
+    def last_id(self):
+        return self._reader().execute("SELECT COALESCE(MAX(id), 0) FROM transcripts").fetchone()[0]
+
+    def __len__(self):
+        return self._reader().execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+    @staticmethod
+    def _filters(start, end, feed, alias):
+        where, params = [], []
+        if start is not None:
+            where.append(f"{alias}.unixtime >= ?")
+            params.append(int(start))
+        if end is not None:
+            where.append(f"{alias}.unixtime < ?")
+            params.append(int(end))
+        if feed is not None:
+            where.append(f"{alias}.feed = ?")
+            params.append(str(feed))
+        return where, params
+
+    @staticmethod
+    def _transcript(row):
+        item = {
+            "id": row["id"],
+            "feed": row["feed"],
+            "unixtime": row["unixtime"],
+            "text": row["text"],
+            "language": row["language"],
+            "duration": row["duration"],
+        }
+        if row["skipped"]:
+            item["skipped"] = row["skipped"]
+        if row["meta"]:
+            item.update(json.loads(row["meta"]))
+        return item
@@ -0,0 +1,35 @@
+import gzip
+import json
+
+from app.transcripts.archive import DAY, TranscriptArchive, day_start
+
+
+def transcript(unixtime):
+    return {"id": unixtime, "feed": "30", "unixtime": unixtime, "text": f"call at {unixtime}", "language": "en",
+            "duration": 90.0, "segments": [{"start": 1.0, "end": 4.0, "text": f"call at {unixtime}"}]}
+
+
+def test_blocks_give_random_access_and_read_as_one_gzip_file(tmp_path):
+    archive = TranscriptArchive(str(tmp_path / "archive"), block_size=4)
+    start = day_start(1_760_000_000)
+    items = [transcript(u) for u in range(start, start + 30 * 90, 90)]
+    index = archive.write_day("30", start, items, built_at=123.0)
+    assert index["count"] == 30 and len(index["blocks"]) == 8 and index["built_at"] == 123.0
+
+    item = archive.get("30", start + 17 * 90)
+    assert item["text"] == f"call at {start + 17 * 90}" and item["segments"][0]["end"] == 4.0
+    assert "id" not in item
+    assert archive.get("30", start + 17 * 90 + 1) is None
+    assert archive.get("30", start + DAY) is None
+    assert archive.get("31", start) is None
+
+    data_path = archive.paths("30", start)[0]
+    with gzip.open(data_path, "rt") as f:
+        assert [json.loads(line)["unixtime"] for line in f] == [i["unixtime"] for i in items]
+    assert [i["unixtime"] for i in archive.iter_day("30", start)] == [i["unixtime"] for i in items]
+    assert archive.days("30") == [start]
+
+    archive.write_day("30", start, items[:2])
+    assert archive.index("30", start)["count"] == 2
+    archive.remove_day("30", start)
+    assert archive.days("30") == [] and archive.get("30", start) is None
@@ -0,0 +1,70 @@
+import json
+import time
+
+from app.transcripts.importer import import_json_dir
+from app.transcripts.store import TranscriptStore
+
+
+def result(text, segments):
+    return {"text": text, "language": "en", "duration": 90.0,
+            "segments": [{"start": s, "end": e, "text": t} for s, e, t in segments]}
+
+
+def test_batched_writes_and_phrase_search(tmp_path):
+    store = TranscriptStore(str(tmp_path / "t.db"), batch_size=2, flush_interval=60)
+    store.add("30", 1000, result("Engine 5 to Sierra Azul. Copy.", [(1.0, 4.0, "Engine 5 to Sierra Azul."),
+                                                                       (5.0, 6.0, "Copy.")]))
+    assert len(store) == 0  # still buffered
+    store.add("31", 2000, result("Units responding near sierra azul gate", [(10.0, 14.0, "Units responding near sierra azul gate")]))
+    deadline = time.time() + 5
+    while len(store) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(store) == 2
+
+    hits = store.search("Sierra Azul")
+    assert [(h["feed"], h["unixtime"], h["start"]) for h in hits] == [("31", 2000, 10.0), ("30", 1000, 1.0)]
+    assert hits[1]["time"] == 1001.0
+    assert store.search("sierra azul", start=1500, end=2500) == hits[:1]
+    assert store.search("azul sierra") == []
+    assert store.search("azul OR copy", phrase=False, feed="30")[0]["unixtime"] == 1000
+    store.close()
+
+
+def test_list_get_and_replace(tmp_path):
+    store = TranscriptStore(str(tmp_path / "t.db"))
+    store.add_many([("30", u, result(f"segment {u}", [(0.0, 1.0, f"segment {u}")])) for u in (90, 180, 270)])
+    store.add_many([("30", 360, {"text": "", "segments": [], "skipped": "no speech", "vad": {"speech_seconds": 0}})])
+    assert [t["unixtime"] for t in store.list(start=100)] == [270, 180]
+    assert [t["unixtime"] for t in store.list(newest_first=False, limit=2, offset=1)] == [180, 270]
+    assert store.get("30", 360)["vad"] == {"speech_seconds": 0}
+
+    store.add_many([("30", 180, result("rewritten", [(2.0, 3.0, "rewritten")]))])
+    assert store.get("30", 180)["segments"] == [{"start": 2.0, "end": 3.0, "text": "rewritten"}]
+    assert store.search("segment 180") == []
+    assert [t["unixtime"] for t in store.since(3)] == [360, 180]
+    store.close()
+
+
+def test_import_json_dir(tmp_path):
+    tdir = tmp_path / "transcripts"
+    (tdir / "31").mkdir(parents=True)
+    (tdir / "audio_900.json").write_text(json.dumps(result("legacy flat file", [])))
+    (tdir / "31" / "audio_990.json").write_text(json.dumps(result("per feed file", [(0.0, 2.0, "per feed file")])))
+    (tdir / "31" / "audio_1080.json").write_text("{not json")
+    store = TranscriptStore(str(tmp_path / "t.db"))
+    assert import_json_dir(store, str(tdir)) == (2, 1)
+    assert store.get("30", 900)["segments"] == [{"start": 0.0, "end": 90.0, "text": "legacy flat file"}]
+    assert store.search("per feed")[0]["feed"] == "31"
+    store.close()
+
+
+def test_ensure_committed_flushes_only_while_the_segment_is_queued(tmp_path):
+    store = TranscriptStore(str(tmp_path / "t.db"), batch_size=50, flush_interval=60)
+    store.add("30", 1000, result("Engine 5", [(0.0, 2.0, "Engine 5")]))
+    store.add("30", 1090, result("Copy", [(0.0, 1.0, "Copy")]))
+    assert not store.exists("30", 1000)
+    assert store.ensure_committed("30", 1000)
+    # The whole batch went with it
+    assert store.exists("30", 1000) and store.exists("30", 1090)
+    assert not store.ensure_committed("30", 1090)
+    store.close()
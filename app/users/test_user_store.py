@@ -0,0 +1,52 @@
+import json
+import os
+
+from app.users.user_store import UserRegistry
+
+
+def write_users(path, users):
+    with open(path, "w") as f:
+        json.dump(users, f)
+
+
+def test_registry_reloads_only_when_file_changes(tmp_path):
+    path = str(tmp_path / "users.json")
+    write_users(path, [{"id": "a@example.com", "email": "a@example.com", "zones": ["Teague Hill"], "keywords": []}])
+    registry = UserRegistry(path)
+    users = registry.users()
+    version = registry.version
+    assert registry.users() is users
+    assert registry.version == version
+
+    write_users(path, [
+        {"id": "a@example.com", "email": "a@example.com", "zones": ["Teague Hill"], "keywords": []},
+        {"id": "b@example.com", "email": "b@example.com", "zones": ["teague hill"], "keywords": ["Welfare Check"]},
+    ])
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert len(registry.users()) == 2
+    assert registry.version > version
+
+
+def test_registry_indexes_and_atomic_save(tmp_path):
+    path = str(tmp_path / "users.json")
+    registry = UserRegistry(path)
+    assert registry.users() == []
+    registry.save([{"id": "a@example.com", "email": "a@example.com", "zones": ["Sierra Azul"], "keywords": ["Mountain Lion"]}])
+    assert registry.get("a@example.com")["zones"] == ["Sierra Azul"]
+    assert [u["id"] for u in registry.users_for_term(" SIERRA AZUL ")] == ["a@example.com"]
+    assert [u["id"] for u in registry.users_for_term("mountain lion")] == ["a@example.com"]
+    assert registry.users_for_term("Windy Hill") == []
+    assert os.listdir(tmp_path) == ["users.json"]
+    with open(path) as f:
+        assert json.load(f)[0]["id"] == "a@example.com"
+
+
+def test_registry_keeps_last_good_copy_on_parse_error(tmp_path):
+    path = str(tmp_path / "users.json")
+    write_users(path, [{"id": "a@example.com", "zones": [], "keywords": []}])
+    registry = UserRegistry(path)
+    assert len(registry.users()) == 1
+    with open(path, "w") as f:
+        f.write("[{broken")
+    assert len(registry.users()) == 1
@@ -1,12 +1,10 @@
+import copy
 import json
 import os
+import tempfile
+import threading
 from datetime import datetime
-from typing import List, Optional
-
-import json
-import os
-from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 import logging
 
 logger = logging.getLogger("users.user_store")
@@ -19,52 +17,150 @@ data_dir = "/app/data/users"
 os.makedirs(data_dir, exist_ok=True)
 USERS_PATH = os.path.join(data_dir, users_file)
 
-def load_users() -> List[dict]:
-    logger.info(f"[UserStore] Loading users from: {USERS_PATH}")
-    if not os.path.exists(USERS_PATH):
-        logger.warning(f"[UserStore] User file not found: {USERS_PATH}")
-        print(f"\n[WARNING] User file not found: {USERS_PATH}\n"
-              f"Please create this file with your user/contact info.\n"
-              f"You can copy app/data/users/{users_file.replace('.json', '.example.json')} as a template.\n")
-        return []
-    with open(USERS_PATH, 'r') as f:
+
+class UserRegistry:
+    """
+    In-memory view of the users file.
+
+    The file is only re-read when its mtime or size changes, lookups by id/email
+    and by zone/keyword are dict-based, and saves are atomic (temp file + rename)
+    so a crash mid-write can't truncate the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = 0  # bumped every time the cached user list changes
+        self._lock = threading.RLock()
+        self._stat_key = None
+        self._loaded = False
+        self._users: List[dict] = []
+        self._by_id: Dict[str, dict] = {}
+        self._by_term: Dict[str, List[dict]] = {}
+
+    def _current_stat(self):
         try:
-            users = json.load(f)
-            logger.info(f"[UserStore] Loaded {len(users)} users from {USERS_PATH}")
-            return users
-        except Exception as e:
-            logger.error(f"[UserStore] Failed to load users from {USERS_PATH}: {e}")
-            return []
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def refresh(self) -> bool:
+        """Reload the file if it changed on disk; returns True if a reload happened."""
+        with self._lock:
+            stat_key = self._current_stat()
+            if self._loaded and stat_key == self._stat_key:
+                return False
+            self._stat_key = stat_key
+            self._loaded = True
+            if stat_key is None:
+                logger.warning(f"[UserStore] User file not found: {self.path}")
+                print(f"\n[WARNING] User file not found: {self.path}\n"
+                      f"Please create this file with your user/contact info.\n"
+                      f"You can copy app/data/users/{users_file.replace('.json', '.example.json')} as a template.\n")
+                self._set_users([])
+                return True
+            logger.info(f"[UserStore] Loading users from: {self.path}")
+            try:
+                with open(self.path, 'r') as f:
+                    users = json.load(f)
+            except Exception as e:
+                # Keep serving the last good copy rather than dropping every subscriber
+                logger.error(f"[UserStore] Failed to load users from {self.path}: {e}")
+                return False
+            self._set_users(users)
+            logger.info(f"[UserStore] Loaded {len(users)} users from {self.path}")
+            return True
+
+    def _set_users(self, users: List[dict]):
+        by_id = {}
+        by_term: Dict[str, List[dict]] = {}
+        for user in users:
+            for key in (user.get('id'), user.get('email')):
+                if key:
+                    by_id[key] = user
+            terms = {t.strip().lower() for t in (user.get('zones') or []) + (user.get('keywords') or []) if t.strip()}
+            for term in terms:
+                by_term.setdefault(term, []).append(user)
+        self._users = users
+        self._by_id = by_id
+        self._by_term = by_term
+        self.version += 1
+
+    def users(self) -> List[dict]:
+        """Current user list (shared; treat as read-only)."""
+        with self._lock:
+            self.refresh()
+            return self._users
+
+    def get(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            self.refresh()
+            return self._by_id.get(user_id)
+
+    def users_for_term(self, term: str) -> List[dict]:
+        """Users subscribed to a zone or keyword (case-insensitive)."""
+        with self._lock:
+            self.refresh()
+            return self._by_term.get(term.strip().lower(), [])
+
+    def save(self, users: List[dict]):
+        with self._lock:
+            directory = os.path.dirname(self.path) or "."
+            fd, tmp_path = tempfile.mkstemp(prefix=".users-", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(users, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._stat_key = self._current_stat()
+            self._loaded = True
+            self._set_users(users)
+
+    def editable_users(self) -> List[dict]:
+        """A private copy of the user list for read-modify-write updates."""
+        return copy.deepcopy(self.users())
+
+
+registry = UserRegistry(USERS_PATH)
+
+
+def load_users() -> List[dict]:
+    return registry.users()
 
 def save_users(users: List[dict]):
-    with open(USERS_PATH, 'w') as f:
-        json.dump(users, f, indent=2)
+    registry.save(users)
 
 def find_user(email: str) -> Optional[dict]:
-    users = load_users()
-    for user in users:
-        if user['id'] == email:
-            return user
-    return None
+    return registry.get(email)
+
+def users_for_zone(zone: str) -> List[dict]:
+    return registry.users_for_term(zone)
 
 def add_or_update_user(email: str, phone: Optional[str], zones: List[str]):
-    users = load_users()
-    now = datetime.utcnow().isoformat() + 'Z'
-    for user in users:
-        if user['id'] == email:
-            user['phone'] = phone
-            user['zones'] = zones
-            return save_users(users)
-    users.append({
-        'id': email,
-        'email': email,
-        'phone': phone,
-        'zones': zones,
-        'created_at': now
-    })
-    save_users(users)
+    with registry._lock:
+        users = registry.editable_users()
+        now = datetime.utcnow().isoformat() + 'Z'
+        for user in users:
+            if user['id'] == email:
+                user['phone'] = phone
+                user['zones'] = zones
+                return save_users(users)
+        users.append({
+            'id': email,
+            'email': email,
+            'phone': phone,
+            'zones': zones,
+            'created_at': now
+        })
+        save_users(users)
 
 def remove_user(email: str):
-    users = load_users()
-    users = [u for u in users if u['id'] != email]
-    save_users(users)
+    with registry._lock:
+        users = registry.editable_users()
+        users = [u for u in users if u['id'] != email]
+        save_users(users)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Recall and latency of fuzzy keyword matching.
+
+Scores exact and fuzzy matching on the labeled corpus of mis-heard place names
+(app/alerts/fuzzy_corpus.jsonl, loaded by app/alerts/corpus.py), then times
+first_match_per_user on synthetic 90-second transcripts for a large user base.
+
+    python -m benchmarks.bench_fuzzy --users 10000 --segments 200
+"""
+import argparse
+import json
+import random
+import time
+
+from app.alerts.corpus import corpus_matcher, evaluate, load_corpus
+from app.alerts.matcher import KeywordMatcher
+from benchmarks.bench_matcher import make_transcripts, make_users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--segments", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    report = {"corpus_rows": len(corpus)}
+    for name, fuzzy in (("exact", False), ("fuzzy", True)):
+        tp, fn, fp = evaluate(corpus_matcher(fuzzy), corpus)
+        report[name] = {
+            "recall": round(tp / (tp + fn), 3) if tp + fn else None,
+            "precision": round(tp / (tp + fp), 3) if tp + fp else None,
+            "false_positives": fp,
+        }
+
+    rng = random.Random(args.seed)
+    users = make_users(args.users, rng)
+    transcripts = make_transcripts(args.segments, rng)
+    for name, fuzzy in (("exact", False), ("fuzzy", True)):
+        t0 = time.perf_counter()
+        matcher = KeywordMatcher(users, fuzzy=fuzzy)
+        build_s = time.perf_counter() - t0
+        latencies = []
+        alerts = 0
+        for text in transcripts:
+            t0 = time.perf_counter()
+            alerts += len(matcher.first_match_per_user(text))
+            latencies.append(time.perf_counter() - t0)
+        latencies.sort()
+        report[name].update({
+            "build_seconds": round(build_s, 3),
+            "ms_per_transcript_p50": round(latencies[len(latencies) // 2] * 1000, 3),
+            "ms_per_transcript_p95": round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+            "user_alerts": alerts,
+        })
+    report["users"] = args.users
+    report["transcript_words"] = 220
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark the compiled keyword matcher against the original per-user scan.
+
+Generates a synthetic subscriber base (default 10k users with a mix of zones and
+free-text keywords) and a day of transcripts (960 x 90-second segments), then
+times both approaches over the whole day.
+
+    python -m benchmarks.bench_matcher --users 10000 --segments 960
+"""
+import argparse
+import json
+import random
+import time
+
+from app.alerts.corpus import KEYWORDS
+from app.alerts.matcher import KeywordMatcher
+from app.alerts.zones import ZONES
+
+FILLER = (
+    "copy that unit responding en route staging at the gate ten four standby command "
+    "engine medic patrol checking the lot mile marker trailhead north side copy clear"
+).split()
+
+
+def make_users(n, rng):
+    users = []
+    for i in range(n):
+        users.append({
+            "id": f"user{i}@example.com",
+            "email": f"user{i}@example.com",
+            "zones": rng.sample(ZONES, rng.randint(1, 5)),
+            "keywords": rng.sample(KEYWORDS, rng.randint(0, 3)) + [f"custom phrase {i % 500}"],
+        })
+    return users
+
+
+def make_transcripts(n, rng, words=220, mention_rate=0.2):
+    transcripts = []
+    for _ in range(n):
+        text = [rng.choice(FILLER) for _ in range(words)]
+        if rng.random() < mention_rate:
+            text.insert(rng.randrange(words), rng.choice(ZONES + KEYWORDS))
+        transcripts.append(" ".join(text).capitalize() + ".")
+    return transcripts
+
+
+def naive_scan(transcript, users):
+    """The original check_and_trigger matching rule, once per user."""
+    matched = 0
+    for user in users:
+        for kw in set(user.get("keywords", []) + user.get("zones", [])):
+            if kw.strip().lower() in transcript.lower():
+                matched += 1
+                break
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--segments", type=int, default=960)
+    parser.add_argument("--naive-segments", type=int, default=20,
+                        help="segments to time the naive scan on (extrapolated to --segments)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    users = make_users(args.users, rng)
+    transcripts = make_transcripts(args.segments, rng)
+
+    t0 = time.perf_counter()
+    matcher = KeywordMatcher(users)
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    matched = sum(len(matcher.first_match_per_user(t)) for t in transcripts)
+    scan_s = time.perf_counter() - t0
+
+    sample = transcripts[:args.naive_segments]
+    t0 = time.perf_counter()
+    naive_matched = sum(naive_scan(t, users) for t in sample)
+    naive_s = (time.perf_counter() - t0) * len(transcripts) / max(1, len(sample))
+    assert naive_matched == sum(len(matcher.first_match_per_user(t)) for t in sample)
+
+    print(json.dumps({
+        "users": args.users,
+        "segments": args.segments,
+        "patterns": len(matcher),
+        "build_seconds": round(build_s, 4),
+        "matcher_day_seconds": round(scan_s, 4),
+        "matcher_ms_per_segment": round(scan_s / len(transcripts) * 1000, 3),
+        "naive_day_seconds_est": round(naive_s, 2),
+        "speedup": round(naive_s / scan_s, 1) if scan_s else None,
+        "user_alerts": matched,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput and alert latency of the segment pipeline, without scanrad.io or a real model.
+
+Starts the fake scanrad server (benchmarks/fake_scanrad.py), builds an
+AudioProcessor against it with a synthetic user set and a fake transcriber,
+and runs two scenarios through the real download -> prefilter -> transcribe ->
+alert stages:
+
+  sweep  a catch-up over the last `--sweep-segments` grid slots (960 = one day),
+         queued by the real SegmentScheduler, as at startup.
+  live   an hour of segments (`--live-segments`) arriving one per 90 seconds,
+         with time compressed by `--speedup`.
+
+The fake transcriber is the real engine (queueing, batching) with the model
+call replaced by a sleep of `--call-overhead` + `--rtf` x the (speech-trimmed)
+audio, returning a synthetic transcript in which `--mention-rate` of segments
+mention a zone or keyword. Pass `--engine whisper` to use the real engine instead
+(WHISPER_MODEL, e.g. tiny). Notifications are recorded, not sent.
+
+Alert latency is the time from a segment being available (queued, for the
+sweep) to the matcher finding its keywords, i.e. the point the alerts are
+handed over. It is measured there rather than at the notifier because most
+sweep segments are older than an hour and trigger_alert's freshness check
+drops them; the report counts those as `stale_segments`. The JSON report
+includes the commit, so runs can be compared:
+
+    python -m benchmarks.bench_pipeline --output bench.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from app.audio.transcriber import SAMPLE_RATE, TranscriptionEngine
+from benchmarks.bench_matcher import make_transcripts, make_users
+from benchmarks.fake_scanrad import SEGMENT_DURATION, FakeScanrad
+
+
+class FakeEngine(TranscriptionEngine):
+    """
+    TranscriptionEngine with the model replaced by a cost model: every model call takes `call_overhead`
+    plus `rtf` x the audio it covers and returns synthetic radio traffic. The engine's own queueing and
+    batching run unchanged, so --batch-size shows what batching buys for a given per-call overhead.
+    """
+
+    def __init__(self, rtf=0.005, call_overhead=0.1, num_workers=1, batch_size=1, batch_wait_ms=500,
+                 mention_rate=0.2, seed=1):
+        super().__init__(model_size="fake", num_workers=num_workers, backend="inprocess", batch_size=batch_size,
+                         batch_wait_ms=batch_wait_ms)
+        self.rtf = rtf
+        self.call_overhead = call_overhead
+        self.mention_rate = mention_rate
+        self.seed = seed
+
+    def _load_model(self):
+        self.model = "fake"
+
+    def _transcript(self, name, duration, backend):
+        unixtime = int(re.search(r"(\d+)", name).group(1))
+        text = make_transcripts(1, random.Random(unixtime * 7919 + self.seed), mention_rate=self.mention_rate)[0]
+        words = text.split()
+        step = max(1, len(words) // 10)
+        segments = [{"start": duration * i / len(words), "end": duration * min(i + step, len(words)) / len(words),
+                     "text": " " + " ".join(words[i:i + step])} for i in range(0, len(words), step)]
+        return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": "en",
+                "duration": duration, "backend": backend}
+
+    def _transcribe_in_process(self, audio, name=None):
+        duration = float(SEGMENT_DURATION) if isinstance(audio, str) else len(audio) / SAMPLE_RATE
+        time.sleep(self.call_overhead + self.rtf * duration)
+        return self._transcript(name or os.path.basename(audio), duration, "fake")
+
+    def _transcribe_batch_in_process(self, pcms, names):
+        durations = [len(pcm) / SAMPLE_RATE for pcm in pcms]
+        time.sleep(self.call_overhead + self.rtf * sum(durations))
+        return [self._transcript(name, duration, "fake-batched") for name, duration in zip(names, durations)]
+
+
+class RecordingNotifier:
+    """Notifier stand-in that records when each segment's first alert was handed over."""
+
+    def __init__(self):
+        self.current = threading.local()  # the job whose alerts are being checked on this thread
+        self.first_alert = {}  # job key -> (monotonic time, job)
+        self.matched = {}  # job key -> monotonic time the matcher found its keywords
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record_match(self):
+        job = getattr(self.current, "job", None)
+        if job is not None:
+            with self._lock:
+                self.matched.setdefault(job.key, time.monotonic())
+
+    def _record(self):
+        job = getattr(self.current, "job", None)
+        with self._lock:
+            self.count += 1
+            if job is not None and job.key not in self.first_alert:
+                self.first_alert[job.key] = (time.monotonic(), job)
+
+    def send_email(self, email, subject, message, feed=None, event_unixtime=None):
+        self._record()
+
+    def send_sms(self, phone, message, feed=None, event_unixtime=None):
+        self._record()
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+class PipelineBench:
+    def __init__(self, args):
+        from app.audio.http_client import ScanradClient
+        from app.audio.processor import AudioProcessor
+        from app.users import user_store
+
+        self.args = args
+        self.feeds = [f.strip() for f in args.feeds.split(",") if f.strip()]
+        self.workdir = tempfile.mkdtemp(prefix="bench-pipeline-")
+        self.fake = FakeScanrad(latency=args.latency, jitter=args.latency / 2, error_rate=args.error_rate,
+                                html_rate=args.html_rate, silent_rate=args.silent_rate,
+                                availability_lag=args.availability_lag, seed=args.seed)
+        self.fake.start()
+
+        users_path = os.path.join(self.workdir, "users.json")
+        with open(users_path, "w") as f:
+            json.dump(make_users(args.users, random.Random(args.seed)), f)
+        user_store.registry = user_store.UserRegistry(users_path)
+
+        if args.engine == "whisper":
+            engine = TranscriptionEngine.from_env(batch_size=args.batch_size, batch_wait_ms=args.batch_wait_ms)
+        else:
+            engine = FakeEngine(rtf=args.rtf, call_overhead=args.call_overhead, num_workers=args.transcribe_workers,
+                                batch_size=args.batch_size, batch_wait_ms=args.batch_wait_ms,
+                                mention_rate=args.mention_rate, seed=args.seed)
+        self.notifier = RecordingNotifier()
+        self.processor = AudioProcessor(
+            audio_dir=os.path.join(self.workdir, "audio"), transcript_dir=os.path.join(self.workdir, "transcripts"),
+            engine=engine, http_client=ScanradClient(base_url=self.fake.base_url), notifier=self.notifier,
+            feeds=self.feeds)
+        if args.in_memory:
+            self.processor.in_memory = True
+        # Every segment's first alert should reach the recording notifier, not be held for a digest
+        self.processor.alert_manager.coalescer = None
+        check_alerts = self.processor.alert_stage
+
+        def alert_stage(job):
+            self.notifier.current.job = job
+            return check_alerts(job)
+
+        self.processor.alert_stage = alert_stage
+        check_transcript = self.processor.alert_manager.check_transcript
+
+        def timed_check(*args, **kwargs):
+            matches = check_transcript(*args, **kwargs)
+            if matches:
+                self.notifier.record_match()
+            return matches
+
+        self.processor.alert_manager.check_transcript = timed_check
+        engine.start()
+
+    def _run(self, submit_all):
+        from app.audio.scheduler import AdaptiveBackoff
+        self.notifier.first_alert.clear()
+        self.notifier.matched.clear()
+        results = {}
+        results_lock = threading.Lock()
+        ready = {}  # job key -> monotonic time the segment became available
+
+        def on_done(job):
+            with results_lock:
+                results[job.result or "failed"] = results.get(job.result or "failed", 0) + 1
+            self.processor.on_segment_done(job, backoffs[job.feed])
+
+        backoffs = {feed: AdaptiveBackoff(initial=SEGMENT_DURATION + self.args.availability_lag, feed=feed)
+                    for feed in self.feeds}
+        pipeline = self.processor.build_pipeline(on_done=on_done)
+        pipeline.start()
+        t0 = time.monotonic()
+        submitted = submit_all(pipeline, ready, backoffs)
+        pipeline.join()
+        elapsed = time.monotonic() - t0
+        self.processor.store.flush()
+        latencies = [matched - ready[key] for key, matched in self.notifier.matched.items() if key in ready]
+        notified = sum(1 for key in self.notifier.first_alert if key in ready)
+        return {
+            "segments": submitted,
+            "seconds": round(elapsed, 2),
+            "segments_per_minute": round(submitted / elapsed * 60, 1) if elapsed else None,
+            "results": results,
+            "alerted_segments": len(latencies),
+            # Matched but older than trigger_alert's one-hour cutoff, so nothing reached the notifier
+            "stale_segments": len(latencies) - notified,
+            "alert_latency_p50_seconds": round(percentile(latencies, 0.5), 3) if latencies else None,
+            "alert_latency_p99_seconds": round(percentile(latencies, 0.99), 3) if latencies else None,
+            "stages": {s: {k: v for k, v in stats.items() if k in ("processed", "errors", "busy_seconds", "utilization")}
+                       for s, stats in pipeline.stats()["stages"].items()},
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    def sweep(self):
+        """Startup catch-up: the scheduler queues every slot of the window, newest first."""
+        from app.audio.pipeline import SegmentJob
+        from app.audio.scheduler import SegmentScheduler
+        span = self.args.sweep_segments * SEGMENT_DURATION
+
+        def submit_all(pipeline, ready, backoffs):
+            now = time.time()
+            count = 0
+            for feed in self.feeds:
+                scheduler = SegmentScheduler(
+                    backoffs[feed], is_settled=lambda u, feed=feed: self.processor.journal.is_settled(u, feed),
+                    is_in_flight=lambda u, feed=feed: pipeline.is_in_flight(feed, u),
+                    lookback_seconds=span, start_time=int(now - span), feed=feed)
+
+                def submit(unixtime, feed=feed):
+                    job = SegmentJob(unixtime, source="sweep", feed=feed)
+                    ready[job.key] = time.monotonic()
+                    return pipeline.submit(job)
+
+                count += scheduler.run_once(submit, now=now)
+            return count
+
+        return self._run(submit_all)
+
+    def live(self):
+        """Segments arrive on the 90-second grid, `speedup` times faster than real time."""
+        from app.audio.pipeline import SegmentJob
+        speedup = self.args.speedup
+        lag = SEGMENT_DURATION + self.args.availability_lag
+        start_real = time.time()
+        # Live slots start after anything the sweep covered; scanrad's clock runs `speedup` times faster
+        first_slot = (int(start_real) // SEGMENT_DURATION + 1) * SEGMENT_DURATION
+        sim_start = first_slot + lag
+        self.fake.clock = lambda: sim_start + (time.time() - start_real) * speedup
+
+        def submit_all(pipeline, ready, backoffs):
+            count = 0
+            for i in range(self.args.live_segments):
+                available_at = start_real + i * SEGMENT_DURATION / speedup
+                time.sleep(max(0.0, available_at - time.time()))
+                for feed in self.feeds:
+                    job = SegmentJob(first_slot + i * SEGMENT_DURATION, source="live", feed=feed)
+                    ready[job.key] = time.monotonic()
+                    count += pipeline.submit(job)
+            return count
+
+        try:
+            return self._run(submit_all)
+        finally:
+            self.fake.clock = time.time
+
+    def close(self):
+        self.processor.store.close()
+        self.fake.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="sweep,live")
+    parser.add_argument("--feeds", default="30")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--sweep-segments", type=int, default=960, help="slots per feed in the sweep (960 = 1 day)")
+    parser.add_argument("--live-segments", type=int, default=40, help="slots per feed in the live run (40 = 1 hour)")
+    parser.add_argument("--speedup", type=float, default=60.0, help="live time compression")
+    parser.add_argument("--engine", choices=("fake", "whisper"), default="fake")
+    parser.add_argument("--rtf", type=float, default=0.005, help="fake transcriber real-time factor")
+    parser.add_argument("--call-overhead", type=float, default=0.1, help="fake transcriber seconds per model call")
+    parser.add_argument("--transcribe-workers", type=int, default=2, help="fake transcriber model workers")
+    parser.add_argument("--batch-size", type=int, default=1, help="segments per model call (WHISPER_BATCH_SIZE)")
+    parser.add_argument("--batch-wait-ms", type=int, default=500, help="WHISPER_BATCH_WAIT_MS")
+    parser.add_argument("--mention-rate", type=float, default=0.2, help="fraction of transcripts with a zone/keyword")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake scanrad response latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of downloads that get a 500")
+    parser.add_argument("--html-rate", type=float, default=0.01, help="fraction of downloads that get the HTML page")
+    parser.add_argument("--silent-rate", type=float, default=0.1, help="fraction of segments that are silence")
+    parser.add_argument("--availability-lag", type=int, default=120)
+    parser.add_argument("--in-memory", action="store_true", help="AUDIO_IN_MEMORY mode")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    report = {"commit": git_commit(), "params": vars(args)}
+    # The pipeline prints progress; keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        bench = PipelineBench(args)
+        try:
+            for scenario in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+                report[scenario] = getattr(bench, scenario)()
+        finally:
+            bench.close()
+    report["fake_scanrad_requests"] = bench.fake.requests
+    report["peak_rss_mb"] = peak_rss_mb()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
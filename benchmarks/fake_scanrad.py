@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for scanrad.io, for benchmarks and manual testing.
+
+Serves the two endpoints the monitor uses:
+
+    GET /download/<feed>/<unixtime>?t=90   a synthetic MP3 (tone bursts that pass the speech pre-filter)
+    GET /latest/<feed>                     {"unixtime": <newest available segment>}
+
+Any window (`<unixtime>` need not be on the 90-second grid, `t` is its length)
+becomes available `availability_lag` seconds after it ends; until then (and at `html_rate`) the download returns scanrad's HTML
+"no video" page. `error_rate` of downloads fail with a 500, `silent_rate` of
+segments are silence (skipped by the pre-filter), and every response waits
+`latency` seconds (+/- `jitter`). Failures are decided per request, so a retry
+can succeed. All decisions come from one seeded RNG.
+
+    python -m benchmarks.fake_scanrad --port 8090 --latency 0.2 --error-rate 0.05
+"""
+import argparse
+import io
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SEGMENT_DURATION = 90
+SAMPLE_RATE = 16000
+HTML_PAGE = b"<!DOCTYPE html><html><body>no video with supported format and MIME type found</body></html>"
+
+_DOWNLOAD = re.compile(r"^/download/([^/]+)/(\d+)$")
+_LATEST = re.compile(r"^/latest/([^/]+)$")
+
+
+def make_mp3(seconds=SEGMENT_DURATION, speech=True, seed=0):
+    """Encode a mono 16 kHz MP3: 1-3 s tone bursts separated by quiet gaps, or near-silence."""
+    import av
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE)
+    pcm = rng.normal(0, 0.0005, n).astype(np.float32)
+    if speech:
+        t = np.arange(n) / SAMPLE_RATE
+        pos = 0.0
+        while pos < seconds:
+            length = rng.uniform(1.0, 3.0)
+            start, end = int(pos * SAMPLE_RATE), int(min(pos + length, seconds) * SAMPLE_RATE)
+            f0 = rng.uniform(120, 220)
+            burst = sum(np.sin(2 * np.pi * f0 * k * t[start:end]) / k for k in (1, 2, 3))
+            pcm[start:end] += (0.2 * burst).astype(np.float32)
+            pos += length + rng.uniform(0.5, 4.0)
+    buf = io.BytesIO()
+    with av.open(buf, "w", format="mp3") as out:
+        stream = out.add_stream("mp3", rate=SAMPLE_RATE)
+        stream.bit_rate = 32000
+        frame = av.AudioFrame.from_ndarray(pcm.reshape(1, -1), format="fltp", layout="mono")
+        frame.sample_rate = SAMPLE_RATE
+        for packet in stream.encode(frame):
+            out.mux(packet)
+        for packet in stream.encode(None):
+            out.mux(packet)
+    return buf.getvalue()
+
+
+class FakeScanrad:
+    """ThreadingHTTPServer imitating scanrad's download and latest endpoints."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, html_rate=0.0,
+                 silent_rate=0.0, availability_lag=0, seed=1, clock=time.time):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.html_rate = html_rate
+        self.silent_rate = silent_rate
+        self.availability_lag = availability_lag
+        self.clock = clock
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.seed = seed
+        self._audio = {}  # (seconds, speech) -> MP3
+        self._audio_lock = threading.Lock()
+        self.audio(SEGMENT_DURATION, True)
+        self.audio(SEGMENT_DURATION, False)
+        self.requests = {"download": 0, "latest": 0, "500": 0, "html": 0}
+        self._httpd = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        fake = self
+
+        class Handler(FakeScanradHandler):
+            server_fake = fake
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, name="fake-scanrad", daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def newest_available(self, now=None):
+        now = self.clock() if now is None else now
+        return int(now - SEGMENT_DURATION - self.availability_lag) // SEGMENT_DURATION * SEGMENT_DURATION
+
+    def audio(self, seconds, speech):
+        """The synthetic MP3 for a window of `seconds`, encoded once per length."""
+        key = (seconds, speech)
+        with self._audio_lock:
+            if key not in self._audio:
+                self._audio[key] = make_mp3(seconds=seconds, speech=speech, seed=self.seed)
+            return self._audio[key]
+
+    def _roll(self):
+        with self._rng_lock:
+            return self._rng.random(), self._rng.uniform(-self.jitter, self.jitter)
+
+    def _count(self, name):
+        with self._rng_lock:
+            self.requests[name] += 1
+
+    def respond(self, path, duration=SEGMENT_DURATION):
+        """(status, content type, body) for a request path and its `t` parameter."""
+        roll, jitter = self._roll()
+        delay = max(0.0, self.latency + jitter)
+        if delay:
+            time.sleep(delay)
+        m = _LATEST.match(path)
+        if m:
+            self._count("latest")
+            return 200, "application/json", json.dumps({"unixtime": self.newest_available()}).encode()
+        m = _DOWNLOAD.match(path)
+        if not m:
+            return 404, "text/plain", b"not found"
+        self._count("download")
+        unixtime = int(m.group(2))
+        if roll < self.error_rate:
+            self._count("500")
+            return 500, "text/plain", b"internal server error"
+        duration = max(1, min(int(duration), SEGMENT_DURATION))
+        if unixtime + duration + self.availability_lag > self.clock() or roll < self.error_rate + self.html_rate:
+            self._count("html")
+            return 200, "text/html", HTML_PAGE
+        # Silence is decided per 90-second segment (not per request) so retries and shorter windows agree
+        slot = unixtime // SEGMENT_DURATION * SEGMENT_DURATION
+        silent = random.Random(f"{m.group(1)}:{slot}").random() < self.silent_rate
+        return 200, "audio/mpeg", self.audio(duration, not silent)
+
+
+class FakeScanradHandler(BaseHTTPRequestHandler):
+    server_fake = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        t = parse_qs(url.query).get("t", [""])[0]
+        status, content_type, body = self.server_fake.respond(url.path, int(t) if t.isdigit() else SEGMENT_DURATION)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of downloads answered with a 500")
+    parser.add_argument("--html-rate", type=float, default=0.0, help="fraction of downloads answered with the HTML page")
+    parser.add_argument("--silent-rate", type=float, default=0.0, help="fraction of segments that are silence")
+    parser.add_argument("--availability-lag", type=int, default=120, help="seconds after its end a segment appears")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    fake = FakeScanrad(args.host, args.port, args.latency, args.jitter, args.error_rate, args.html_rate,
+                       args.silent_rate, args.availability_lag, args.seed)
+    print(f"Fake scanrad on {fake.start()} (SCANRAD_BASE_URL={fake.base_url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()